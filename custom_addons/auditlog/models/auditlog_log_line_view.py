@@ -59,6 +59,50 @@ class AuditlogLogLineView(models.Model):
             JOIN auditlog_log alog ON alog.id = alogl.log_id
         """
 
+    def _diff_select_query(self):
+        # the lines of the diffs get negative ids, which do not collide
+        # with the ones of the lines table
+        return """
+            -(alog.id::bigint * 10000 + diff.position),
+            alog.create_date,
+            alog.create_uid,
+            alog.write_uid,
+            alog.write_date,
+            field.id,
+            alog.id,
+            diff.vals->>'old_value',
+            diff.vals->>'new_value',
+            diff.vals->>'old_value_text',
+            diff.vals->>'new_value_text',
+            diff.vals->>'field_name',
+            diff.vals->>'field_description',
+            alog.name,
+            alog.model_id,
+            alog.model_name,
+            alog.model_model,
+            alog.res_id,
+            alog.user_id,
+            alog.method,
+            alog.http_session_id,
+            alog.http_request_id,
+            alog.log_type
+        """
+
+    def _diff_from_query(self):
+        return """
+            auditlog_log alog
+            CROSS JOIN LATERAL jsonb_array_elements(alog.diff)
+                WITH ORDINALITY AS diff(vals, position)
+            LEFT JOIN ir_model_fields field
+                ON field.id = (diff.vals->>'field_id')::integer
+        """
+
     @property
     def _table_query(self):
-        return f"SELECT {self._select_query()} FROM {self._from_query()}"
+        # the logs created with the partitioned storage have a diff instead
+        # of lines, see auditlog.log._compact_lines
+        return (
+            f"SELECT {self._select_query()} FROM {self._from_query()} "
+            f"UNION ALL SELECT {self._diff_select_query()} "
+            f"FROM {self._diff_from_query()} WHERE alog.diff IS NOT NULL"
+        )
@@ -19,11 +19,20 @@ class AuditlogAutovacuum(models.TransientModel):
             - HTTP requests
             - HTTP user sessions
 
+        With the partitioned storage, the logs are deleted by dropping the
+        monthly partitions of the log and line tables, once all their logs
+        are older than ``days``.
+
         Called from a cron.
         """
         days = (days > 0) and int(days) or 0
         deadline = datetime.now() - timedelta(days=days)
         data_models = ("auditlog.log", "auditlog.http.request", "auditlog.http.session")
+        log_model = self.env["auditlog.log"]
+        if log_model._use_partitioned_storage():
+            log_model._setup_partitioned_storage()
+            log_model._drop_expired_partitions(deadline)
+            data_models = data_models[1:]
         for data_model in data_models:
             records = self.env[data_model].search(
                 [("create_date", "<=", fields.Datetime.to_string(deadline))],
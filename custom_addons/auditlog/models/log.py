@@ -1,9 +1,47 @@
 # Copyright 2015 ABF OSIELL <https://osiell.com>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
-from odoo import _, api, fields, models
+import logging
+from datetime import datetime, timedelta
+
+from odoo import Command, _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import SQL, str2bool
 from odoo.tools.safe_eval import safe_eval
 
+_logger = logging.getLogger(__name__)
+
+# Tables partitioned by month of create_date with the partitioned storage.
+# The lines are listed last: the legacy lines reference the legacy logs.
+PARTITIONED_TABLES = ("auditlog_log", "auditlog_log_line")
+# Suffix of the monthly partitions of the tables
+PARTITION_SUFFIX_FORMAT = "_p%Y%m"
+# Suffix of the tables converted to partitions, holding all the rows
+# created before the month
+LEGACY_PARTITION_SUFFIX_FORMAT = "_p_before_%Y%m"
+# Keys of the line values kept in the diff of the logs
+DIFF_KEYS = (
+    "field_id",
+    "field_name",
+    "field_description",
+    "old_value",
+    "new_value",
+    "old_value_text",
+    "new_value_text",
+)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _diff_value(key, line_vals):
+    """Return the value of a line in the diff of its log, as text like the
+    columns of the lines"""
+    value = line_vals.get(key)
+    if value is None or value is False:
+        return None
+    return value if key == "field_id" else str(value)
+
 
 class AuditlogLog(models.Model):
     _name = "auditlog.log"
@@ -21,6 +59,12 @@ class AuditlogLog(models.Model):
     user_id = fields.Many2one("res.users", string="User")
     method = fields.Char(size=64)
     line_ids = fields.One2many("auditlog.log.line", "log_id", string="Fields updated")
+    # the lines of the logs created with the partitioned storage, see
+    # `_compact_lines`, are only in the diff
+    line_view_ids = fields.One2many(
+        "auditlog.log.line.view", "log_id", string="Fields updated (view)"
+    )
+    diff = fields.Json(readonly=True)
     http_session_id = fields.Many2one(
         "auditlog.http.session", string="Session", index=True
     )
@@ -30,6 +74,10 @@ class AuditlogLog(models.Model):
     log_type = fields.Selection(
         [("full", "Full log"), ("fast", "Fast log")], string="Type"
     )
+    read_fields = fields.Char("Fields Read", readonly=True)
+    fields_hash = fields.Char(
+        readonly=True, help="Hash of the fields read, for aggregated reads"
+    )
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -39,8 +87,46 @@ class AuditlogLog(models.Model):
                 raise UserError(_("No model defined to create log."))
             model = self.env["ir.model"].sudo().browse(vals["model_id"])
             vals.update({"model_name": model.name, "model_model": model.model})
+        if self._use_partitioned_storage():
+            self._ensure_partitions()
+            self._compact_lines(vals_list)
         return super().create(vals_list)
 
+    @api.model
+    def _compact_lines(self, vals_list):
+        """Replace the lines to create by the diff of the logs.
+
+        The diff is a list of the values of the lines, stored as text like
+        the lines do. They are shown with the other lines by the
+        auditlog.log.line.view model.
+        """
+        field_ids = {
+            command[2]["field_id"]
+            for vals in vals_list
+            for command in vals.get("line_ids", ())
+            if command[0] == Command.CREATE
+        }
+        ir_fields = {
+            field.id: field
+            for field in self.env["ir.model.fields"].sudo().browse(field_ids)
+        }
+        for vals in vals_list:
+            commands = vals.get("line_ids")
+            if not commands or any(
+                command[0] != Command.CREATE for command in commands
+            ):
+                continue
+            diff = []
+            for __, __, line_vals in vals.pop("line_ids"):
+                field = ir_fields[line_vals["field_id"]]
+                line_vals = dict(
+                    line_vals,
+                    field_name=field.name,
+                    field_description=field.field_description,
+                )
+                diff.append({key: _diff_value(key, line_vals) for key in DIFF_KEYS})
+            vals["diff"] = diff
+
     def write(self, vals):
         """Update model_name and model_model field values to reflect model_id
         changes."""
@@ -51,6 +137,19 @@ class AuditlogLog(models.Model):
             vals.update({"model_name": model.name, "model_model": model.model})
         return super().write(vals)
 
+    def unlink(self):
+        # the lines of the partitioned logs are not deleted by a foreign key,
+        # see `AuditlogLogLine._auto_init`
+        if self._is_partitioned(self._table):
+            self.env["auditlog.log.line"].search([("log_id", "in", self.ids)]).unlink()
+        return super().unlink()
+
+    @api.model
+    def _search(self, domain, offset=0, limit=None, order=None):
+        # make the logs buffered in the transaction visible
+        self.env["auditlog.rule"]._flush_logs()
+        return super()._search(domain, offset=offset, limit=limit, order=order)
+
     def show_res_ids(self):
         self.ensure_one()
         return {
@@ -58,9 +157,252 @@ class AuditlogLog(models.Model):
             "view_mode": "list,form",
             "res_model": self.model_id.model,
             "domain": [("id", "in", safe_eval(self.res_ids))],
-            "name": _("Exported Records"),
+            "name": _("Read Records")
+            if self.method == "read"
+            else _("Exported Records"),
         }
 
+    @api.model
+    def _use_partitioned_storage(self):
+        """Return whether the logs use the partitioned storage.
+
+        The storage is enabled with the `auditlog.partitioned_storage`
+        system parameter. The autovacuum then converts the log and line
+        tables to tables partitioned by month and drops the expired
+        partitions, and the logs are created with a diff instead of lines.
+        """
+        return str2bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("auditlog.partitioned_storage", "")
+        )
+
+    @api.model
+    def _get_partitions(self, table):
+        """Return the (name, start, end) of the partitions of the table,
+        start is None for the legacy partition, an empty list when the
+        table is not partitioned"""
+        self.env.cr.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid = to_regclass(%s) AND parent.relkind = 'p'
+            """,
+            (table,),
+        )
+        partitions = []
+        for (name,) in self.env.cr.fetchall():
+            try:
+                start = datetime.strptime(name, table + PARTITION_SUFFIX_FORMAT)
+                partitions.append((name, start, _next_month(start)))
+                continue
+            except ValueError:
+                pass
+            try:
+                end = datetime.strptime(name, table + LEGACY_PARTITION_SUFFIX_FORMAT)
+            except ValueError:
+                # not a partition created by auditlog, leave it alone
+                continue
+            partitions.append((name, None, end))
+        return partitions
+
+    @api.model
+    def _is_partitioned(self, table):
+        self.env.cr.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,)
+        )
+        row = self.env.cr.fetchone()
+        return bool(row) and row[0] == "p"
+
+    @api.model
+    def _ensure_partitions(self):
+        """Create the partitions of the current month if they are missing.
+
+        The autovacuum creates them in advance, this is a fallback for
+        databases where it does not run. The months whose partitions exist
+        are remembered by the registry.
+        """
+        month = self.env.cr.now().replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        known = self.pool._auditlog_partitions
+        if month in known:
+            return
+        for table in PARTITIONED_TABLES:
+            if not self._is_partitioned(table):
+                # not converted yet, check again on the next log
+                return
+            self._create_partition(table, month)
+        known.add(month)
+
+    @api.model
+    def _create_partition(self, table, month):
+        """Create the partition of the table for the month starting at
+        ``month``, unless the legacy partition already covers it"""
+        partitions = self._get_partitions(table)
+        if any(start is None and month < end for __, start, end in partitions):
+            return
+        name = table + month.strftime(PARTITION_SUFFIX_FORMAT)
+        self.env.cr.execute(
+            SQL(
+                "CREATE TABLE IF NOT EXISTS %s PARTITION OF %s "
+                "FOR VALUES FROM (%s) TO (%s)",
+                SQL.identifier(name),
+                SQL.identifier(table),
+                month,
+                _next_month(month),
+            )
+        )
+        # the partitioned table has no primary key, as it would have to
+        # include create_date
+        self.env.cr.execute(
+            SQL(
+                "CREATE UNIQUE INDEX IF NOT EXISTS %s ON %s (id)",
+                SQL.identifier(f"{name}_id_index"),
+                SQL.identifier(name),
+            )
+        )
+
+    @api.model
+    def _partition_table(self, table, bound):
+        """Convert the table to a table partitioned by month of create_date.
+
+        The existing table is renamed and attached as the partition of all
+        the rows created before ``bound``, so that its rows are not copied.
+        Its indexes and foreign keys are recreated on the partitioned table,
+        where PostgreSQL reuses them for the legacy partition, except the
+        foreign keys to other partitioned tables, which PostgreSQL does not
+        support without a unique constraint on their id. Attaching the
+        legacy partition scans it, and the tables are locked until the
+        transaction ends.
+        """
+        cr = self.env.cr
+        legacy = table + bound.strftime(LEGACY_PARTITION_SUFFIX_FORMAT)
+        cr.execute(SQL("LOCK TABLE %s IN ACCESS EXCLUSIVE MODE", SQL.identifier(table)))
+        # the rows need a partition key
+        cr.execute(
+            SQL(
+                "UPDATE %s SET create_date = coalesce(write_date, %s) "
+                "WHERE create_date IS NULL",
+                SQL.identifier(table),
+                cr.now(),
+            )
+        )
+        cr.execute(
+            """
+            SELECT idx.relname,
+                   substring(pg_get_indexdef(pg_index.indexrelid) FROM ' USING .*$')
+            FROM pg_index
+            JOIN pg_class idx ON idx.oid = pg_index.indexrelid
+            WHERE pg_index.indrelid = %s::regclass AND NOT pg_index.indisunique
+            """,
+            (table,),
+        )
+        indexes = cr.fetchall()
+        cr.execute(
+            """
+            SELECT con.conname, pg_get_constraintdef(con.oid)
+            FROM pg_constraint con
+            JOIN pg_class ref ON ref.oid = con.confrelid
+            WHERE con.conrelid = %s::regclass AND con.contype = 'f'
+              AND ref.relkind = 'r' AND NOT ref.relispartition
+            """,
+            (table,),
+        )
+        foreign_keys = cr.fetchall()
+        cr.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+        sequence = cr.fetchone()[0]
+
+        cr.execute(
+            SQL(
+                "ALTER TABLE %s RENAME TO %s",
+                SQL.identifier(table),
+                SQL.identifier(legacy),
+            )
+        )
+        for name, __ in indexes:
+            cr.execute(
+                SQL(
+                    "ALTER INDEX %s RENAME TO %s",
+                    SQL.identifier(name),
+                    SQL.identifier(f"{name}_legacy"),
+                )
+            )
+        cr.execute(
+            SQL(
+                "CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (create_date)",
+                SQL.identifier(table),
+                SQL.identifier(legacy),
+            )
+        )
+        if sequence:
+            # keep the sequence of the ids when the legacy partition is dropped
+            cr.execute(
+                SQL(
+                    "ALTER SEQUENCE %s OWNED BY %s",
+                    SQL(sequence),
+                    SQL.identifier(table, "id"),
+                )
+            )
+        cr.execute(
+            SQL(
+                "ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM (MINVALUE) TO (%s)",
+                SQL.identifier(table),
+                SQL.identifier(legacy),
+                bound,
+            )
+        )
+        for name, definition in indexes:
+            cr.execute(
+                SQL(
+                    "CREATE INDEX %s ON %s %s",
+                    SQL.identifier(name),
+                    SQL.identifier(table),
+                    SQL(definition),
+                )
+            )
+        for name, definition in foreign_keys:
+            cr.execute(
+                SQL(
+                    "ALTER TABLE %s ADD CONSTRAINT %s %s",
+                    SQL.identifier(table),
+                    SQL.identifier(name),
+                    SQL(definition),
+                )
+            )
+        _logger.info("%s converted to a partitioned table", table)
+
+    @api.model
+    def _setup_partitioned_storage(self):
+        """Convert the tables to partitioned tables if needed and create the
+        partitions of the current and next months"""
+        month = self.env.cr.now().replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        for table in PARTITIONED_TABLES:
+            if not self._is_partitioned(table):
+                self._partition_table(table, _next_month(month))
+            self._create_partition(table, month)
+            self._create_partition(table, _next_month(month))
+
+    @api.model
+    def _drop_expired_partitions(self, deadline):
+        """Drop the partitions only containing logs created before the
+        deadline, return their number"""
+        dropped = 0
+        for table in reversed(PARTITIONED_TABLES):
+            for name, __, end in self._get_partitions(table):
+                if end <= deadline:
+                    self.env.cr.execute(SQL("DROP TABLE %s", SQL.identifier(name)))
+                    _logger.info("AUTOVACUUM - partition %s dropped", name)
+                    dropped += 1
+        if dropped:
+            self.env.invalidate_all()
+        return dropped
+
 
 class AuditlogLogLine(models.Model):
     _name = "auditlog.log.line"
@@ -79,6 +421,19 @@ class AuditlogLogLine(models.Model):
     field_name = fields.Char("Technical name", readonly=True)
     field_description = fields.Char("Description", readonly=True)
 
+    def _auto_init(self):
+        result = super()._auto_init()
+        log_table = self.env["auditlog.log"]._table
+        if self.env["auditlog.log"]._is_partitioned(log_table):
+            # the partitioned logs have no unique constraint on their id, as
+            # it would have to include create_date, so no foreign key can
+            # reference them: do not let the registry add the one of log_id.
+            # The lines of the logs deleted one by one are deleted by
+            # `AuditlogLog.unlink`, and the partitions of the lines are
+            # dropped with the partitions of their logs.
+            self.pool._foreign_keys.pop((self._table, "log_id"), None)
+        return result
+
     @api.model_create_multi
     def create(self, vals_list):
         """Ensure field_id is not empty on creation and store field_name and
@@ -90,8 +445,17 @@ class AuditlogLogLine(models.Model):
             vals.update(
                 {"field_name": field.name, "field_description": field.field_description}
             )
+        log_model = self.env["auditlog.log"]
+        if log_model._use_partitioned_storage():
+            log_model._ensure_partitions()
         return super().create(vals_list)
 
+    @api.model
+    def _search(self, domain, offset=0, limit=None, order=None):
+        # make the logs buffered in the transaction visible
+        self.env["auditlog.rule"]._flush_logs()
+        return super()._search(domain, offset=offset, limit=limit, order=order)
+
     def write(self, vals):
         """Ensure field_id is set during write and update field_name and
         field_description values."""
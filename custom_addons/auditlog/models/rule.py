@@ -2,10 +2,16 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import copy
+import hashlib
+import json
+import random
+import threading
+import time
 from collections import defaultdict
 
-from odoo import Command, _, api, fields, models
+from odoo import Command, _, api, fields, models, tools
 from odoo.exceptions import UserError
+from odoo.tools import str2bool
 from odoo.tools.misc import OrderedSet
 
 FIELDS_BLACKLIST = [
@@ -20,6 +26,14 @@ FIELDS_BLACKLIST = [
 # Used for performance, to avoid a dictionary instanciation when we need an
 # empty dict to simplify algorithms
 EMPTY_DICT = {}
+# Key of the logs buffered in the transaction, in cr.precommit.data
+AUDITLOG_BUFFER_KEY = "auditlog.buffer"
+# Key of the aggregated reads of the transaction, by user, model and fields
+AUDITLOG_READ_BUFFER_KEY = "auditlog.read_buffer"
+# Maximum number of reads remembered to deduplicate the aggregated reads
+READ_DEDUP_CACHE_SIZE = 10000
+# The cache of the reads is shared by the threads of the process
+READ_DEDUP_CACHE_LOCK = threading.Lock()
 
 
 class DictDiffer:
@@ -120,6 +134,33 @@ class AuditlogRule(models.Model):
             "record of the model of this rule"
         ),
     )
+    log_read_mode = fields.Selection(
+        [("detailed", "Detailed"), ("aggregated", "Aggregated")],
+        string="Read Log Mode",
+        required=True,
+        default="detailed",
+        help=(
+            "Detailed: log every read record with the values of the fields "
+            "read\n"
+            "Aggregated: log the reads of a transaction in a single entry "
+            "per user, model and set of fields, with the ids of the records "
+            "read but without their values"
+        ),
+    )
+    read_sample_rate = fields.Integer(
+        "Read Sampling (%)",
+        default=100,
+        help="Percentage of the read calls logged in aggregated mode",
+    )
+    read_dedup_window = fields.Integer(
+        "Read Deduplication Window (s)",
+        default=0,
+        help=(
+            "In aggregated mode, do not log again the same read (user, "
+            "records and fields) during this number of seconds. The reads "
+            "are deduplicated by each Odoo process."
+        ),
+    )
     log_write = fields.Boolean(
         "Log Writes",
         default=True,
@@ -208,6 +249,10 @@ class AuditlogRule(models.Model):
             self.pool._auditlog_field_cache = {}
         if not hasattr(self.pool, "_auditlog_model_cache"):
             self.pool._auditlog_model_cache = {}
+        if not hasattr(self.pool, "_auditlog_read_cache"):
+            self.pool._auditlog_read_cache = {}
+        if not hasattr(self.pool, "_auditlog_partitions"):
+            self.pool._auditlog_partitions = set()
         if not self:
             self = self.search([("state", "=", "subscribed")])
         return self._patch_methods()
@@ -293,6 +338,8 @@ class AuditlogRule(models.Model):
             model = self.env["ir.model"].sudo().browse(vals["model_id"])
             vals.update({"model_name": model.name, "model_model": model.model})
         new_records = super().create(vals_list)
+        # settings cached by _get_rule_settings
+        self.env.registry.clear_cache()
         updated = [record._register_hook() for record in new_records]
         if any(updated):
             self._update_registry()
@@ -306,6 +353,7 @@ class AuditlogRule(models.Model):
             model = self.env["ir.model"].sudo().browse(vals["model_id"])
             vals.update({"model_name": model.name, "model_model": model.model})
         res = super().write(vals)
+        self.env.registry.clear_cache()
         if self._register_hook():
             self._update_registry()
         return res
@@ -313,6 +361,7 @@ class AuditlogRule(models.Model):
     def unlink(self):
         """Unsubscribe rules before removing them."""
         self.unsubscribe()
+        self.env.registry.clear_cache()
         return super().unlink()
 
     @api.model
@@ -401,6 +450,8 @@ class AuditlogRule(models.Model):
         self.ensure_one()
         log_type = self.log_type
         users_to_exclude = self.mapped("users_to_exclude_ids")
+        sample_rate = self.read_sample_rate
+        dedup_window = self.read_dedup_window
 
         def read(self, fields=None, load="_classic_read", **kwargs):
             result = read.origin(self, fields, load, **kwargs)
@@ -433,7 +484,27 @@ class AuditlogRule(models.Model):
             )
             return result
 
-        return read
+        def read_aggregated(self, fields=None, load="_classic_read", **kwargs):
+            result = read_aggregated.origin(self, fields, load, **kwargs)
+            if self.env.context.get("auditlog_disabled") or not result:
+                return result
+            if self.env.user in users_to_exclude:
+                return result
+            if sample_rate < 100 and random.random() * 100 >= sample_rate:
+                return result
+            result2 = result if isinstance(result, list) else [result]
+            field_names = sorted(set(result2[0]) - {"id"})
+            self.env["auditlog.rule"].sudo()._buffer_read(
+                self.env.uid,
+                self._name,
+                [d["id"] for d in result2],
+                field_names,
+                dedup_window,
+                {"log_type": log_type},
+            )
+            return result
+
+        return read if self.log_read_mode == "detailed" else read_aggregated
 
     def _make_write(self):
         """Instanciate a write method that log its calls."""
@@ -587,62 +658,316 @@ class AuditlogRule(models.Model):
     ):
         """Create logs. `old_values` and `new_values` are dictionaries, e.g:
         {RES_ID: {'FIELD': VALUE, ...}}
+
+        Except for exports, the logs are not created right away: the values
+        are buffered for the transaction and the logs of all the calls are
+        created at once by `_flush_logs`, before the commit or before logs
+        are searched.
         """
         if old_values is None:
             old_values = EMPTY_DICT
         if new_values is None:
             new_values = EMPTY_DICT
-        log_model = self.env["auditlog.log"]
-        http_request_model = self.env["auditlog.http.request"]
-        http_session_model = self.env["auditlog.http.session"]
-        model_model = self.env[res_model]
         model_id = self.pool._auditlog_model_cache[res_model]
-        auditlog_rule = self.env["auditlog.rule"].search([("model_id", "=", model_id)])
-        fields_to_exclude = auditlog_rule.fields_to_exclude_ids.mapped("name")
-
-        vals = {
-            "model_id": model_id,
-            "method": method,
-            "user_id": uid,
-            "http_request_id": http_request_model.current_http_request(),
-            "http_session_id": http_session_model.current_http_session(),
-        }
-        vals.update(additional_log_values or {})
         if method == "export_data":
-            vals.update({"name": res_model, "res_ids": str(res_ids)})
+            log_model = self.env["auditlog.log"]
+            http_request_model = self.env["auditlog.http.request"]
+            http_session_model = self.env["auditlog.http.session"]
+            vals = {
+                "model_id": model_id,
+                "method": method,
+                "user_id": uid,
+                "http_request_id": http_request_model.current_http_request(),
+                "http_session_id": http_session_model.current_http_session(),
+                "name": res_model,
+                "res_ids": str(res_ids),
+            }
+            vals.update(additional_log_values or {})
             return log_model.create(vals)
 
-        for res_id in res_ids:
-            res = model_model.browse(res_id)
-            log_vals = {**vals, "name": res.display_name, "res_id": res_id}
+        names = {}
+        if method == "write":
+            # only keep the changed values, the buffer may hold many records
+            trimmed_old_values, trimmed_new_values = {}, {}
+            for res_id in res_ids:
+                old = old_values.get(res_id, EMPTY_DICT)
+                new = new_values.get(res_id, EMPTY_DICT)
+                changed = DictDiffer(new, old).changed()
+                if changed:
+                    trimmed_old_values[res_id] = {name: old[name] for name in changed}
+                    trimmed_new_values[res_id] = {name: new[name] for name in changed}
+            old_values, new_values = trimmed_old_values, trimmed_new_values
+            res_ids = list(old_values)
+            if not res_ids:
+                return
+        elif method == "unlink":
+            # the records do not exist anymore when the buffer is flushed
+            records = self.env[res_model].browse(res_ids)
+            names = dict(zip(records.ids, records.mapped("display_name"), strict=True))
+        self._buffer_logs(
+            {
+                "uid": uid,
+                "res_model": res_model,
+                "model_id": model_id,
+                "method": method,
+                "res_ids": list(res_ids),
+                "old_values": [old_values.get(res_id) for res_id in res_ids],
+                "new_values": [new_values.get(res_id) for res_id in res_ids],
+                "names": [names.get(res_id) for res_id in res_ids],
+                "additional_log_values": additional_log_values or {},
+            }
+        )
+
+    def _buffer_logs(self, log_data):
+        """Add the data of a call to the logs buffered in the transaction"""
+        precommit = self.env.cr.precommit
+        if AUDITLOG_BUFFER_KEY not in precommit.data:
+            precommit.data[AUDITLOG_BUFFER_KEY] = []
+            precommit.add(self.env["auditlog.rule"].sudo()._flush_logs)
+        precommit.data[AUDITLOG_BUFFER_KEY].append(log_data)
 
-            diff = DictDiffer(
-                new_values.get(res_id, EMPTY_DICT), old_values.get(res_id, EMPTY_DICT)
+    def _buffer_read(
+        self,
+        uid,
+        res_model,
+        res_ids,
+        field_names,
+        dedup_window=0,
+        additional_log_values=None,
+    ):
+        """Add a read to the aggregated read log of the transaction for the
+        user, model and fields, unless the same read was logged less than
+        ``dedup_window`` seconds ago"""
+        fields_hash = hashlib.sha1(",".join(field_names).encode()).hexdigest()
+        if dedup_window:
+            ids_hash = hashlib.sha1(repr(sorted(res_ids)).encode()).hexdigest()
+            if self._is_read_duplicate(
+                (uid, res_model, fields_hash, ids_hash), dedup_window
+            ):
+                return
+        reads = self.env.cr.precommit.data.setdefault(AUDITLOG_READ_BUFFER_KEY, {})
+        key = (uid, res_model, fields_hash)
+        if key in reads:
+            log_data, logged_ids = reads[key]
+            new_ids = [id_ for id_ in res_ids if id_ not in logged_ids]
+            log_data["res_ids"].extend(new_ids)
+            logged_ids.update(new_ids)
+            return
+        log_data = {
+            "uid": uid,
+            "res_model": res_model,
+            "model_id": self.pool._auditlog_model_cache[res_model],
+            "method": "read",
+            "aggregated": True,
+            "res_ids": list(res_ids),
+            "fields_hash": fields_hash,
+            "read_fields": ",".join(field_names),
+            "old_values": [],
+            "new_values": [],
+            "additional_log_values": additional_log_values or {},
+        }
+        reads[key] = (log_data, set(res_ids))
+        self._buffer_logs(log_data)
+
+    def _is_read_duplicate(self, key, window):
+        """Return whether the read ``key`` was logged by this process in the
+        last ``window`` seconds, and remember it otherwise"""
+        cache = self.pool._auditlog_read_cache
+        now = time.monotonic()
+        with READ_DEDUP_CACHE_LOCK:
+            if cache.get(key, 0) > now:
+                return True
+            if len(cache) >= READ_DEDUP_CACHE_SIZE:
+                for expired in [k for k, expiry in cache.items() if expiry <= now]:
+                    del cache[expired]
+                if len(cache) >= READ_DEDUP_CACHE_SIZE:
+                    cache.clear()
+            cache[key] = now + window
+        return False
+
+    @api.model
+    def _flush_logs(self):
+        """Create the logs buffered in the transaction.
+
+        When the `auditlog.async` system parameter is set and queue_job is
+        installed, the logs are created by a job instead, so that the
+        requests do not wait for them.
+        """
+        logs = self.env.cr.precommit.data.pop(AUDITLOG_BUFFER_KEY, None)
+        self.env.cr.precommit.data.pop(AUDITLOG_READ_BUFFER_KEY, None)
+        if not logs:
+            return
+        self = self.sudo().with_context(auditlog_disabled=True)
+        http_request_id = self.env["auditlog.http.request"].current_http_request()
+        http_session_id = self.env["auditlog.http.session"].current_http_session()
+        if self._use_queue_job():
+            # the job arguments must be serializable, the values are logged
+            # as text anyway
+            self.with_delay(
+                description=_("Create audit logs")
+            )._write_logs_job(
+                json.dumps(logs, default=str), http_request_id, http_session_id
             )
-            if method == "create":
-                log_vals["line_ids"] = self._create_log_line_on_create(
-                    log_vals, diff.added(), new_values, fields_to_exclude
+            return
+        self._write_logs(logs, http_request_id, http_session_id)
+
+    @api.model
+    def _use_queue_job(self):
+        return hasattr(self, "with_delay") and str2bool(
+            self.env["ir.config_parameter"].sudo().get_param("auditlog.async", "")
+        )
+
+    @api.model
+    def _write_logs_job(self, logs_json, http_request_id=False, http_session_id=False):
+        self = self.with_context(auditlog_disabled=True)
+        self._write_logs(json.loads(logs_json), http_request_id, http_session_id)
+
+    @api.model
+    @tools.ormcache("model_id")
+    def _get_rule_settings(self, model_id):
+        """Return the fields to exclude and capture_record of the model rule"""
+        rule = self.sudo().search([("model_id", "=", model_id)], limit=1)
+        return tuple(rule.fields_to_exclude_ids.mapped("name")), rule.capture_record
+
+    def _get_log_names(self, logs):
+        """Return the display names of the logged records, by model and id,
+        computed in one batch per model"""
+        names = defaultdict(dict)
+        ids_by_model = defaultdict(set)
+        for log in logs:
+            if log.get("aggregated"):
+                continue
+            if log["method"] == "unlink":
+                names[log["res_model"]].update(
+                    zip(log["res_ids"], log["names"], strict=True)
                 )
-            elif method == "read":
-                log_vals["line_ids"] = self._create_log_line_on_read(
-                    log_vals,
-                    list(old_values.get(res_id, EMPTY_DICT).keys()),
-                    old_values,
-                    fields_to_exclude,
+            else:
+                ids_by_model[log["res_model"]].update(log["res_ids"])
+        for res_model, ids in ids_by_model.items():
+            # records created in the transaction may be deleted since
+            records = self.env[res_model].browse(ids).exists()
+            names[res_model].update(
+                zip(records.ids, records.mapped("display_name"), strict=True)
+            )
+        return names
+
+    def _get_existing_related_ids(self, logs):
+        """Return the existing ids of the records referenced by the logged
+        x2many fields, by model, and prefetch their display names."""
+        ids_by_model = defaultdict(set)
+        for log in logs:
+            for values in (log["old_values"], log["new_values"]):
+                for record_values in values:
+                    for field_name, value in (record_values or EMPTY_DICT).items():
+                        field = self._get_field(log["model_id"], field_name)
+                        if (
+                            field
+                            and field["relation"]
+                            and "2many" in field["ttype"]
+                            and isinstance(value, list)
+                        ):
+                            ids_by_model[field["relation"]].update(
+                                id_ for id_ in value if isinstance(id_, int)
+                            )
+        existing_ids = {}
+        for relation, ids in ids_by_model.items():
+            records = self.env[relation].browse(ids).exists()
+            records.mapped("display_name")
+            existing_ids[relation] = set(records.ids)
+        return existing_ids
+
+    @api.model
+    def _write_logs(self, logs, http_request_id=False, http_session_id=False):
+        """Create the logs of buffered calls, see `create_logs`.
+
+        The display names of the records are computed by batches and the
+        logs and their lines are created with a single `create`, which
+        inserts them with multi-rows queries.
+        """
+        names = self._get_log_names(logs)
+        existing_ids = self._get_existing_related_ids(logs)
+        log_vals_list = []
+        for log in logs:
+            method = log["method"]
+            fields_to_exclude, capture_record = self._get_rule_settings(
+                log["model_id"]
+            )
+            fields_to_exclude = list(fields_to_exclude)
+            vals = {
+                "model_id": log["model_id"],
+                "method": method,
+                "user_id": log["uid"],
+                "http_request_id": http_request_id,
+                "http_session_id": http_session_id,
+            }
+            vals.update(log["additional_log_values"])
+            if log.get("aggregated"):
+                log_vals_list.append(
+                    {
+                        **vals,
+                        "name": log["res_model"],
+                        "res_ids": str(log["res_ids"]),
+                        "fields_hash": log["fields_hash"],
+                        "read_fields": log["read_fields"],
+                    }
                 )
-            elif method == "write":
-                log_vals["line_ids"] = self._create_log_line_on_write(
-                    log_vals, diff.changed(), old_values, new_values, fields_to_exclude
+                continue
+            old_values = {
+                res_id: values or EMPTY_DICT
+                for res_id, values in zip(
+                    log["res_ids"], log["old_values"], strict=True
                 )
-            elif method == "unlink" and auditlog_rule.capture_record:
-                log_vals["line_ids"] = self._create_log_line_on_read(
-                    log_vals,
-                    list(old_values.get(res_id, EMPTY_DICT).keys()),
-                    old_values,
-                    fields_to_exclude,
+            }
+            new_values = {
+                res_id: values or EMPTY_DICT
+                for res_id, values in zip(
+                    log["res_ids"], log["new_values"], strict=True
                 )
-            if method == "unlink" or log_vals.get("line_ids", {}):
-                log_model.create(log_vals)
+            }
+            model_names = names[log["res_model"]]
+            for res_id in log["res_ids"]:
+                log_vals = {
+                    **vals,
+                    "name": model_names.get(res_id, False),
+                    "res_id": res_id,
+                }
+                diff = DictDiffer(new_values[res_id], old_values[res_id])
+                if method == "create":
+                    log_vals["line_ids"] = self._create_log_line_on_create(
+                        log_vals,
+                        diff.added(),
+                        new_values,
+                        fields_to_exclude,
+                        existing_ids=existing_ids,
+                    )
+                elif method == "read":
+                    log_vals["line_ids"] = self._create_log_line_on_read(
+                        log_vals,
+                        list(old_values[res_id].keys()),
+                        old_values,
+                        fields_to_exclude,
+                        existing_ids=existing_ids,
+                    )
+                elif method == "write":
+                    log_vals["line_ids"] = self._create_log_line_on_write(
+                        log_vals,
+                        diff.changed(),
+                        old_values,
+                        new_values,
+                        fields_to_exclude,
+                        existing_ids=existing_ids,
+                    )
+                elif method == "unlink" and capture_record:
+                    log_vals["line_ids"] = self._create_log_line_on_read(
+                        log_vals,
+                        list(old_values[res_id].keys()),
+                        old_values,
+                        fields_to_exclude,
+                        existing_ids=existing_ids,
+                    )
+                if method == "unlink" or log_vals.get("line_ids", {}):
+                    log_vals_list.append(log_vals)
+        return self.env["auditlog.log"].create(log_vals_list)
 
     def _get_field(self, model_id, field_name):
         model = self.env["ir.model"].sudo().browse(model_id)
@@ -668,7 +993,7 @@ class AuditlogRule(models.Model):
         return cache[model.model][field_name]
 
     def _create_log_line_on_read(
-        self, log_vals, fields_list, read_values, fields_to_exclude
+        self, log_vals, fields_list, read_values, fields_to_exclude, existing_ids=None
     ):
         """Log field filled on a 'read' operation."""
         fields_to_exclude = fields_to_exclude + FIELDS_BLACKLIST
@@ -682,13 +1007,15 @@ class AuditlogRule(models.Model):
                 line_vals.append(
                     Command.create(
                         self._prepare_log_line_vals_on_read(
-                            log_vals, field, read_values
+                            log_vals, field, read_values, existing_ids=existing_ids
                         )
                     )
                 )
         return line_vals
 
-    def _prepare_log_line_vals_on_read(self, log_vals, field, read_values):
+    def _prepare_log_line_vals_on_read(
+        self, log_vals, field, read_values, existing_ids=None
+    ):
         """Prepare the dictionary of values used to create a log line on a
         'read' operation.
         """
@@ -700,14 +1027,19 @@ class AuditlogRule(models.Model):
             "new_value_text": False,
         }
         if field["relation"] and "2many" in field["ttype"]:
-            vals["old_value_text"] = [
-                (x.id, x.display_name)
-                for x in self.env[field["relation"]].browse(vals["old_value"])
-            ]
+            vals["old_value_text"] = self._get_x2many_value_text(
+                field["relation"], vals["old_value"], existing_ids
+            )
         return vals
 
     def _create_log_line_on_write(
-        self, log_vals, fields_list, old_values, new_values, fields_to_exclude
+        self,
+        log_vals,
+        fields_list,
+        old_values,
+        new_values,
+        fields_to_exclude,
+        existing_ids=None,
     ):
         """Log field updated on a 'write' operation."""
         fields_to_exclude = fields_to_exclude + FIELDS_BLACKLIST
@@ -721,13 +1053,19 @@ class AuditlogRule(models.Model):
                 line_vals.append(
                     Command.create(
                         self._prepare_log_line_vals_on_write(
-                            log_vals, field, old_values, new_values
+                            log_vals,
+                            field,
+                            old_values,
+                            new_values,
+                            existing_ids=existing_ids,
                         )
                     )
                 )
         return line_vals
 
-    def _prepare_log_line_vals_on_write(self, log_vals, field, old_values, new_values):
+    def _prepare_log_line_vals_on_write(
+        self, log_vals, field, old_values, new_values, existing_ids=None
+    ):
         """Prepare the dictionary of values used to create a log line on a
         'write' operation.
         """
@@ -744,29 +1082,39 @@ class AuditlogRule(models.Model):
             and field["relation"]
             and "2many" in field["ttype"]
         ):
-            # Filter IDs to prevent a 'display_name' call on deleted resources
-            existing_ids = self.env[field["relation"]]._search(
-                [("id", "in", vals["old_value"])]
+            vals["old_value_text"] = self._get_x2many_value_text(
+                field["relation"], vals["old_value"], existing_ids
+            )
+            vals["new_value_text"] = self._get_x2many_value_text(
+                field["relation"], vals["new_value"], existing_ids
             )
-            old_value_text = []
-            if existing_ids:
-                old_value_text = [
-                    (x.id, x.display_name)
-                    for x in self.env[field["relation"]].browse(existing_ids)
-                ]
-            # Deleted resources will have a 'DELETED' text representation
-            deleted_ids = set(vals["old_value"]) - set(existing_ids)
-            for deleted_id in deleted_ids:
-                old_value_text.append((deleted_id, "DELETED"))
-            vals["old_value_text"] = old_value_text
-            vals["new_value_text"] = [
-                (x.id, x.display_name)
-                for x in self.env[field["relation"]].browse(vals["new_value"])
-            ]
         return vals
 
+    def _get_x2many_value_text(self, relation, ids, existing_ids=None):
+        """Return the text representation of the value of a x2many field,
+        as a list of (id, display_name).
+
+        ``existing_ids`` maps the related models to the ids known to exist,
+        as returned by `_get_existing_related_ids`.
+        """
+        # Filter IDs to prevent a 'display_name' call on deleted resources
+        if existing_ids is not None and relation in existing_ids:
+            existing = [id_ for id_ in ids if id_ in existing_ids[relation]]
+        else:
+            existing = self.env[relation]._search([("id", "in", ids)])
+        value_text = []
+        if existing:
+            value_text = [
+                (x.id, x.display_name) for x in self.env[relation].browse(existing)
+            ]
+        # Deleted resources will have a 'DELETED' text representation
+        deleted_ids = set(ids) - set(existing)
+        for deleted_id in deleted_ids:
+            value_text.append((deleted_id, "DELETED"))
+        return value_text
+
     def _create_log_line_on_create(
-        self, log_vals, fields_list, new_values, fields_to_exclude
+        self, log_vals, fields_list, new_values, fields_to_exclude, existing_ids=None
     ):
         """Log field filled on a 'create' operation."""
         fields_to_exclude = fields_to_exclude + FIELDS_BLACKLIST
@@ -780,13 +1128,15 @@ class AuditlogRule(models.Model):
                 line_vals.append(
                     Command.create(
                         self._prepare_log_line_vals_on_create(
-                            log_vals, field, new_values
+                            log_vals, field, new_values, existing_ids=existing_ids
                         )
                     )
                 )
         return line_vals
 
-    def _prepare_log_line_vals_on_create(self, log_vals, field, new_values):
+    def _prepare_log_line_vals_on_create(
+        self, log_vals, field, new_values, existing_ids=None
+    ):
         """Prepare the dictionary of values used to create a log line on a
         'create' operation.
         """
@@ -802,10 +1152,9 @@ class AuditlogRule(models.Model):
             and field["relation"]
             and "2many" in field["ttype"]
         ):
-            vals["new_value_text"] = [
-                (x.id, x.display_name)
-                for x in self.env[field["relation"]].browse(vals["new_value"])
-            ]
+            vals["new_value_text"] = self._get_x2many_value_text(
+                field["relation"], vals["new_value"], existing_ids
+            )
         return vals
 
     def subscribe(self):
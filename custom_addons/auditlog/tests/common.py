@@ -9,6 +9,12 @@ class AuditLogRuleCommon(TransactionCase):
         super().setUpClass()
         cls.models = set()
 
+    def setUp(self):
+        # create the logs buffered in setUpClass before the savepoint of the
+        # test, so that they are shared by the tests
+        self.env["auditlog.rule"]._flush_logs()
+        super().setUp()
+
     @classmethod
     def create_rule(cls, vals):
         rule = cls.env["auditlog.rule"].with_context(tracking_disable=True).create(vals)
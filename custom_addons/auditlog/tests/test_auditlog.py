@@ -3,9 +3,12 @@
 # © 2021 Stefan Rijnhart <stefan@opener.amsterdam>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import json
+
 from odoo.addons.base.models.ir_model import MODULE_UNINSTALL_FLAG
 from odoo.addons.base.models.res_users import name_boolean_group
 
+from ..models.rule import AUDITLOG_BUFFER_KEY
 from .common import AuditLogRuleCommon
 
 
@@ -767,3 +770,127 @@ class AuditlogFast_excluded_fields(AuditLogRuleCommon):
                 ]
             )
         )
+
+
+class TestAuditlogBuffer(AuditLogRuleCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.groups_model_id = cls.env.ref("base.model_res_groups").id
+        cls.groups_rule = cls.create_rule(
+            {
+                "name": "testrule for groups",
+                "model_id": cls.groups_model_id,
+                "log_create": True,
+                "log_write": True,
+                "log_unlink": True,
+                "log_type": "full",
+            }
+        )
+        cls.groups_rule.subscribe()
+
+    def _search_logs(self, method, groups):
+        return self.env["auditlog.log"].search(
+            [
+                ("model_id", "=", self.groups_model_id),
+                ("method", "=", method),
+                ("res_id", "in", groups.ids),
+            ]
+        )
+
+    def test_logs_created_on_flush(self):
+        groups = self.env["res.groups"].create(
+            [{"name": "testgroup1"}, {"name": "testgroup2"}]
+        )
+        groups.write({"comment": "changed"})
+        buffer = self.env.cr.precommit.data[AUDITLOG_BUFFER_KEY]
+        self.assertEqual(buffer[-1]["method"], "write")
+        # only the changed values are kept
+        self.assertEqual(set(buffer[-1]["new_values"][0]), {"comment"})
+        self.env.cr.flush()
+        self.assertNotIn(AUDITLOG_BUFFER_KEY, self.env.cr.precommit.data)
+        logs = self._search_logs("write", groups)
+        self.assertEqual(len(logs), 2)
+        self.assertEqual(set(logs.mapped("name")), {"testgroup1", "testgroup2"})
+        self.assertEqual(logs.line_ids.mapped("field_name"), ["comment", "comment"])
+
+    def test_deleted_record_name(self):
+        """The name of a record deleted in the transaction is kept"""
+        group = self.env["res.groups"].create({"name": "testgroup1"})
+        group.unlink()
+        logs = self._search_logs("create", group) + self._search_logs("unlink", group)
+        self.assertEqual(logs.mapped("name"), ["testgroup1", "testgroup1"])
+
+    def test_write_logs_job(self):
+        """Buffered logs can be serialized to be created by a job"""
+        group = self.env["res.groups"].create({"name": "testgroup1"})
+        group.write({"name": "testgroup2"})
+        logs = self.env.cr.precommit.data.pop(AUDITLOG_BUFFER_KEY)
+        self.assertFalse(self._search_logs("write", group))
+        self.env["auditlog.rule"].sudo()._write_logs_job(
+            json.dumps(logs, default=str)
+        )
+        line = self._search_logs("write", group).line_ids
+        self.assertEqual(line.field_name, "name")
+        self.assertEqual(line.old_value, "testgroup1")
+        self.assertEqual(line.new_value, "testgroup2")
+
+
+class TestAuditlogAggregatedRead(AuditLogRuleCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.groups_model_id = cls.env.ref("base.model_res_groups").id
+        cls.groups_rule = cls.create_rule(
+            {
+                "name": "testrule for groups",
+                "model_id": cls.groups_model_id,
+                "log_read": True,
+                "log_read_mode": "aggregated",
+                "read_dedup_window": 60,
+                "log_create": False,
+                "log_write": False,
+                "log_unlink": False,
+            }
+        )
+        cls.groups_rule.subscribe()
+        cls.groups = cls.env["res.groups"].create(
+            [{"name": "testgroup1"}, {"name": "testgroup2"}, {"name": "testgroup3"}]
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.env.registry._auditlog_read_cache.clear()
+
+    def _search_read_logs(self):
+        return self.env["auditlog.log"].search(
+            [("model_id", "=", self.groups_model_id), ("method", "=", "read")]
+        )
+
+    def test_aggregated_read(self):
+        """The reads of a transaction are logged in one entry per fields"""
+        self.groups[:2].read(["name"])
+        self.groups[1:].read(["name"])
+        self.groups.read(["name", "comment"])
+        logs = self._search_read_logs()
+        self.assertEqual(len(logs), 2)
+        self.assertFalse(logs.line_ids)
+        name_log = logs.filtered(lambda log: log.read_fields == "name")
+        self.assertEqual(name_log.res_ids, str(self.groups.ids))
+        self.assertEqual(name_log.user_id, self.env.user)
+        self.assertTrue(name_log.fields_hash)
+
+    def test_dedup_window(self):
+        self.groups.read(["name"])
+        self.assertEqual(len(self._search_read_logs()), 1)
+        self.groups.read(["name"])
+        self.assertEqual(len(self._search_read_logs()), 1)
+        self.groups[:1].read(["name"])
+        self.assertEqual(len(self._search_read_logs()), 2)
+
+    def test_sampling(self):
+        self.groups_rule.unsubscribe()
+        self.groups_rule.write({"read_sample_rate": 0})
+        self.groups_rule.subscribe()
+        self.groups.read(["name"])
+        self.assertFalse(self._search_read_logs())
@@ -1,6 +1,7 @@
 # Copyright 2016 ABF OSIELL <https://osiell.com>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 import time
+from datetime import datetime, timedelta
 
 from .common import AuditLogRuleCommon
 
@@ -42,3 +43,69 @@ class TestAuditlogAutovacuum(AuditLogRuleCommon):
             [("model_id", "=", self.groups_model_id), ("res_id", "=", group.id)]
         )
         self.assertEqual(nb_logs, 0)
+
+    def test_partitioned_storage(self):
+        log_model = self.env["auditlog.log"]
+        self.env["ir.config_parameter"].sudo().set_param(
+            "auditlog.partitioned_storage", "True"
+        )
+        self.addCleanup(self.registry._auditlog_partitions.clear)
+        self.env["auditlog.autovacuum"].autovacuum(days=30)
+        self.assertTrue(log_model._is_partitioned("auditlog_log"))
+        self.assertTrue(log_model._is_partitioned("auditlog_log_line"))
+
+        group = self.env["res.groups"].create({"name": "testgroup2"})
+        log = log_model.search(
+            [
+                ("model_id", "=", self.groups_model_id),
+                ("res_id", "=", group.id),
+                ("method", "=", "create"),
+            ]
+        )
+        self.assertEqual(len(log), 1)
+        self.assertTrue(log.diff)
+        self.assertFalse(log.line_ids)
+        name_line = log.line_view_ids.filtered(lambda line: line.field_name == "name")
+        self.assertEqual(name_line.new_value_text, "testgroup2")
+        self.assertEqual(name_line.field_id.name, "name")
+
+        log_model._drop_expired_partitions(datetime.now() + timedelta(days=62))
+        self.assertFalse(log_model.search([("res_id", "=", group.id)]))
+
+    def test_partitioned_storage_update(self):
+        """The module can be updated once the tables are partitioned"""
+        log_model = self.env["auditlog.log"]
+        self.env["ir.config_parameter"].sudo().set_param(
+            "auditlog.partitioned_storage", "True"
+        )
+        self.addCleanup(self.registry._auditlog_partitions.clear)
+        self.env["auditlog.autovacuum"].autovacuum(days=30)
+        self.registry.init_models(
+            self.env.cr,
+            ["auditlog.log", "auditlog.log.line"],
+            {"module": "auditlog"},
+            install=False,
+        )
+        # no foreign key can reference the partitioned logs
+        self.env.cr.execute(
+            """
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = 'auditlog_log_line'::regclass
+              AND confrelid = 'auditlog_log'::regclass
+            """
+        )
+        self.assertFalse(self.env.cr.fetchall())
+
+        # the lines are deleted with their log all the same
+        log = log_model.create(
+            {"model_id": self.groups_model_id, "res_id": 1, "method": "write"}
+        )
+        line = self.env["auditlog.log.line"].create(
+            {
+                "log_id": log.id,
+                "field_id": self.env.ref("base.field_res_groups__name").id,
+                "new_value": "testgroup3",
+            }
+        )
+        log.unlink()
+        self.assertFalse(line.exists())
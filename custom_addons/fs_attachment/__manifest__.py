@@ -13,6 +13,7 @@
     "depends": ["fs_storage"],
     "website": "https://github.com/OCA/storage",
     "data": [
+        "security/fs_attachment_migration.xml",
         "security/fs_file_gc.xml",
         "views/fs_storage.xml",
     ],
@@ -0,0 +1,236 @@
+# Copyright 2026 Safee Analytics
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_logger = logging.getLogger(__name__)
+
+# The eviction deletes files until the cache is below this fraction of its
+# size, so that it does not run on every write once the cache is full
+EVICTION_TARGET_RATIO = 0.9
+# Files larger than this fraction of the cache size are not cached, they
+# would evict too many files
+MAX_FILE_SIZE_RATIO = 0.1
+# Seconds between two scans of the cache directory by a process writing in
+# it: the other processes write in the cache too
+SCAN_INTERVAL = 300
+# Seconds between two updates of the modification time of a cached file
+# read, which is the last use time of the files for the eviction
+TOUCH_INTERVAL = 60
+# Age, in seconds, of the temporary files left by interrupted writes
+# deleted by the eviction
+STALE_TEMPORARY_FILE_AGE = 3600
+TEMPORARY_FILE_PREFIX = ".tmp"
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class FsFileCache:
+    """Size bounded cache of file contents in a local directory
+
+    The contents are stored in files named after the sha256 of their key.
+    The cache can be shared by the processes of a server: a file is written
+    into a temporary file renamed once complete, and a lock file ensures
+    that only one process evicts files at a time. The least recently used
+    files are evicted first, according to their modification time, which
+    is updated when they are read.
+
+    The hits, misses and evictions counters are the ones of the current
+    process.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # size of the cache at the last scan, and size written since then
+        # by this process
+        self._scanned_size = None
+        self._scanned_at = 0
+        self._written = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _file_path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.path, digest[:2], digest)
+
+    def accepts(self, size):
+        """Return whether files of this size are cached"""
+        return size <= self.max_size * MAX_FILE_SIZE_RATIO
+
+    def get_path(self, key):
+        """Return the path of the file caching the content of the key, None
+        if it is not cached"""
+        path = self._file_path(key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                # evicted meanwhile
+                pass
+        return path
+
+    def get(self, key):
+        """Return the content cached for the key, None if it is not cached"""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            # evicted meanwhile
+            return None
+
+    def set(self, key, data):
+        """Cache the content of the key
+
+        Return the path of the file caching it, None if it is not cached.
+        """
+        if not self.accepts(len(data)):
+            return None
+        return self._store(key, lambda f: f.write(data))
+
+    def set_file(self, key, file):
+        """Cache the content of the key read from a file object, by blocks
+
+        Return the path of the file caching it, None if it is not cached.
+        """
+        return self._store(
+            key, lambda f: shutil.copyfileobj(file, f, COPY_BUFFER_SIZE)
+        )
+
+    def _store(self, key, write):
+        path = self._file_path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=TEMPORARY_FILE_PREFIX)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                    size = f.tell()
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            _logger.warning("Could not cache %s in %s", key, self.path, exc_info=True)
+            return None
+        with self._lock:
+            self._written += size
+            must_scan = (
+                self._scanned_size is None
+                or self._scanned_size + self._written > self.max_size
+                or time.monotonic() - self._scanned_at > SCAN_INTERVAL
+            )
+        if must_scan:
+            self.evict()
+        return path
+
+    def discard(self, key):
+        """Remove the content of the key from the cache"""
+        try:
+            os.unlink(self._file_path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """Delete the least recently used files if the cache is full
+
+        Return the number of files deleted.
+        """
+        evicted = 0
+        with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # another process is evicting files
+                    return evicted
+            files = []
+            total = 0
+            now = time.time()
+            for entry in self._scan():
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.startswith(TEMPORARY_FILE_PREFIX):
+                    if now - stat.st_mtime > STALE_TEMPORARY_FILE_AGE:
+                        self._unlink(entry.path)
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            if total > self.max_size:
+                target = self.max_size * EVICTION_TARGET_RATIO
+                for __, size, path in sorted(files):
+                    if total <= target:
+                        break
+                    if self._unlink(path):
+                        total -= size
+                        evicted += 1
+        with self._lock:
+            self._scanned_size = total
+            self._scanned_at = time.monotonic()
+            self._written = 0
+            self.evictions += evicted
+        if evicted:
+            _logger.info("%d files evicted from the file cache %s", evicted, self.path)
+        return evicted
+
+    def _scan(self):
+        for directory in os.scandir(self.path):
+            if directory.is_dir():
+                yield from os.scandir(directory.path)
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return False
+        return True
+
+    def stats(self):
+        """Return the counters of the cache for the current process"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": (self._scanned_size or 0) + self._written,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_file_cache(path, max_size):
+    """Return the cache of the directory, shared by the threads of the
+    process"""
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None or cache.max_size != max_size:
+            cache = _caches[path] = FsFileCache(path, max_size)
+        return cache
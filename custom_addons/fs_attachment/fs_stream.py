@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from odoo.http import STATIC_CACHE_LONG, Response, Stream, request
 
-from .models.ir_attachment import IrAttachment
+from .models.ir_attachment import STREAM_BLOCK_SIZE, IrAttachment
 
 try:
     from werkzeug.utils import secure_filename
@@ -32,9 +32,21 @@ class FsStream(Stream):
             fs_attachment=attachment,
         )
 
+    def _open_fs_attachment(self):
+        """Open the file of the attachment, from the local cache of its
+        storage if it uses one"""
+        path = self.fs_attachment._fs_get_cached_file_path()
+        if path:
+            try:
+                return open(path, "rb")
+            except OSError:
+                # evicted meanwhile, read from the storage
+                pass
+        return self.fs_attachment.open("rb", block_size=STREAM_BLOCK_SIZE)
+
     def read(self):
         if self.type == "fs":
-            with self.fs_attachment.open("rb") as f:
+            with self._open_fs_attachment() as f:
                 return f.read()
         return super().read()
 
@@ -70,8 +82,22 @@ class FsStream(Stream):
         # The file will be closed by werkzeug...
         send_file_kwargs["use_x_sendfile"] = use_x_sendfile
         if not use_x_sendfile:
-            f = self.fs_attachment.open("rb")
-            res = _send_file(f, **send_file_kwargs)
+            # the file is read by blocks while the response is sent, the
+            # response is made conditional here rather than by send_file so
+            # that the size of the file is known and range requests are
+            # served by seeking into the file
+            f = self._open_fs_attachment()
+            res = _send_file(f, **dict(send_file_kwargs, conditional=False))
+            if self.size:
+                res.content_length = self.size
+            if self.conditional:
+                if self.etag:
+                    res.set_etag(self.etag)
+                res = res.make_conditional(
+                    request.httprequest.environ,
+                    accept_ranges=True,
+                    complete_length=self.size or None,
+                )
         else:
             x_sendfile_path = self.fs_attachment._get_x_sendfile_path()
             send_file_kwargs["use_x_sendfile"] = True
@@ -1,3 +1,4 @@
+from . import fs_attachment_migration
 from . import fs_file_gc
 from . import fs_storage
 from . import ir_attachment
@@ -0,0 +1,354 @@
+# Copyright 2026 Safee Analytics
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import logging
+import threading
+import time
+import traceback
+from contextlib import closing
+
+from odoo import api, fields, models
+from odoo.osv.expression import AND
+
+from . import ir_attachment
+
+_logger = logging.getLogger(__name__)
+
+# number of attachments of a chunk, processed by one worker at a time
+DEFAULT_CHUNK_SIZE = 10000
+# number of attachments migrated per transaction, their files are held in
+# memory during the migration of the batch
+DEFAULT_BATCH_SIZE = 50
+# number of files uploaded to, or read from, the storage at the same time
+# by each worker
+DEFAULT_UPLOAD_THREADS = 8
+# key of the advisory locks of the chunks processed by a worker, with the
+# id of the chunk
+ADVISORY_LOCK_KEY = 1718187373
+
+
+class FsAttachmentMigration(models.Model):
+    """Chunk of a migration of attachments to or from a filesystem storage
+
+    A migration is split into chunks of consecutive attachment ids, planned
+    once. Each chunk is migrated by batches, each committed with the
+    progress of the chunk, so an interrupted migration resumes where it
+    stopped when it is started again: the chunks which are not done are
+    migrated first, then a new migration is planned for the attachments
+    left, if any. The attachments already migrated are not part of the
+    domain of the migration, which can be run again at will.
+
+    The chunks are migrated in parallel by workers, threads using their
+    own cursor, each taking the next chunk not locked by another worker.
+    Several processes can migrate the same chunks at the same time, as
+    the chunks are locked with advisory locks.
+    """
+
+    _name = "fs.attachment.migration"
+    _description = "Filesystem storage attachments migration chunk"
+    _order = "min_id"
+
+    fs_storage_code = fields.Char("Storage Code", required=True, index=True)
+    direction = fields.Selection(
+        [("to_storage", "To Storage"), ("to_db", "To Database")], required=True
+    )
+    min_id = fields.Integer("First Attachment Id", required=True)
+    max_id = fields.Integer("Last Attachment Id", required=True)
+    last_id = fields.Integer(
+        "Last Migrated Attachment Id",
+        help="The attachments up to this id have been processed.",
+    )
+    state = fields.Selection(
+        [("pending", "Pending"), ("done", "Done"), ("failed", "Failed")],
+        default="pending",
+        required=True,
+    )
+    migrated_count = fields.Integer("Migrated Attachments")
+    skipped_count = fields.Integer(
+        "Skipped Attachments",
+        help="Attachments locked by another transaction, they are migrated "
+        "by the next migration.",
+    )
+    migrated_size = fields.Float("Migrated Size (bytes)")
+    duration = fields.Float("Duration (s)")
+    error = fields.Text()
+
+    @api.model
+    def _migrate(
+        self,
+        direction,
+        storage,
+        new_cr=False,
+        workers=1,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        batch_size=DEFAULT_BATCH_SIZE,
+        upload_threads=DEFAULT_UPLOAD_THREADS,
+    ):
+        """Migrate the attachments, see ``ir.attachment._fs_migration_domain``
+
+        :param new_cr: if False, the attachments are migrated one chunk after
+            the other in the current transaction, committed at the end only
+            if files of the filestore must be deleted. Otherwise, the chunks
+            are migrated by ``workers`` threads committing each batch.
+        :return: the statistics of the migration, see ``_get_statistics``
+        """
+        start = time.time()
+        if not new_cr:
+            chunks = self._plan(direction, storage, chunk_size)
+            files_to_clean = []
+            for chunk in chunks:
+                files_to_clean += chunk._process(batch_size, upload_threads)
+            # delete the files from the filesystem once we know the changes
+            # have been committed in ir.attachment
+            if files_to_clean:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+                ir_attachment.clean_fs(files_to_clean)
+        else:
+            with closing(self.env.registry.cursor()) as cr:
+                self.with_env(self.env(cr=cr))._plan(direction, storage, chunk_size)
+                cr.commit()  # pylint: disable=invalid-commit
+            threads = [
+                threading.Thread(
+                    target=self._work,
+                    args=(direction, storage, batch_size, upload_threads),
+                    name=f"fs_attachment_migration_{index}",
+                )
+                for index in range(max(workers, 1))
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # the chunks were written by the workers
+            self.invalidate_model()
+        statistics = self._get_statistics(direction, storage)
+        elapsed = time.time() - start
+        _logger.info(
+            "Migration %s %s: %d/%d chunks done, %d attachments (%.1f MB) migrated "
+            "in %.1fs, %.1f attachments/s, %.2f MB/s",
+            direction,
+            storage,
+            statistics["done_chunks"],
+            statistics["chunks"],
+            statistics["migrated_count"],
+            statistics["migrated_size"] / 1024 / 1024,
+            elapsed,
+            statistics["migrated_count"] / elapsed if elapsed else 0,
+            statistics["migrated_size"] / 1024 / 1024 / elapsed if elapsed else 0,
+        )
+        return statistics
+
+    @api.model
+    def _plan(self, direction, storage, chunk_size):
+        """Return the chunks to migrate
+
+        The chunks of an unfinished migration are returned if there are
+        some, otherwise the attachments to migrate are split into new
+        chunks.
+        """
+        # do not plan the same migration twice when it is started by
+        # several processes
+        self.env.cr.execute("LOCK fs_attachment_migration IN EXCLUSIVE MODE")
+        chunks = self.search(
+            [
+                ("direction", "=", direction),
+                ("fs_storage_code", "=", storage),
+            ]
+        )
+        unfinished = chunks.filtered(lambda chunk: chunk.state != "done")
+        if unfinished:
+            unfinished.filtered(lambda chunk: chunk.state == "failed").write(
+                {"state": "pending", "error": False}
+            )
+            _logger.info(
+                "Resuming the migration %s %s: %d/%d chunks left",
+                direction,
+                storage,
+                len(unfinished),
+                len(chunks),
+            )
+            return unfinished
+        chunks.unlink()
+        attachment_model = self.env["ir.attachment"]
+        ids = attachment_model.search(
+            attachment_model._fs_migration_domain(direction, storage), order="id"
+        ).ids
+        chunks = self.create(
+            [
+                {
+                    "direction": direction,
+                    "fs_storage_code": storage,
+                    "min_id": chunk_ids[0],
+                    "max_id": chunk_ids[-1],
+                    "last_id": chunk_ids[0] - 1,
+                }
+                for chunk_ids in (
+                    ids[index : index + chunk_size]
+                    for index in range(0, len(ids), chunk_size)
+                )
+            ]
+        )
+        _logger.info(
+            "Migration %s %s planned: %d attachments in %d chunks",
+            direction,
+            storage,
+            len(ids),
+            len(chunks),
+        )
+        return chunks
+
+    @api.model
+    def _work(self, direction, storage, batch_size, upload_threads):
+        """Migrate the pending chunks until there are none left, in a new
+        cursor"""
+        with closing(self.env.registry.cursor()) as cr:
+            threading.current_thread().dbname = cr.dbname
+            env = self.env(cr=cr)
+            while True:
+                chunk = self.with_env(env)._acquire(direction, storage)
+                if not chunk:
+                    break
+                try:
+                    chunk._process(batch_size, upload_threads, commit=True)
+                except Exception:
+                    cr.rollback()
+                    env.clear()
+                    _logger.exception("Migration of the chunk %s failed", chunk.id)
+                    chunk.write({"state": "failed", "error": traceback.format_exc()})
+                    cr.commit()  # pylint: disable=invalid-commit
+                finally:
+                    cr.execute(
+                        "SELECT pg_advisory_unlock(%s, %s)",
+                        (ADVISORY_LOCK_KEY, chunk.id),
+                    )
+
+    @api.model
+    def _acquire(self, direction, storage):
+        """Lock the first pending chunk not locked by another worker, for
+        the session of the cursor"""
+        # the chunks processed by other workers are skipped by the lock,
+        # the commits of their batches do not release it
+        pending = self.search(
+            [
+                ("direction", "=", direction),
+                ("fs_storage_code", "=", storage),
+                ("state", "=", "pending"),
+            ]
+        )
+        for chunk in pending:
+            self.env.cr.execute(
+                "SELECT pg_try_advisory_lock(%s, %s)", (ADVISORY_LOCK_KEY, chunk.id)
+            )
+            if not self.env.cr.fetchone()[0]:
+                continue
+            # it could have been completed meanwhile
+            chunk.invalidate_recordset()
+            if chunk.state == "pending":
+                return chunk
+            self.env.cr.execute(
+                "SELECT pg_advisory_unlock(%s, %s)", (ADVISORY_LOCK_KEY, chunk.id)
+            )
+        return self.browse()
+
+    def _process(self, batch_size, upload_threads, commit=False):
+        """Migrate the attachments of the chunk from its last checkpoint
+
+        :param commit: commit each batch with the checkpoint of the chunk
+        :return: the paths of the files of the filestore to delete once the
+            transaction is committed, when the batches are not committed
+        """
+        self.ensure_one()
+        env = self.env
+        attachment_model = env["ir.attachment"].with_context(
+            storage_location=self.fs_storage_code, prefetch_fields=False
+        )
+        domain = attachment_model._fs_migration_domain(
+            self.direction, self.fs_storage_code
+        )
+        files_to_clean = []
+        while True:
+            start = time.time()
+            ids = attachment_model.search(
+                AND(
+                    [
+                        domain,
+                        [("id", ">", self.last_id), ("id", "<=", self.max_id)],
+                    ]
+                ),
+                order="id",
+                limit=batch_size,
+            ).ids
+            if not ids:
+                break
+            # check that no other transaction has locked the rows, don't
+            # migrate them in that case
+            env.cr.execute(
+                "SELECT id FROM ir_attachment WHERE id IN %s "
+                "ORDER BY id FOR UPDATE SKIP LOCKED",
+                (tuple(ids),),
+            )
+            locked_ids = [row[0] for row in env.cr.fetchall()]
+            if len(locked_ids) < len(ids):
+                _logger.warning(
+                    "Could not migrate the locked attachments %s",
+                    sorted(set(ids) - set(locked_ids)),
+                )
+            size, batch_files_to_clean = attachment_model.browse(
+                locked_ids
+            )._fs_migrate(self.direction, self.fs_storage_code, upload_threads)
+            self.write(
+                {
+                    "last_id": ids[-1],
+                    "migrated_count": self.migrated_count + len(locked_ids),
+                    "skipped_count": self.skipped_count + len(ids) - len(locked_ids),
+                    "migrated_size": self.migrated_size + size,
+                    "duration": self.duration + time.time() - start,
+                }
+            )
+            if commit:
+                env.cr.commit()  # pylint: disable=invalid-commit
+                ir_attachment.clean_fs(batch_files_to_clean)
+            else:
+                files_to_clean += batch_files_to_clean
+            # do not keep the content of the files of the batch in memory
+            env.flush_all()
+            env.invalidate_all()
+            _logger.info(
+                "Migration chunk %s (%s-%s): %d attachments (%.1f MB) in %.1fs, "
+                "%.1f attachments/s",
+                self.id,
+                self.min_id,
+                self.max_id,
+                self.migrated_count,
+                self.migrated_size / 1024 / 1024,
+                self.duration,
+                self.migrated_count / self.duration if self.duration else 0,
+            )
+        self.state = "done"
+        if commit:
+            env.cr.commit()  # pylint: disable=invalid-commit
+        return files_to_clean
+
+    @api.model
+    def _get_statistics(self, direction, storage):
+        """Return the progress and the throughput of the migration"""
+        chunks = self.search(
+            [
+                ("direction", "=", direction),
+                ("fs_storage_code", "=", storage),
+            ]
+        )
+        duration = sum(chunks.mapped("duration"))
+        migrated_count = sum(chunks.mapped("migrated_count"))
+        migrated_size = sum(chunks.mapped("migrated_size"))
+        return {
+            "chunks": len(chunks),
+            "done_chunks": len(chunks.filtered(lambda c: c.state == "done")),
+            "failed_chunks": len(chunks.filtered(lambda c: c.state == "failed")),
+            "migrated_count": migrated_count,
+            "skipped_count": sum(chunks.mapped("skipped_count")),
+            "migrated_size": migrated_size,
+            # time spent by the workers, which run in parallel
+            "duration": duration,
+            "attachments_per_second": migrated_count / duration if duration else 0,
+            "bytes_per_second": migrated_size / duration if duration else 0,
+        }
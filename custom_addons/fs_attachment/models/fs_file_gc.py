@@ -2,6 +2,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 import logging
 import threading
+import time
 from contextlib import closing, contextmanager
 
 from odoo import api, fields, models
@@ -9,6 +10,10 @@ from odoo.sql_db import Cursor
 
 _logger = logging.getLogger(__name__)
 
+# Number of files deleted per request to the storage, the maximum number of
+# keys of a S3 DeleteObjects request
+GC_BATCH_SIZE = 1000
+
 
 class FsFileGC(models.Model):
     _name = "fs.file.gc"
@@ -16,6 +21,7 @@ class FsFileGC(models.Model):
 
     store_fname = fields.Char("Stored Filename")
     fs_storage_code = fields.Char("Storage Code")
+    file_size = fields.Integer("File Size", help="Size in bytes, if known")
 
     _sql_constraints = [
         (
@@ -53,14 +59,28 @@ class FsFileGC(models.Model):
                 cr.commit()  # pylint: disable=invalid-commit
 
     @api.model
-    def _mark_for_gc(self, store_fname: str) -> None:
+    def _mark_for_gc(self, store_fname: str, file_size: int | None = None) -> None:
         """Mark a file for garbage collection"
 
         This process is done in a separate transaction since the data must be
         preserved even if the transaction is rolled back.
         """
+        self._mark_files_for_gc([store_fname], {store_fname: file_size})
+
+    @api.model
+    def _mark_files_for_gc(
+        self, store_fnames: list[str], file_sizes: dict | None = None
+    ) -> None:
+        """Mark files for garbage collection, in one statement
+
+        :param file_sizes: the sizes of the files by store_fname, when they
+            are known
+        """
+        store_fnames = list(dict.fromkeys(store_fnames))
+        if not store_fnames:
+            return
+        file_sizes = file_sizes or {}
         with self._in_new_cursor() as cr:
-            code = store_fname.partition("://")[0]
             # use plain SQL to avoid the ORM ignore conflicts errors
             cr.execute(
                 """
@@ -68,22 +88,33 @@ class FsFileGC(models.Model):
                     fs_file_gc (
                         store_fname,
                         fs_storage_code,
+                        file_size,
                         create_date,
                         write_date,
                         create_uid,
                         write_uid
                     )
-                    VALUES (
-                        %s,
-                        %s,
+                    SELECT
+                        store_fname,
+                        split_part(store_fname, '://', 1),
+                        file_size,
                         now() at time zone 'UTC',
                         now() at time zone 'UTC',
                         %s,
                         %s
+                    FROM unnest(%s::varchar[], %s::integer[])
+                        AS marked(store_fname, file_size)
+                ON CONFLICT (store_fname) DO UPDATE
+                    SET file_size = COALESCE(
+                        EXCLUDED.file_size, fs_file_gc.file_size
                     )
-                ON CONFLICT DO NOTHING
             """,
-                (store_fname, code, self.env.uid, self.env.uid),
+                (
+                    self.env.uid,
+                    self.env.uid,
+                    store_fnames,
+                    [file_sizes.get(store_fname) for store_fname in store_fnames],
+                ),
             )
 
     @api.autovacuum
@@ -129,8 +160,8 @@ class FsFileGC(models.Model):
             """
             SELECT
                 fs_storage_code,
-                array_agg(store_fname)
-
+                array_agg(store_fname ORDER BY store_fname),
+                array_agg(file_size ORDER BY store_fname)
             FROM
                 fs_file_gc
             WHERE
@@ -145,15 +176,42 @@ class FsFileGC(models.Model):
             """,
             (tuple(codes),),
         )
-        for code, store_fnames in self._cr.fetchall():
-            self.env["fs.storage"].get_by_code(code)
+        runs = []
+        for code, store_fnames, file_sizes in self._cr.fetchall():
+            start = time.time()
             fs = self.env["fs.storage"].get_fs_by_code(code)
-            for store_fname in store_fnames:
-                try:
-                    file_path = store_fname.partition("://")[2]
-                    fs.rm(file_path)
-                except Exception:
-                    _logger.debug("Failed to remove file %s", store_fname)
+            collected = failed = reclaimed_size = 0
+            for index in range(0, len(store_fnames), GC_BATCH_SIZE):
+                batch = store_fnames[index : index + GC_BATCH_SIZE]
+                deleted = self._delete_files(fs, batch)
+                collected += len(deleted)
+                failed += len(batch) - len(deleted)
+                reclaimed_size += sum(
+                    size or 0
+                    for store_fname, size in zip(
+                        batch, file_sizes[index : index + GC_BATCH_SIZE], strict=True
+                    )
+                    if store_fname in deleted
+                )
+            runs.append(
+                {
+                    "fs_storage_code": code,
+                    "collected_count": collected,
+                    "failed_count": failed,
+                    "reclaimed_size": reclaimed_size,
+                    "duration": time.time() - start,
+                }
+            )
+            _logger.info(
+                "Garbage collection of %s: %d files collected (%.1f MB), "
+                "%d failed, in %.1fs",
+                code,
+                collected,
+                reclaimed_size / 1024 / 1024,
+                failed,
+                runs[-1]["duration"],
+            )
+        self.env["fs.file.gc.run"].create(runs)
 
         # delete the records from the table fs_file_gc
         self._cr.execute(
@@ -165,3 +223,54 @@ class FsFileGC(models.Model):
             """,
             (tuple(codes),),
         )
+
+    @api.model
+    def _delete_files(self, fs, store_fnames: list[str]) -> set[str]:
+        """Delete the files from the filesystem, return the deleted ones
+
+        The files are deleted with a single call to the filesystem, which
+        uses the bulk delete of the storage if any (DeleteObjects on S3),
+        or one by one if it fails. The bulk delete is not atomic, it may
+        fail after deleting some of the files: the files not found are
+        considered as deleted.
+        """
+        paths = {
+            store_fname.partition("://")[2]: store_fname for store_fname in store_fnames
+        }
+        try:
+            fs.rm(list(paths))
+        except Exception:
+            _logger.debug("Failed to remove files in bulk", exc_info=True)
+        else:
+            return set(store_fnames)
+        deleted = set()
+        for file_path, store_fname in paths.items():
+            try:
+                fs.rm(file_path)
+            except FileNotFoundError:
+                deleted.add(store_fname)
+            except Exception:
+                _logger.debug("Failed to remove file %s", store_fname)
+            else:
+                deleted.add(store_fname)
+        return deleted
+
+
+class FsFileGCRun(models.Model):
+    _name = "fs.file.gc.run"
+    _description = "Filesystem storage file garbage collection run"
+    _order = "create_date desc, id desc"
+
+    fs_storage_code = fields.Char("Storage Code", readonly=True)
+    collected_count = fields.Integer("Collected Files", readonly=True)
+    failed_count = fields.Integer(
+        "Failed Files",
+        readonly=True,
+        help="Files which could not be deleted, they are left in the storage.",
+    )
+    reclaimed_size = fields.Float(
+        "Reclaimed Size (bytes)",
+        readonly=True,
+        help="Size of the collected files whose size is known.",
+    )
+    duration = fields.Float("Duration (s)", readonly=True)
@@ -49,6 +49,24 @@ class FsStorage(models.Model):
         "storage. This option is useful to avoid to serve files from odoo "
         "and therefore to avoid to load the odoo process. ",
     )
+    uses_signed_url_for_x_sendfile = fields.Boolean(
+        string="Use Signed URL For X-Sendfile",
+        help="If checked, with 'Use X-Sendfile To Serve Internal Url', the "
+        "files of the storage are served by the proxy even without base URL, "
+        "when the filesystem can sign URLs (object storages). The proxy is "
+        "redirected to the /fs_x_sendfile location with a short-lived signed "
+        "URL of the file, this location must be configured in the proxy.",
+    )
+    use_local_cache = fields.Boolean(
+        help="If checked, the files of the attachments read from this storage "
+        "are kept in a size bounded cache on the local disk of the odoo "
+        "server, so that the files read often, like the images of the "
+        "products, are not downloaded from the storage on each read. The "
+        "least recently used files are evicted when the cache is full. The "
+        "cache is local to each server: it must not be used with storages "
+        "where the files of the attachments are modified in place by several "
+        "servers.",
+    )
     use_as_default_for_attachments = fields.Boolean(
         help="If checked, this storage will be used to store all the attachments ",
         default=False,
@@ -99,6 +117,8 @@ class FsStorage(models.Model):
                 "base_url": {},
                 "is_directory_path_in_url": {},
                 "use_x_sendfile_to_serve_internal_url": {},
+                "uses_signed_url_for_x_sendfile": {},
+                "use_local_cache": {},
                 "use_as_default_for_attachments": {},
                 "force_db_for_default_attachment_rules": {},
                 "use_filename_obfuscation": {},
@@ -236,6 +256,11 @@ class FsStorage(models.Model):
     def _must_autovacuum_gc(self, code):
         return self.sudo().get_by_code(code).autovacuum_gc
 
+    @api.model
+    @tools.ormcache("code")
+    def _must_use_local_cache(self, code):
+        return self.sudo().get_by_code(code).use_local_cache
+
     @api.model
     @tools.ormcache("code")
     def _must_use_filename_obfuscation(self, code):
@@ -4,17 +4,19 @@
 
 from __future__ import annotations
 
+import base64
 import io
 import logging
 import mimetypes
 import os
 import re
-import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import closing, contextmanager
 from pathlib import Path
+from urllib.parse import urlparse
 
 import fsspec  # pylint: disable=missing-manifest-dependency
-import psycopg2
 from slugify import slugify  # pylint: disable=missing-manifest-dependency
 
 import odoo
@@ -22,6 +24,7 @@ from odoo import _, api, fields, models
 from odoo.exceptions import AccessError, UserError
 from odoo.osv.expression import AND, OR, normalize_domain
 
+from ..fs_file_cache import get_file_cache
 from .strtobool import strtobool
 
 _logger = logging.getLogger(__name__)
@@ -33,11 +36,40 @@ FS_FILENAME_RE_PARSER = re.compile(
     r"^(?P<name>.+)-(?P<id>\d+)-(?P<version>\d+)(?P<extension>\..+)$"
 )
 
+# Size of the blocks read from the filesystem storage when a file is
+# streamed to a HTTP client
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Validity, in seconds, of the signed URLs given to the proxy to serve the
+# files of object storages with X-Accel-Redirect
+X_SENDFILE_SIGNED_URL_EXPIRATION = 30
+
+# Number of files uploaded at the same time when attachments are created
+# in batch
+UPLOAD_MAX_WORKERS = 8
+
+# Protocols of the filesystems without directories: the files are written
+# without checking that their directory exists
+OBJECT_STORAGE_PROTOCOLS = {"s3", "s3a", "gs", "gcs", "abfs", "az", "adl", "oss"}
+
+# Default size, in MB, of the local cache of the files of the storages using
+# it, see FS_ATTACHMENT_CACHE_MAX_SIZE
+DEFAULT_FILE_CACHE_MAX_SIZE = 1024
+
 
 def is_true(strval):
     return bool(strtobool(strval or "0"))
 
 
+def has_directories(fs):
+    """Return whether the directories of the filesystem must exist before
+    files are written in them, which is not the case of object storages"""
+    while hasattr(fs, "fs"):
+        fs = fs.fs
+    protocols = fs.protocol if isinstance(fs.protocol, tuple | list) else [fs.protocol]
+    return not OBJECT_STORAGE_PROTOCOLS.intersection(protocols)
+
+
 def clean_fs(files):
     _logger.info("cleaning old files from filestore")
     for full_path in files:
@@ -261,14 +293,24 @@ class IrAttachment(models.Model):
         The only way to give res_field and res_model to _storage method
         is to pass them into the context, and perform 1 create call per record
         to create.
+
+        The files of the attachments are uploaded concurrently beforehand,
+        see ``_storage_files_upload_for_create``.
         """
+        vals_list, uploaded_files = self._storage_files_upload_for_create(vals_list)
+        model = self
+        if uploaded_files:
+            # the contents were post-processed before being uploaded
+            model = self.with_context(
+                fs_uploaded_files=uploaded_files, image_no_postprocess=True
+            )
         vals_list_no_model = []
         attachments = self.env["ir.attachment"]
         for vals in vals_list:
             if vals.get("res_model"):
                 attachment = super(
                     IrAttachment,
-                    self.with_context(
+                    model.with_context(
                         attachment_res_model=vals.get("res_model"),
                         attachment_res_field=vals.get("res_field"),
                     ),
@@ -276,7 +318,7 @@ class IrAttachment(models.Model):
                 attachments += attachment
             else:
                 vals_list_no_model.append(vals)
-        atts = super().create(vals_list_no_model)
+        atts = super(IrAttachment, model).create(vals_list_no_model)
         attachments |= atts
         attachments._enforce_meaningful_storage_filename()
         return attachments
@@ -328,6 +370,22 @@ class IrAttachment(models.Model):
 
         return True
 
+    def unlink(self):
+        """The files of the storages are marked for garbage collection in
+        one statement once the attachments are deleted, see
+        ``_fs_delete_files``"""
+        files = {
+            attachment.store_fname: attachment.file_size
+            for attachment in self.sudo()
+            if attachment.store_fname
+            and self._is_file_from_a_storage(attachment.store_fname)
+        }
+        res = super(
+            IrAttachment, self.with_context(fs_deferred_file_delete=True)
+        ).unlink()
+        self._fs_delete_files(files)
+        return res
+
     @api.model
     def _file_read(self, fname):
         if self._is_file_from_a_storage(fname):
@@ -347,15 +405,10 @@ class IrAttachment(models.Model):
     @api.model
     def _file_delete(self, fname) -> None:  # pylint: disable=missing-return
         if self._is_file_from_a_storage(fname):
-            cr = self.env.cr
-            # using SQL to include files hidden through unlink or due to record
-            # rules
-            cr.execute(
-                "SELECT COUNT(*) FROM ir_attachment WHERE store_fname = %s", (fname,)
-            )
-            count = cr.fetchone()[0]
-            if not count:
-                self._storage_file_delete(fname)
+            # the files of the deleted attachments are processed together
+            # by unlink
+            if not self.env.context.get("fs_deferred_file_delete"):
+                self._fs_delete_files({fname: None})
         else:
             super()._file_delete(fname)
 
@@ -369,34 +422,281 @@ class IrAttachment(models.Model):
     @api.model
     def _storage_file_read(self, fname: str) -> bytes | None:
         """Read the file from the filesystem storage"""
+        store_fname = fname
         fs, _storage, fname = self._fs_parse_store_fname(fname)
+        cache = self._fs_get_file_cache(_storage)
+        if cache:
+            data = cache.get(store_fname)
+            if data is not None:
+                return data
         try:
             with fs.open(fname, "rb") as f:
-                return f.read()
+                data = f.read()
+            if cache:
+                cache.set(store_fname, data)
+            return data
         except OSError:
             _logger.info(
                 "Error reading %s on storage %s", fname, _storage, exc_info=True
             )
         return b""
 
+    @api.model
+    def _fs_get_file_cache(self, storage_code):
+        """Return the local cache of the files of the storage, None if the
+        storage does not use one
+
+        The cache is in the FS_ATTACHMENT_CACHE_DIR directory, or in the
+        data directory of odoo, and its size in MB is given by
+        FS_ATTACHMENT_CACHE_MAX_SIZE.
+        """
+        if not storage_code or not self.env["fs.storage"]._must_use_local_cache(
+            storage_code
+        ):
+            return None
+        path = os.environ.get("FS_ATTACHMENT_CACHE_DIR") or os.path.join(
+            odoo.tools.config["data_dir"], "fs_cache"
+        )
+        max_size = int(
+            os.environ.get("FS_ATTACHMENT_CACHE_MAX_SIZE")
+            or DEFAULT_FILE_CACHE_MAX_SIZE
+        )
+        return get_file_cache(
+            os.path.join(path, self.env.cr.dbname), max_size * 1024 * 1024
+        )
+
+    def _fs_get_cached_file_path(self):
+        """Return the path of the local copy of the file of the attachment
+
+        The file is copied into the local cache if it is not there yet.
+        Return None if its storage does not use a local cache, or if the
+        file is too large to be cached.
+        """
+        self.ensure_one()
+        fs, storage, fname = self._get_fs_parts()
+        cache = self._fs_get_file_cache(storage)
+        if not cache:
+            return None
+        path = cache.get_path(self.store_fname)
+        if path is None and cache.accepts(self.file_size):
+            try:
+                with fs.open(fname, "rb", block_size=STREAM_BLOCK_SIZE) as f:
+                    path = cache.set_file(self.store_fname, f)
+            except OSError:
+                _logger.info(
+                    "Error reading %s on storage %s", fname, storage, exc_info=True
+                )
+        return path
+
+    def _fs_discard_cached_file(self):
+        """Remove the file of the attachment from the local cache"""
+        for attachment in self:
+            store_fname = attachment.store_fname
+            if not self._is_file_from_a_storage(store_fname):
+                continue
+            cache = self._fs_get_file_cache(store_fname.partition("://")[0])
+            if cache:
+                cache.discard(store_fname)
+
     def _storage_write_option(self, fs):
         return {}
 
     @api.model
     def _storage_file_write(self, bin_data: bytes) -> str:
-        """Write the file to the filesystem storage"""
+        """Write the file to the filesystem storage
+
+        The file is not written if it is in the ``fs_uploaded_files`` key
+        of the context: it was uploaded by ``_storage_files_upload``.
+        """
         storage = self.env.context.get("storage_location") or self._storage()
-        fs = self._get_fs_storage_for_code(storage)
         path = self._get_fs_path(storage, bin_data)
-        dirname = os.path.dirname(path)
-        if not fs.exists(dirname):
-            fs.makedirs(dirname)
         fname = f"{storage}://{path}"
-        kwargs = self._storage_write_option(fs)
+        if fname not in self.env.context.get("fs_uploaded_files", ()):
+            fs = self._get_fs_storage_for_code(storage)
+            kwargs = self._storage_write_option(fs)
+            self._storage_file_upload(fs, path, bin_data, **kwargs)
+            self._fs_mark_for_gc(fname)
+        return fname
+
+    @api.model
+    def _storage_file_upload(self, fs, path, bin_data, **kwargs):
+        """Write the content in the file of the filesystem
+
+        This method does not access the records nor the cache of the
+        environment, it can be called from other threads.
+        """
+        dirname = os.path.dirname(path)
+        if dirname and has_directories(fs):
+            # files can be written at the same time in the directory
+            fs.makedirs(dirname, exist_ok=True)
         with fs.open(path, "wb", **kwargs) as f:
             f.write(bin_data)
-        self._fs_mark_for_gc(fname)
-        return fname
+
+    @api.model
+    def _storage_files_upload(self, storage, files, max_workers):
+        """Upload files to the storage concurrently, before writing them
+
+        :param files: list of (bin_data, mimetype)
+        :return: the frozenset of the store_fname of the files uploaded, to
+            give in the ``fs_uploaded_files`` key of the context when the
+            attachments are written, so that ``_storage_file_write`` does not
+            upload them again. The files whose upload failed are uploaded by
+            ``_storage_file_write``, as well as the files with the same path
+            as another one: the file written for an attachment can be
+            renamed (see ``_enforce_meaningful_storage_filename``).
+        """
+        fs = self._get_fs_storage_for_code(storage)
+        uploads = {}
+        duplicates = set()
+        for bin_data, mimetype in files:
+            path = self._get_fs_path(storage, bin_data)
+            if path in uploads:
+                duplicates.add(path)
+                continue
+            kwargs = self.with_context(mimetype=mimetype)._storage_write_option(fs)
+            uploads[path] = (bin_data, kwargs)
+        for path in duplicates:
+            del uploads[path]
+        # uploaded files which end up not used by any attachment, if the
+        # transaction fails, must be collected
+        self._fs_mark_files_for_gc([f"{storage}://{path}" for path in uploads])
+        uploaded_files = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for path, (bin_data, kwargs) in uploads.items():
+                future = executor.submit(
+                    self._storage_file_upload, fs, path, bin_data, **kwargs
+                )
+                futures[future] = path
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    future.result()
+                except Exception:
+                    _logger.warning(
+                        "Error uploading %s on storage %s", path, storage, exc_info=True
+                    )
+                else:
+                    uploaded_files.add(f"{storage}://{path}")
+        return frozenset(uploaded_files)
+
+    @api.model
+    def _storage_files_upload_for_create(self, vals_list):
+        """Upload concurrently the files of attachments to create
+
+        The files are uploaded when several attachments are created in the
+        same storage.
+
+        :return: the values of the attachments and the store_fname of the
+            files uploaded (see ``_storage_files_upload``). If files were
+            uploaded, the values are copies of the given ones, with their
+            content post-processed (see ``_check_contents``) as it must be
+            the one uploaded.
+        """
+        if len(vals_list) < 2:
+            return vals_list, frozenset()
+        storage_codes = self._get_storage_codes()
+        storages = []
+        for vals in vals_list:
+            storage = None
+            if vals.get("raw") or vals.get("datas"):
+                # see create
+                model = self.with_context(
+                    attachment_res_model=vals.get("res_model"),
+                    attachment_res_field=vals.get("res_field"),
+                )
+                storage = self.env.context.get("storage_location") or model._storage()
+            storages.append(storage if storage in storage_codes else None)
+        # the contents are only post-processed here when files may be
+        # uploaded, otherwise create does it
+        if max(Counter(filter(None, storages)).values(), default=0) < 2:
+            return vals_list, frozenset()
+        checked_vals_list = []
+        files_by_storage = defaultdict(list)
+        for vals, storage in zip(vals_list, storages, strict=True):
+            if not (vals.get("raw") or vals.get("datas")):
+                checked_vals_list.append(vals)
+                continue
+            model = self.with_context(
+                attachment_res_model=vals.get("res_model"),
+                attachment_res_field=vals.get("res_field"),
+            )
+            vals = model._check_contents(dict(vals))
+            checked_vals_list.append(vals)
+            if not storage:
+                continue
+            raw = vals.get("raw")
+            if isinstance(raw, str):
+                raw = raw.encode()
+            elif not raw:
+                raw = base64.b64decode(vals.get("datas") or b"")
+            if raw and not model._store_in_db_instead_of_object_storage(
+                raw, vals["mimetype"]
+            ):
+                files_by_storage[storage].append((raw, vals["mimetype"]))
+        uploaded_files = frozenset()
+        for storage, files in files_by_storage.items():
+            if len(files) > 1:
+                uploaded_files |= self._storage_files_upload(
+                    storage, files, UPLOAD_MAX_WORKERS
+                )
+        if not uploaded_files:
+            return vals_list, uploaded_files
+        return checked_vals_list, uploaded_files
+
+    @api.model
+    def _storage_files_read(self, fnames, max_workers):
+        """Read files of the filesystem storages concurrently
+
+        :param fnames: list of store_fname
+        :return: dict of the contents of the files by store_fname, without
+            the files which could not be read
+        """
+
+        def read(fs, path):
+            with fs.open(path, "rb") as f:
+                return f.read()
+
+        reads = {}
+        for fname in set(fnames):
+            fs, _storage, path = self._fs_parse_store_fname(fname)
+            reads[fname] = (fs, path)
+        contents = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(read, *args): fname for fname, args in reads.items()
+            }
+            for future in as_completed(futures):
+                fname = futures[future]
+                try:
+                    contents[fname] = future.result()
+                except OSError:
+                    _logger.info("Error reading %s", fname, exc_info=True)
+        return contents
+
+    @api.model
+    def _fs_delete_files(self, files):
+        """Delete the files of the storages no more referenced by any
+        attachment
+
+        :param files: the sizes of the files, if known, by store_fname
+        """
+        if not files:
+            return
+        # using SQL to include files hidden through unlink or due to record
+        # rules
+        self.env.cr.execute(
+            """
+            SELECT t.fname
+            FROM unnest(%s::varchar[]) AS t(fname)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM ir_attachment WHERE store_fname = t.fname
+            )
+            """,
+            (list(files),),
+        )
+        fnames = [row[0] for row in self.env.cr.fetchall()]
+        self._fs_mark_files_for_gc(fnames, files)
 
     @api.model
     def _storage_file_delete(self, fname):
@@ -574,6 +874,14 @@ class IrAttachment(models.Model):
         """
         self.env["fs.file.gc"]._mark_for_gc(fname)
 
+    @api.model
+    def _fs_mark_files_for_gc(self, fnames, file_sizes=None):
+        """Mark files for garbage collection, see ``_fs_mark_for_gc``
+
+        :param file_sizes: the sizes of the files, if known, by fname
+        """
+        self.env["fs.file.gc"]._mark_files_for_gc(fnames, file_sizes)
+
     def _get_fs_parts(
         self,
     ) -> tuple[fsspec.AbstractFileSystem, str, str] | tuple[None, None, None]:
@@ -671,22 +979,78 @@ class IrAttachment(models.Model):
         return self.env["fs.storage"].sudo().get_storage_codes()
 
     def _get_x_sendfile_path(self):
-        """Get the path to use for X-Accel-Redirect"""
+        """Get the path to use for X-Accel-Redirect
+
+        The files of the storages with a base URL are served by the proxy
+        from the location rooted at the storage code. When the storage
+        uses signed URLs for X-Sendfile, the files of the storages without
+        base URL whose filesystem signs URLs (object storages like S3, GCS
+        or Azure) are served from a signed URL, through the
+        ``/fs_x_sendfile/<scheme>/<host>/<path>`` location.
+        """
         self.ensure_one()
         url_path = self.fs_url_path
         storage_code = self.fs_storage_code
         if not url_path:
+            signed_url = (
+                self.fs_storage_id.uses_signed_url_for_x_sendfile
+                and self.fs_filename
+                and self._fs_get_signed_url()
+            )
+            if signed_url:
+                return self._fs_x_sendfile_path_for_url(signed_url)
             raise RuntimeError(
                 f"The attachment {self.id} is not stored in a filesystem storage."
             )
         path = Path("/") / storage_code / url_path.lstrip("/")
         return str(path)
 
+    @api.model
+    def _fs_x_sendfile_path_for_url(self, url):
+        """Return the X-Accel-Redirect path of the ``/fs_x_sendfile`` location
+        serving the given URL"""
+        parsed_url = urlparse(url)
+        path = parsed_url.path.strip("/")
+        redirect_path = f"/fs_x_sendfile/{parsed_url.scheme}/{parsed_url.netloc}/{path}"
+        if parsed_url.query:
+            redirect_path += f"?{parsed_url.query}"
+        return redirect_path
+
+    def _fs_can_sign_url(self):
+        """Return whether the filesystem of the attachment signs URLs"""
+        self.ensure_one()
+        fs, _storage, _fname = self._get_fs_parts()
+        if not fs:
+            return False
+        root_fs = self.env["fs.storage"]._get_root_filesystem(fs)
+        return type(root_fs).sign is not fsspec.AbstractFileSystem.sign
+
+    def _fs_get_signed_url(self):
+        """Return a signed URL to download the file, or None when the
+        filesystem of the attachment does not sign URLs"""
+        self.ensure_one()
+        fs, _storage, fname = self._get_fs_parts()
+        # sign with the root filesystem, the directory filesystems wrapping
+        # it do not always forward the call
+        while hasattr(fs, "fs"):
+            fname = fs._join(fname)
+            fs = fs.fs
+        try:
+            return fs.sign(fname, expiration=X_SENDFILE_SIGNED_URL_EXPIRATION)
+        except NotImplementedError:
+            return None
+
     def _fs_use_x_sendfile(self):
         """Return whether to use X-Sendfile to serve the internal URL"""
         self.ensure_one()
-        return (
-            self.fs_url_path and self.fs_storage_id.use_x_sendfile_to_serve_internal_url
+        storage = self.fs_storage_id
+        return storage.use_x_sendfile_to_serve_internal_url and (
+            self.fs_url_path
+            or (
+                storage.uses_signed_url_for_x_sendfile
+                and self.fs_filename
+                and self._fs_can_sign_url()
+            )
         )
 
     ################################
@@ -731,7 +1095,7 @@ class IrAttachment(models.Model):
 
     @api.model
     def force_storage_to_db_for_special_fields(
-        self, new_cr=False, storage: str | None = None
+        self, new_cr=False, storage: str | None = None, workers=1
     ):
         """Migrate special attachments from Object Storage back to database
 
@@ -744,7 +1108,9 @@ class IrAttachment(models.Model):
         including the special files (assets, image_small, ...) have been pushed
         to the Object Storage and we want to write them back in the database.
 
-        It is not called anywhere, but can be called by RPC or scripts.
+        It is not called anywhere, but can be called by RPC or scripts. See
+        ``fs.attachment.migration`` for the ``new_cr`` and ``workers``
+        arguments.
         """
         if not storage:
             storage = self._storage()
@@ -761,120 +1127,108 @@ class IrAttachment(models.Model):
                 storage,
             )
             return
-
-        domain = AND(
-            (
-                normalize_domain(
-                    [
-                        ("store_fname", "=like", f"{storage}://%"),
-                        # for res_field, see comment in
-                        # _force_storage_to_object_storage
-                        "|",
-                        ("res_field", "=", False),
-                        ("res_field", "!=", False),
-                    ]
-                ),
-                normalize_domain(self._store_in_db_instead_of_object_storage_domain()),
-            )
+        _logger.info("Moving attachments from %s to DB for fast access", storage)
+        self.env["fs.attachment.migration"]._migrate(
+            "to_db", storage, new_cr=new_cr, workers=workers
         )
 
-        with self._do_in_new_env(new_cr=new_cr) as new_env:
-            model_env = new_env["ir.attachment"].with_context(prefetch_fields=False)
-            attachment_ids = model_env.search(domain).ids
-            if not attachment_ids:
-                return
-            total = len(attachment_ids)
-            start_time = time.time()
-            _logger.info(
-                "Moving %d attachments from %s to DB for fast access", total, storage
-            )
-            current = 0
-            for attachment_id in attachment_ids:
-                current += 1
-                # if we browse attachments outside of the loop, the first
-                # access to 'datas' will compute all the 'datas' fields at
-                # once, which means reading hundreds or thousands of files at
-                # once, exhausting memory
-                attachment = model_env.browse(attachment_id)
-                # this write will read the datas from the Object Storage and
-                # write them back in the DB (the logic for location to write is
-                # in the 'datas' inverse computed field)
-                # we need to write the mimetype too, otherwise it will be
-                # overwritten with 'application/octet-stream' on assets. On each
-                # write, the mimetype is recomputed if not given. If we don't
-                # pass it nor the name, the mimetype will be set to the default
-                # value 'application/octet-stream' on assets.
-                attachment.write({"datas": attachment.datas})
-                if current % 100 == 0 or total - current == 0:
-                    _logger.info(
-                        "attachment %s/%s after %.2fs",
-                        current,
-                        total,
-                        time.time() - start_time,
-                    )
-
     @api.model
-    def _force_storage_to_object_storage(self, new_cr=False):
+    def _force_storage_to_object_storage(self, new_cr=False, workers=1):
+        """Move the attachments to the storage given by the context or to
+        the default one
+
+        See ``fs.attachment.migration`` for the ``new_cr`` and ``workers``
+        arguments.
+        """
         _logger.info("migrating files to the object storage")
         storage = self.env.context.get("storage_location") or self._storage()
         if self._is_storage_disabled(storage):
             return
+        self.env["fs.attachment.migration"]._migrate(
+            "to_storage", storage, new_cr=new_cr, workers=workers
+        )
+
+    @api.model
+    def _fs_migration_domain(self, direction, storage):
+        """Return the domain of the attachments to migrate
+
+        :param direction: "to_storage" to move the attachments stored
+            elsewhere to the storage, "to_db" to move the attachments of the
+            storage which must be stored in database (see
+            ``_store_in_db_instead_of_object_storage``) to the database
+        """
         # The weird "res_field = False OR res_field != False" domain
         # is required! It's because of an override of _search in ir.attachment
         # which adds ('res_field', '=', False) when the domain does not
         # contain 'res_field'.
         # https://github.com/odoo/odoo/blob/9032617120138848c63b3cfa5d1913c5e5ad76db/
         # odoo/addons/base/ir/ir_attachment.py#L344-L347
-        domain = [
+        if direction == "to_db":
+            return AND(
+                (
+                    normalize_domain(
+                        [
+                            ("store_fname", "=like", f"{storage}://%"),
+                            "|",
+                            ("res_field", "=", False),
+                            ("res_field", "!=", False),
+                        ]
+                    ),
+                    normalize_domain(
+                        self._store_in_db_instead_of_object_storage_domain()
+                    ),
+                )
+            )
+        return [
             "!",
             ("store_fname", "=like", f"{storage}://%"),
             "|",
             ("res_field", "=", False),
             ("res_field", "!=", False),
         ]
-        # We do a copy of the environment so we can workaround the cache issue
-        # below. We do not create a new cursor by default because it causes
-        # serialization issues due to concurrent updates on attachments during
-        # the installation
-        with self._do_in_new_env(new_cr=new_cr) as new_env:
-            model_env = new_env["ir.attachment"]
-            ids = model_env.search(domain).ids
-            files_to_clean = []
-            for attachment_id in ids:
-                try:
-                    with new_env.cr.savepoint():
-                        # check that no other transaction has
-                        # locked the row, don't send a file to storage
-                        # in that case
-                        self.env.cr.execute(
-                            "SELECT id "
-                            "FROM ir_attachment "
-                            "WHERE id = %s "
-                            "FOR UPDATE NOWAIT",
-                            (attachment_id,),
-                            log_exceptions=False,
-                        )
 
-                        # This is a trick to avoid having the 'datas'
-                        # function fields computed for every attachment on
-                        # each iteration of the loop. The former issue
-                        # being that it reads the content of the file of
-                        # ALL the attachments on each loop.
-                        new_env.clear()
-                        attachment = model_env.browse(attachment_id)
-                        path = attachment._move_attachment_to_store()
-                        if path:
-                            files_to_clean.append(path)
-                except psycopg2.OperationalError:
-                    _logger.error(
-                        "Could not migrate attachment %s to S3", attachment_id
-                    )
+    def _fs_migrate(self, direction, storage, max_workers):
+        """Migrate the attachments, see ``_fs_migration_domain``
 
-            # delete the files from the filesystem once we know the changes
-            # have been committed in ir.attachment
-            if files_to_clean:
-                new_env.cr.commit()
-                clean_fs(files_to_clean)
+        The files are uploaded to the storage, or read from it, by
+        ``max_workers`` concurrent threads, then the attachments are written
+        one by one.
+
+        :return: the total size of the attachments and the paths of the
+            files of the filestore to delete once the transaction is
+            committed
+        """
+        files_to_clean = []
+        if direction == "to_db":
+            contents = self._storage_files_read(self.mapped("store_fname"), max_workers)
+            for attachment in self:
+                # the files which could not be read are read again, the
+                # attachment is written with an empty content if it fails
+                # again, as the ones which are not found when read one by one
+                raw = contents.get(attachment.store_fname)
+                if raw is None:
+                    raw = attachment.raw
+                # we need to write the mimetype too, otherwise it will be
+                # overwritten with 'application/octet-stream' on assets. On each
+                # write, the mimetype is recomputed if not given. If we don't
+                # pass it nor the name, the mimetype will be set to the default
+                # value 'application/octet-stream' on assets.
+                attachment.write({"raw": raw, "mimetype": attachment.mimetype})
+        else:
+            files = []
+            for attachment in self:
+                raw = attachment.raw
+                if raw and not self._store_in_db_instead_of_object_storage(
+                    raw, attachment.mimetype
+                ):
+                    files.append((raw, attachment.mimetype))
+            uploaded_files = self._storage_files_upload(storage, files, max_workers)
+            del files
+            for attachment in self.with_context(fs_uploaded_files=uploaded_files):
+                path = attachment._move_attachment_to_store()
+                if path:
+                    files_to_clean.append(path)
+        return sum(self.mapped("file_size")), files_to_clean
 
 
 class AttachmentFileLikeAdapter:
@@ -1108,6 +1462,9 @@ class AttachmentFileLikeAdapter:
             if self.new_version and self._new_store_fname:
                 self.attachment._force_write_store_fname(self._new_store_fname)
             self.attachment._enforce_meaningful_storage_filename()
+            if not self.new_version and not self._is_stored_in_db:
+                # the file was modified in place
+                self.attachment._fs_discard_cached_file()
             self._ensure_cache_consistency()
 
     def _get_attachment_data(self) -> dict:
@@ -1,6 +1,7 @@
 # Copyright 2023 ACSONE SA/NV (http://acsone.eu).
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 import os
+import threading
 from unittest import mock
 
 from odoo.tools import mute_logger
@@ -30,6 +31,57 @@ class TestFSAttachment(TestFSAttachmentCommon):
             f.write(b"new")
         self.assertEqual(attachment.raw, b"new")
 
+    def test_create_attachments_upload_concurrently(self):
+        self.temp_backend.use_as_default_for_attachments = True
+        storage_file_upload = type(self.ir_attachment_model)._storage_file_upload
+        upload_threads = []
+
+        def _storage_file_upload(self, *args, **kwargs):
+            upload_threads.append(threading.current_thread())
+            return storage_file_upload(self, *args, **kwargs)
+
+        with mock.patch.object(
+            type(self.ir_attachment_model), "_storage_file_upload", _storage_file_upload
+        ):
+            attachments = self.ir_attachment_model.create(
+                [
+                    {"name": f"test{index}.txt", "raw": f"content {index}".encode()}
+                    for index in range(3)
+                ]
+            )
+        # the files are uploaded by other threads, once
+        self.assertEqual(len(upload_threads), 3)
+        self.assertNotIn(threading.current_thread(), upload_threads)
+        self.assertEqual(
+            sorted(os.listdir(self.temp_dir)),
+            [f"test{index}-{attachments[index].id}-0.txt" for index in range(3)],
+        )
+        self.assertEqual(
+            attachments.mapped("raw"), [b"content 0", b"content 1", b"content 2"]
+        )
+
+    def test_create_attachments_not_uploaded_checked_once(self):
+        """The contents of attachments stored by Odoo are post-processed by
+        create only"""
+        check_contents = type(self.ir_attachment_model)._check_contents
+        checked = []
+
+        def _check_contents(self, values):
+            checked.append(values["name"])
+            return check_contents(self, values)
+
+        with mock.patch.object(
+            type(self.ir_attachment_model), "_check_contents", _check_contents
+        ):
+            self.ir_attachment_model.create(
+                [
+                    {"name": f"test{index}.txt", "raw": f"content {index}".encode()}
+                    for index in range(3)
+                ]
+            )
+        self.assertEqual(checked, ["test0.txt", "test1.txt", "test2.txt"])
+        self.assertFalse(os.listdir(self.temp_dir))
+
     def test_create_attachment_with_meaningful_name(self):
         """In this test we use a backend with 'optimizes_directory_path',
         which rewrites the filename to be a meaningful name.
@@ -302,6 +354,56 @@ class TestFSAttachment(TestFSAttachmentCommon):
             store_fname, self.gc_file_model.search([]).mapped("store_fname")
         )
 
+    def test_gc_batch(self):
+        self.temp_backend.use_as_default_for_attachments = True
+        attachments = self.ir_attachment_model.create(
+            [{"name": f"test-{i}.txt", "raw": b"x" * (i + 1)} for i in range(3)]
+        )
+        self.env.flush_all()
+        self.assertEqual(len(os.listdir(self.temp_dir)), 3)
+        store_fnames = attachments.mapped("store_fname")
+        attachments.unlink()
+        gc_files = self.gc_file_model.search([("store_fname", "in", store_fnames)])
+        self.assertEqual(sorted(gc_files.mapped("file_size")), [1, 2, 3])
+        # a file which is not in the storage anymore is collected too
+        self.gc_file_model._mark_for_gc("tmp_dir://missing-0-0.txt")
+        self.gc_file_model._gc_files_unsafe()
+        self.assertEqual(os.listdir(self.temp_dir), [])
+        run = self.env["fs.file.gc.run"].search(
+            [("fs_storage_code", "=", "tmp_dir")], limit=1
+        )
+        self.assertEqual(run.collected_count, 4)
+        self.assertEqual(run.failed_count, 0)
+        self.assertEqual(run.reclaimed_size, 6)
+        self.assertFalse(self.gc_file_model.search([]))
+
+    def test_gc_batch_partially_deleted(self):
+        """The files deleted before the bulk delete failed are collected"""
+        self.temp_backend.use_as_default_for_attachments = True
+        attachments = self.ir_attachment_model.create(
+            [{"name": f"test-{i}.txt", "raw": b"x" * (i + 1)} for i in range(3)]
+        )
+        self.env.flush_all()
+        attachments.unlink()
+        fs = self.env["fs.storage"].get_fs_by_code("tmp_dir")
+        rm = type(fs).rm
+
+        def partial_rm(fs, path, *args, **kwargs):
+            if isinstance(path, list):
+                rm(fs, path[0])
+                raise FileNotFoundError(path[0])
+            return rm(fs, path, *args, **kwargs)
+
+        with mock.patch.object(type(fs), "rm", partial_rm):
+            self.gc_file_model._gc_files_unsafe()
+        self.assertEqual(os.listdir(self.temp_dir), [])
+        run = self.env["fs.file.gc.run"].search(
+            [("fs_storage_code", "=", "tmp_dir")], limit=1
+        )
+        self.assertEqual(run.collected_count, 3)
+        self.assertEqual(run.failed_count, 0)
+        self.assertEqual(run.reclaimed_size, 6)
+
     def test_attachment_fs_url(self):
         self.temp_backend.base_url = "https://acsone.eu/media"
         self.temp_backend.use_as_default_for_attachments = True
@@ -374,6 +476,51 @@ class TestFSAttachment(TestFSAttachmentCommon):
         self.assertEqual(attachment.store_fname, f"tmp_dir://{filename}")
         self.assertIn(filename, os.listdir(self.temp_dir))
 
+    @mute_logger(
+        "odoo.addons.fs_attachment.models.ir_attachment",
+        "odoo.addons.fs_attachment.models.fs_attachment_migration",
+    )
+    def test_force_storage_to_fs_resume(self):
+        attachments = self.ir_attachment_model.create(
+            [
+                {"name": "test1.txt", "raw": b"content"},
+                {"name": "test2.txt", "raw": b"other content"},
+                {"name": "test3.txt", "raw": b"other content"},
+            ]
+        )
+        self.env.flush_all()
+        filestore_fname = attachments[0].store_fname
+        # an interrupted migration, which migrated the first attachment
+        chunk = self.env["fs.attachment.migration"].create(
+            {
+                "direction": "to_storage",
+                "fs_storage_code": "tmp_dir",
+                "min_id": attachments[0].id,
+                "max_id": attachments[-1].id,
+                "last_id": attachments[0].id,
+                "migrated_count": 1,
+            }
+        )
+        self.temp_backend.use_as_default_for_attachments = True
+        with (
+            mock.patch.object(self.env.cr, "commit"),
+            mock.patch("odoo.addons.fs_attachment.models.ir_attachment.clean_fs"),
+        ):
+            self.ir_attachment_model.force_storage()
+        self.assertEqual(chunk.state, "done")
+        self.assertEqual(chunk.migrated_count, 3)
+        self.assertEqual(attachments[0].store_fname, filestore_fname)
+        # the attachments with the same content have their own file
+        self.assertEqual(
+            attachments[1:].mapped("store_fname"),
+            [
+                f"tmp_dir://test2-{attachments[1].id}-0.txt",
+                f"tmp_dir://test3-{attachments[2].id}-0.txt",
+            ],
+        )
+        self.assertEqual(attachments[1].raw, b"other content")
+        self.assertEqual(attachments[2].raw, b"other content")
+
     def test_storage_use_filename_obfuscation(self):
         self.temp_backend.base_url = "https://acsone.eu/media"
         self.temp_backend.use_as_default_for_attachments = True
@@ -3,6 +3,9 @@
 import os
 import shutil
 import tempfile
+from unittest import mock
+
+from fsspec.implementations.local import LocalFileSystem
 
 from odoo.tests.common import HttpCase
 
@@ -103,3 +106,38 @@ class TestFsAttachmentInternalUrl(HttpCase):
             },
             assert_content=None,
         )
+
+    def test_fs_attachment_internal_url_x_sendfile_signed_url(self):
+        # files of storages without base URL are served from a signed URL
+        # when their filesystem signs URLs
+        self.authenticate("admin", "admin")
+        self.temp_backend.write(
+            {"use_x_sendfile_to_serve_internal_url": True, "base_url": ""}
+        )
+        self.attachment.invalidate_recordset(["fs_url_path"])
+        self.assertFalse(self.attachment.fs_url_path)
+
+        def sign(fs, path, expiration=100, **kwargs):
+            return f"https://files.example.com/{path.lstrip('/')}?expires={expiration}"
+
+        # the signed URLs must be enabled explicitly, as the proxy needs the
+        # /fs_x_sendfile location
+        with mock.patch.object(LocalFileSystem, "sign", sign):
+            self.assertFalse(self.attachment._fs_use_x_sendfile())
+        self.temp_backend.uses_signed_url_for_x_sendfile = True
+
+        x_accel_redirect = (
+            f"/fs_x_sendfile/https/files.example.com/{self.temp_dir.strip('/')}/"
+            f"test-{self.attachment.id}-0.txt?expires=30"
+        )
+        with mock.patch.object(LocalFileSystem, "sign", sign):
+            self.assertDownload(
+                self.attachment.internal_url,
+                headers={},
+                assert_status_code=200,
+                assert_headers={
+                    "X-Accel-Redirect": x_accel_redirect,
+                    "Content-Length": "0",
+                },
+                assert_content=None,
+            )
@@ -0,0 +1,101 @@
+# Copyright 2026 Safee Analytics
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from ..fs_file_cache import FsFileCache
+from .common import TestFSAttachmentCommon
+
+
+class TestFsFileCache(TestFSAttachmentCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache_dir = tempfile.mkdtemp()
+        cls.cache_dir = cache_dir
+        cls.startClassPatcher(
+            mock.patch.dict(os.environ, {"FS_ATTACHMENT_CACHE_DIR": cache_dir})
+        )
+
+        @cls.addClassCleanup
+        def cleanup_cache_dir():
+            shutil.rmtree(cache_dir)
+
+    def setUp(self):
+        super().setUp()
+        self.temp_backend.use_local_cache = True
+
+    def _create_attachment(self, content):
+        return (
+            self.env["ir.attachment"]
+            .with_context(storage_location=self.temp_backend.code)
+            .create({"name": "test.txt", "raw": content})
+        )
+
+    def test_get_set(self):
+        cache = FsFileCache(os.path.join(self.cache_dir, "unit_get_set"), 1000)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", b"content")
+        self.assertEqual(cache.get("a"), b"content")
+        cache.set_file("b", io.BytesIO(b"other content"))
+        self.assertEqual(cache.get("b"), b"other content")
+        cache.discard("a")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 2)
+        # too large for the cache
+        self.assertIsNone(cache.set("c", b"x" * 101))
+        self.assertIsNone(cache.get("c"))
+
+    def test_evict_least_recently_used(self):
+        cache = FsFileCache(os.path.join(self.cache_dir, "unit_evict"), 250)
+        past = time.time() - 100
+        for index, key in enumerate(("a", "b", "c")):
+            os.utime(cache.set(key, b"x" * 25), (past + index, past + index))
+        # "a" is used again, "b" becomes the least recently used
+        cache.get("a")
+        for key in "defghijk":
+            cache.set(key, b"x" * 25)
+        # the cache is above its size after the last write, it is shrunk
+        # below 90% of its size
+        self.assertEqual(cache.stats()["evictions"], 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(cache.get("a"), b"x" * 25)
+        self.assertEqual(cache.stats()["size"], 225)
+        self.assertEqual(cache.evict(), 0)
+
+    def test_read_through(self):
+        attachment = self._create_attachment(b"cached content")
+        cache = self.ir_attachment_model._fs_get_file_cache(self.temp_backend.code)
+        stats = cache.stats()
+        attachment.invalidate_recordset()
+        self.assertEqual(attachment.raw, b"cached content")
+        attachment.invalidate_recordset()
+        self.assertEqual(attachment.raw, b"cached content")
+        self.assertEqual(cache.stats()["misses"], stats["misses"] + 1)
+        self.assertEqual(cache.stats()["hits"], stats["hits"] + 1)
+        # the file is no more downloaded from the storage
+        os.unlink(os.path.join(self.temp_dir, attachment.store_fname.split("://")[1]))
+        attachment.invalidate_recordset()
+        self.assertEqual(attachment.raw, b"cached content")
+
+    def test_modified_in_place(self):
+        attachment = self._create_attachment(b"cached content")
+        attachment.invalidate_recordset()
+        self.assertEqual(attachment.raw, b"cached content")
+        with attachment.open("wb", new_version=False) as f:
+            f.write(b"new content")
+        self.assertEqual(attachment.raw, b"new content")
+
+    def test_no_local_cache(self):
+        self.temp_backend.use_local_cache = False
+        self.assertIsNone(
+            self.ir_attachment_model._fs_get_file_cache(self.temp_backend.code)
+        )
+        attachment = self._create_attachment(b"content")
+        self.assertIsNone(attachment._fs_get_cached_file_path())
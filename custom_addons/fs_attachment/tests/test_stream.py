@@ -124,6 +124,30 @@ class TestStream(HttpCase):
             assert_content=self.content,
         )
 
+    def test_content_url_range(self):
+        self.authenticate("admin", "admin")
+        url = f"/web/content/{self.attachment_binary.id}"
+        self.assertDownload(
+            url,
+            headers={},
+            assert_status_code=200,
+            assert_headers={
+                "Accept-Ranges": "bytes",
+                "Content-Length": str(len(self.content)),
+            },
+            assert_content=self.content,
+        )
+        self.assertDownload(
+            url,
+            headers={"Range": "bytes=8-11"},
+            assert_status_code=206,
+            assert_headers={
+                "Content-Range": f"bytes 8-11/{len(self.content)}",
+                "Content-Length": "4",
+            },
+            assert_content=self.content[8:12],
+        )
+
     def test_image_url(self):
         self.authenticate("admin", "admin")
         url = f"/web/image/{self.attachment_image.id}"
@@ -1,14 +1,33 @@
 # Copyright 2025 ACSONE SA/NV
 # Copyright 2025 XCG SAS
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
-from urllib.parse import urlparse
+from odoo import api, models
 
-from odoo import models
+# Files larger than this size are uploaded by parts of this size, see
+# s3fs.S3FileSystem.pipe_file
+S3_MULTIPART_CHUNK_SIZE = 16 * 1024 * 1024
+# Number of parts of a file uploaded at the same time
+S3_MULTIPART_MAX_CONCURRENCY = 8
 
 
 class IrAttachment(models.Model):
     _inherit = "ir.attachment"
 
+    @api.model
+    def _storage_file_upload(self, fs, path, bin_data, **kwargs):
+        root_fs = self.env["fs.storage"]._get_root_filesystem(fs)
+        if not hasattr(root_fs, "s3"):
+            return super()._storage_file_upload(fs, path, bin_data, **kwargs)
+        # a single PutObject request for the small files, a multipart upload
+        # with parts uploaded in parallel for the large ones
+        fs.pipe_file(
+            path,
+            bin_data,
+            chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=S3_MULTIPART_MAX_CONCURRENCY,
+            **kwargs,
+        )
+
     def _storage_write_option(self, fs):
         option = super()._storage_write_option(fs)
         mimetype = self.env.context.get("mimetype")
@@ -72,11 +91,4 @@ class IrAttachment(models.Model):
                 f"{s3_client.meta.endpoint_url.rstrip('/')}/"
                 f"{bucket_name}/{file_path.lstrip('/')}"
             )
-
-        parsed_url = urlparse(file_url)
-        path = parsed_url.path.strip("/")
-        query = parsed_url.query
-        redirect_path = f"/fs_x_sendfile/{parsed_url.scheme}/{parsed_url.netloc}/{path}"
-        if query:
-            redirect_path += f"?{query}"
-        return redirect_path
+        return self._fs_x_sendfile_path_for_url(file_url)
@@ -1,7 +1,11 @@
 # Copyright 2025 ACSONE SA/NV (http://acsone.eu).
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+from unittest import mock
 
-
+from ..models.ir_attachment import (
+    S3_MULTIPART_CHUNK_SIZE,
+    S3_MULTIPART_MAX_CONCURRENCY,
+)
 from .common import TestFSAttachmentS3Common
 
 
@@ -33,3 +37,23 @@ class TestFSAttachementS3(TestFSAttachmentS3Common):
             "/fs_x_sendfile/http/minio.minio/test-bucket/dir/sub/fake_s3_file.txt",
             f"The X-Accel-Redirect path should match the expected format. ({url})",
         )
+
+    def test_storage_file_upload(self):
+        """Test that the files are uploaded without checking directories,
+        by parts for the large ones."""
+        fs = self.s3_backend.fs
+        with (
+            mock.patch.object(type(fs), "pipe_file") as pipe_file,
+            mock.patch.object(type(fs), "exists") as exists,
+        ):
+            self.ir_attachment_model._storage_file_upload(
+                fs, "dir/file.txt", b"content", ContentType="text/plain"
+            )
+        exists.assert_not_called()
+        pipe_file.assert_called_once_with(
+            "dir/file.txt",
+            b"content",
+            chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=S3_MULTIPART_MAX_CONCURRENCY,
+            ContentType="text/plain",
+        )
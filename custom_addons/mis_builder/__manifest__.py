@@ -42,6 +42,7 @@
     },
     "qweb": ["static/src/xml/mis_report_widget.xml"],
     "installable": True,
+    "uninstall_hook": "uninstall_hook",
     "application": True,
     "license": "AGPL-3",
     "development_status": "Production/Stable",
@@ -0,0 +1,9 @@
+# Copyright 2026 Safee Analytics
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+
+def uninstall_hook(env):
+    # the triggers counting the changes of the tables for the result cache
+    # are dropped with their function
+    env.cr.execute("DROP FUNCTION IF EXISTS mis_report_table_change() CASCADE")
+    env.cr.execute("DROP TABLE IF EXISTS mis_report_table_change")
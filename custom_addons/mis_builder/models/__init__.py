@@ -9,3 +9,4 @@ from . import aep
 from . import mis_kpi_data
 from . import prorata_read_group_mixin
 from . import mis_report_instance_annotation
+from . import mis_report_instance_result
@@ -4,7 +4,10 @@
 
 import ast
 import datetime
+import hashlib
+import json
 import logging
+import time
 
 from dateutil.relativedelta import relativedelta
 
@@ -27,6 +30,21 @@ MODE_NONE = "none"
 MODE_FIX = "fix"
 MODE_REL = "relative"
 
+# the context keys the result of a report instance depends on
+RESULT_CACHE_CONTEXT_KEYS = (
+    "lang",
+    "tz",
+    "allowed_company_ids",
+    "mis_analytic_domain",
+    "mis_pivot_date",
+)
+
+
+def _hash(value):
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
 
 class DateFilterRequired(ValidationError):
     pass
@@ -608,6 +626,12 @@ class MisReportInstance(models.Model):
     wide_display_by_default = fields.Boolean(
         string="Open report in wide mode by default",
     )
+    use_result_cache = fields.Boolean(
+        string="Cache results",
+        help="Store the computed report and display it again as long as the "
+        "report settings, the dates, the companies and the data it is "
+        "computed from do not change.",
+    )
 
     @api.depends("report_id.move_lines_source")
     def _compute_widget_search_view_id(self):
@@ -685,6 +709,29 @@ class MisReportInstance(models.Model):
         default["name"] = self.env._("%s (copy)", self.name)
         return super().copy(default)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        instances = super().create(vals_list)
+        if any(instances.mapped("use_result_cache")):
+            self.env["mis.report.instance.result"]._update_table_triggers()
+        return instances
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "use_result_cache" in vals or (
+            {"report_id", "period_ids"} & set(vals)
+            and any(self.mapped("use_result_cache"))
+        ):
+            self.env["mis.report.instance.result"]._update_table_triggers()
+        return res
+
+    def unlink(self):
+        use_result_cache = any(self.mapped("use_result_cache"))
+        res = super().unlink()
+        if use_result_cache:
+            self.env["mis.report.instance.result"]._update_table_triggers()
+        return res
+
     def _format_date(self, date):
         # format date following user language
         lang_model = self.env["res.lang"]
@@ -907,12 +954,165 @@ class MisReportInstance(models.Model):
 
     def compute(self):
         self.ensure_one()
-        kpi_matrix = self._compute_matrix()
-        ret = kpi_matrix.as_dict()
+        if self.use_result_cache:
+            ret = self._compute_with_result_cache()
+        else:
+            kpi_matrix = self._compute_matrix()
+            ret = kpi_matrix.as_dict()
 
         ret["notes"] = self.get_notes_by_cell_id()
         return ret
 
+    def _compute_with_result_cache(self, count_hit=True):
+        """Return the result stored for the current key, compute and store
+        it if there is none"""
+        self.ensure_one()
+        key = self._get_result_cache_key()
+        if not key:
+            return self._compute_matrix().as_dict()
+        result_model = self.env["mis.report.instance.result"].sudo()
+        ret = result_model._get_result(self, key, count_hit=count_hit)
+        if ret is None:
+            start = time.time()
+            ret = self._compute_matrix().as_dict()
+            context = self._get_result_cache_context()
+            scope = _hash({"uid": self.env.uid, "context": context})
+            result_model._set_result(
+                self, key, scope, context, ret, time.time() - start
+            )
+        return ret
+
+    def _get_result_cache_context(self):
+        return {
+            key: self.env.context[key]
+            for key in RESULT_CACHE_CONTEXT_KEYS
+            if key in self.env.context
+        }
+
+    def _get_result_cache_reports(self):
+        """Return the report of the instance and its subreports"""
+        self.ensure_one()
+        reports = self.report_id
+        while reports.subreport_ids.subreport_id - reports:
+            reports |= reports.subreport_ids.subreport_id
+        return reports
+
+    def _get_result_cache_models(self):
+        """Return the names of the models the result of the instance is
+        computed from, None if it can not be cached"""
+        self.ensure_one()
+        if any(
+            period.source not in (SRC_ACTUALS, SRC_ACTUALS_ALT, SRC_SUMCOL, SRC_CMPCOL)
+            for period in self.period_ids
+        ):
+            # the data of other sources is unknown
+            return None
+        model_names = {
+            self.report_id.account_model,
+            "account.move",
+            "account.move.line",
+            "res.currency.rate",
+        }
+        model_names.update(
+            period.source_aml_model_name
+            for period in self.period_ids
+            if period.source in (SRC_ACTUALS, SRC_ACTUALS_ALT)
+            and period.source_aml_model_name
+        )
+        for query in self._get_result_cache_reports().query_ids.sudo():
+            model = self.env[query.model_id.model]
+            if any(not model._fields[field.name].store for field in query.field_ids):
+                # computed from other models
+                return None
+            model_names.add(model._name)
+        return model_names
+
+    def _get_result_cache_key(self):
+        """Return the key of the result of the instance, None if it can not
+        be cached
+
+        The key changes with the settings of the instance and of its report,
+        the dates of the periods, the companies, the user, the context and
+        the data of the models the report is computed from.
+        """
+        self.ensure_one()
+        model_names = self._get_result_cache_models()
+        if model_names is None:
+            return None
+        tables = []
+        for model_name in sorted(model_names):
+            model = self.env[model_name]
+            model.flush_model()
+            tables.append(model._table)
+        table_changes = self.env["mis.report.instance.result"]._get_table_changes(
+            tables
+        )
+        if table_changes is None:
+            return None
+        reports = self._get_result_cache_reports()
+        queries = reports.query_ids.sudo()
+        kpis = reports.kpi_ids
+        records = (
+            self,
+            self.period_ids,
+            self.period_ids.source_sumcol_ids,
+            reports,
+            reports.subreport_ids,
+            reports.subkpi_ids,
+            queries,
+            kpis,
+            kpis.expression_ids,
+            reports.style_id | kpis.style_id | kpis.auto_expand_accounts_style_id,
+        )
+        return _hash(
+            {
+                "records": [
+                    (record._name, record.id, record.write_date)
+                    for recordset in records
+                    for record in recordset
+                ],
+                "periods": [
+                    (period.id, period.date_from, period.date_to)
+                    for period in self.period_ids
+                ],
+                "companies": self.query_company_ids.ids,
+                "uid": self.env.uid,
+                "context": self._get_result_cache_context(),
+                "table_changes": table_changes,
+            }
+        )
+
+    @api.model
+    def _warm_result_cache(self, limit=20):
+        """Compute again the most used results which are outdated
+
+        Each result is computed for the user and the context it was last
+        computed for.
+        """
+        results = self.env["mis.report.instance.result"].sudo().search(
+            [
+                ("report_instance_id.use_result_cache", "=", True),
+                ("user_id.active", "=", True),
+            ],
+            limit=limit,
+        )
+        for instance, user, context in [
+            (result.report_instance_id, result.user_id, result.context or {})
+            for result in results
+        ]:
+            try:
+                with self.env.cr.savepoint():
+                    instance.with_user(user).with_context(
+                        **context
+                    )._compute_with_result_cache(count_hit=False)
+            except Exception:
+                _logger.warning(
+                    "Could not compute the MIS report instance %s for %s",
+                    instance.id,
+                    user.login,
+                    exc_info=True,
+                )
+
     def get_notes_by_cell_id(self) -> dict:
         self.ensure_one()
         if not self.user_can_read_annotation:
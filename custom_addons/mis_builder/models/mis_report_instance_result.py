@@ -0,0 +1,266 @@
+# Copyright 2026 Safee Analytics
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import datetime
+import json
+import logging
+
+import psycopg2
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# results which have not been used for this number of days are deleted
+RESULT_MAX_AGE_DAYS = 30
+
+
+class MisReportInstanceResult(models.Model):
+    """The result of a MIS report instance computed for a user
+
+    The result is returned by ``mis.report.instance.compute`` as long as its
+    key does not change, see ``mis.report.instance._get_result_cache_key``.
+    """
+
+    _name = "mis.report.instance.result"
+    _description = "MIS Report Instance Result"
+    _order = "hit_count desc, last_used_date desc, id"
+
+    report_instance_id = fields.Many2one(
+        comodel_name="mis.report.instance",
+        ondelete="cascade",
+        required=True,
+        index=True,
+    )
+    user_id = fields.Many2one(
+        comodel_name="res.users",
+        ondelete="cascade",
+        required=True,
+    )
+    context = fields.Json(
+        help="The context keys the result depends on, used to compute it "
+        "again in advance."
+    )
+    scope = fields.Char(
+        required=True,
+        help="Hash of the user and of the context the result is computed for.",
+    )
+    key = fields.Char(required=True, index=True)
+    result = fields.Text()
+    hit_count = fields.Integer()
+    last_used_date = fields.Datetime(default=fields.Datetime.now)
+    compute_duration = fields.Float(string="Computation Duration (s)")
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mis_report_table_change (
+                table_name varchar NOT NULL,
+                txid bigint NOT NULL,
+                change_count bigint NOT NULL,
+                PRIMARY KEY (table_name, txid)
+            )
+            """
+        )
+        # one row per transaction, counting its statements, so that the
+        # concurrent transactions changing a table never update the same row
+        self.env.cr.execute(
+            """
+            CREATE OR REPLACE FUNCTION mis_report_table_change() RETURNS trigger
+            AS $$
+            BEGIN
+                INSERT INTO mis_report_table_change (table_name, txid, change_count)
+                VALUES (TG_TABLE_NAME, txid_current(), 1)
+                ON CONFLICT (table_name, txid) DO UPDATE
+                SET change_count = mis_report_table_change.change_count + 1;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        self._update_table_triggers()
+
+    @api.model
+    def _get_watched_tables(self):
+        """Return the tables whose changes are counted"""
+        self.env.cr.execute(
+            """
+            SELECT c.relname
+            FROM pg_trigger t
+            JOIN pg_class c ON c.oid = t.tgrelid
+            WHERE t.tgname = 'mis_report_table_change'
+            """
+        )
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _update_table_triggers(self):
+        """Count the changes of the tables the cached instances are computed
+        from, and only of these tables
+
+        The changes are counted by a trigger run after each statement which
+        inserts, updates, deletes or truncates rows of the tables, see
+        `_get_table_changes`.
+        """
+        cr = self.env.cr
+        instances = (
+            self.env["mis.report.instance"]
+            .sudo()
+            .search([("use_result_cache", "=", True)])
+        )
+        tables = set()
+        for instance in instances:
+            model_names = instance._get_result_cache_models()
+            if model_names:
+                tables.update(self.env[model_name]._table for model_name in model_names)
+        cr.execute(
+            """
+            SELECT name
+            FROM unnest(%s::varchar[]) name
+            JOIN pg_class c ON c.oid = to_regclass(name)
+            WHERE c.relkind = 'r'
+            """,
+            (sorted(tables),),
+        )
+        # views and partitioned tables are not watched, the instances
+        # computed from them are not cached
+        tables = {row[0] for row in cr.fetchall()}
+        watched_tables = self._get_watched_tables()
+        for table in sorted(watched_tables - tables):
+            cr.execute(
+                SQL(
+                    "DROP TRIGGER IF EXISTS mis_report_table_change ON %s",
+                    SQL.identifier(table),
+                )
+            )
+        for table in sorted(tables - watched_tables):
+            cr.execute(
+                SQL(
+                    "CREATE TRIGGER mis_report_table_change "
+                    "AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s "
+                    "FOR EACH STATEMENT EXECUTE FUNCTION mis_report_table_change()",
+                    SQL.identifier(table),
+                )
+            )
+            # the changes made while the table was not watched are unknown,
+            # the results computed before must not be used
+            cr.execute(
+                """
+                INSERT INTO mis_report_table_change (table_name, txid, change_count)
+                VALUES (%s, txid_current(), 1)
+                ON CONFLICT (table_name, txid) DO NOTHING
+                """,
+                (table,),
+            )
+
+    @api.model
+    def _get_table_changes(self, tables):
+        """Return the number of changes of each table, None if the changes of
+        one of them are not counted
+
+        The tables of the instances using the result cache are watched by
+        `_update_table_triggers`. Each transaction changing a watched table
+        counts its changes in its own row, `_gc_results` sums them up.
+        """
+        tables = sorted(set(tables))
+        if not set(tables) <= self._get_watched_tables():
+            return None
+        self.env.cr.execute(
+            """
+            SELECT table_name, sum(change_count)::bigint
+            FROM mis_report_table_change
+            WHERE table_name IN %s
+            GROUP BY table_name
+            """,
+            (tuple(tables),),
+        )
+        changes = dict.fromkeys(tables, 0)
+        changes.update(self.env.cr.fetchall())
+        return changes
+
+    @api.model
+    def _get_result(self, instance, key, count_hit=True):
+        """Return the result stored for the key, None if there is none"""
+        result = self.search(
+            [("report_instance_id", "=", instance.id), ("key", "=", key)], limit=1
+        )
+        if not result:
+            return None
+        if count_hit:
+            result._register_hit()
+        return json.loads(result.result)
+
+    def _register_hit(self):
+        self.ensure_one()
+        # the hits of the same result by concurrent requests must not make
+        # them fail, the hit is not counted in that case
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(
+                    """
+                    UPDATE mis_report_instance_result
+                    SET hit_count = hit_count + 1,
+                        last_used_date = now() at time zone 'UTC'
+                    WHERE id = %s
+                    """,
+                    (self.id,),
+                )
+        except psycopg2.OperationalError:
+            _logger.debug("Could not count the hit of the result %s", self.id)
+        self.invalidate_recordset(["hit_count", "last_used_date"])
+
+    @api.model
+    def _set_result(self, instance, key, scope, context, result, duration):
+        """Store the result, replacing the previous one of the user and
+        context"""
+        try:
+            payload = json.dumps(result)
+        except TypeError:
+            _logger.debug(
+                "Result of the MIS report instance %s can not be cached", instance.id
+            )
+            return
+        previous = self.search(
+            [("report_instance_id", "=", instance.id), ("scope", "=", scope)]
+        )
+        hit_count = max(previous.mapped("hit_count"), default=0)
+        previous.unlink()
+        self.create(
+            {
+                "report_instance_id": instance.id,
+                "user_id": self.env.uid,
+                "context": context,
+                "scope": scope,
+                "key": key,
+                "result": payload,
+                "hit_count": hit_count,
+                "compute_duration": duration,
+            }
+        )
+
+    @api.autovacuum
+    def _gc_results(self):
+        limit_date = fields.Datetime.now() - datetime.timedelta(
+            days=RESULT_MAX_AGE_DAYS
+        )
+        self.search([("last_used_date", "<", limit_date)]).unlink()
+        # sum up the changes of the committed transactions in a single row
+        # per table
+        self.env.cr.execute(
+            """
+            WITH compacted AS (
+                DELETE FROM mis_report_table_change
+                WHERE txid != 0
+                RETURNING table_name, change_count
+            )
+            INSERT INTO mis_report_table_change (table_name, txid, change_count)
+            SELECT table_name, 0, sum(change_count)
+            FROM compacted
+            GROUP BY table_name
+            ON CONFLICT (table_name, txid) DO UPDATE
+            SET change_count = mis_report_table_change.change_count
+                + excluded.change_count
+            """
+        )
+        self._update_table_triggers()
@@ -403,6 +403,75 @@ class TestMisReportInstance(common.HttpCase):
     def test_json(self):
         self.report_instance.compute()
 
+    def test_result_cache(self):
+        result_model = self.env["mis.report.instance.result"]
+        self.report_instance_2.use_result_cache = True
+        ret = self.report_instance_2.compute()
+        result = result_model.search(
+            [("report_instance_id", "=", self.report_instance_2.id)]
+        )
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result.hit_count, 0)
+        self.assertEqual(self.report_instance_2.compute(), ret)
+        self.assertEqual(result.hit_count, 1)
+        # the result is computed again when the report changes
+        key = result.key
+        self.env["mis.report.kpi"].create(
+            dict(
+                report_id=self.report_2.id,
+                description="New kpi",
+                name="new_kpi_r2",
+                expression="1.0",
+            )
+        )
+        ret = self.report_instance_2.compute()
+        self.assertEqual(ret["body"][-1]["label"], "New kpi")
+        result = result_model.search(
+            [("report_instance_id", "=", self.report_instance_2.id)]
+        )
+        self.assertEqual(len(result), 1)
+        self.assertNotEqual(result.key, key)
+        self.assertEqual(result.hit_count, 1)
+        # the partner debit of the query is computed from other models
+        self.report_instance.use_result_cache = True
+        self.report_instance.compute()
+        self.assertFalse(
+            result_model.search([("report_instance_id", "=", self.report_instance.id)])
+        )
+
+    def test_result_cache_table_changes(self):
+        """The key changes when the data the report is computed from is
+        created, modified or deleted"""
+        result_model = self.env["mis.report.instance.result"]
+        # the changes are only counted while an instance uses the cache
+        self.assertIsNone(self.report_instance_2._get_result_cache_key())
+        self.report_instance_2.use_result_cache = True
+        self.assertIn("account_move_line", result_model._get_watched_tables())
+        key = self.report_instance_2._get_result_cache_key()
+        self.assertTrue(key)
+        self.assertEqual(self.report_instance_2._get_result_cache_key(), key)
+        rate = self.env["res.currency.rate"].create(
+            {"currency_id": self.env.ref("base.EUR").id, "name": "2000-01-01"}
+        )
+        created_key = self.report_instance_2._get_result_cache_key()
+        self.assertNotEqual(created_key, key)
+        rate.rate = 2.0
+        written_key = self.report_instance_2._get_result_cache_key()
+        self.assertNotEqual(written_key, created_key)
+        rate.unlink()
+        self.assertNotIn(
+            self.report_instance_2._get_result_cache_key(),
+            (key, created_key, written_key),
+        )
+        # the changes of the transactions are summed up
+        changes = result_model._get_table_changes(["res_currency_rate"])
+        result_model._gc_results()
+        self.assertEqual(
+            result_model._get_table_changes(["res_currency_rate"]), changes
+        )
+        self.report_instance_2.use_result_cache = False
+        self.assertFalse(result_model._get_watched_tables())
+
     def test_drilldown(self):
         action = self.report_instance.drilldown(
             dict(expr="balp[200%]", period_id=self.report_instance.period_ids[0].id)
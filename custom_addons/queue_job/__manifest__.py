@@ -2,7 +2,7 @@
 
 {
     "name": "Job Queue",
-    "version": "18.0.2.0.2",
+    "version": "18.0.2.2.0",
     "author": "Camptocamp,ACSONE SA/NV,Odoo Community Association (OCA)",
     "website": "https://github.com/OCA/queue",
     "license": "LGPL-3",
@@ -13,6 +13,7 @@
         "security/security.xml",
         "security/ir.model.access.csv",
         "views/queue_job_views.xml",
+        "views/queue_job_archive_views.xml",
         "views/queue_job_channel_views.xml",
         "views/queue_job_function_views.xml",
         "wizards/queue_jobs_to_done_views.xml",
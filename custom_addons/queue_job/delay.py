@@ -287,8 +287,7 @@ class DelayableGraph(Graph):
             vertex._generated_job = existing
             return
 
-        for vertex in vertices:
-            vertex._generated_job.store()
+        Job.store_many(vertex._generated_job for vertex in vertices)
 
     def _execute_graph_direct(self, graph):
         for delayable in graph.topological_sort():
@@ -1,7 +1,10 @@
 # copyright 2016 Camptocamp
 # license lgpl-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 
+import base64
 import json
+import os
+import zlib
 from datetime import date, datetime
 
 import dateutil
@@ -11,6 +14,57 @@ from psycopg2.extras import Json as PsycopgJson
 from odoo import fields, models
 from odoo.tools.func import lazy
 
+from .jobrunner import queue_job_config
+
+# serialized values larger than this (in bytes) are stored compressed
+DEFAULT_PAYLOAD_COMPRESS_THRESHOLD = 2048
+PAYLOAD_COMPRESS_THRESHOLD = int(
+    os.environ.get("ODOO_QUEUE_JOB_PAYLOAD_COMPRESS_THRESHOLD")
+    or queue_job_config.get("payload_compress_threshold")
+    or DEFAULT_PAYLOAD_COMPRESS_THRESHOLD
+)
+PAYLOAD_COMPRESS_LEVEL = 6
+
+
+def payload_offload_threshold():
+    """Size above which job payloads are stored in an attachment
+
+    0 (the default) disables the out-of-row storage.
+    """
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_PAYLOAD_OFFLOAD_THRESHOLD")
+        or queue_job_config.get("payload_offload_threshold")
+        or 0
+    )
+
+
+def is_payload_reference(value):
+    """Return whether the value is a reference to a payload stored out of
+    row, see ``QueueJob._offload_payloads``"""
+    return isinstance(value, dict) and value.get("_type") == "job_payload"
+
+
+def load_payload(env, value):
+    """Return the payload a reference points to, the value itself if it is
+    not a reference
+
+    The references are left as is by the decoder, so the attachments are
+    only read when a job is loaded for execution, not on every read of the
+    job fields.
+    """
+    if not is_payload_reference(value):
+        return value
+    attachment = env["ir.attachment"].sudo().browse(value["attachment_id"])
+    return json.loads(zlib.decompress(attachment.raw), cls=JobDecoder, env=env)
+
+
+def compress_payload(value):
+    """Compress a serialized value, returning its json replacement"""
+    compressed = zlib.compress(value.encode(), PAYLOAD_COMPRESS_LEVEL)
+    return json.dumps(
+        {"_type": "zlib_base64", "value": base64.b64encode(compressed).decode()}
+    )
+
 
 class JobSerialized(fields.Json):
     """Provide the storage for job fields stored as json
@@ -21,6 +75,9 @@ class JobSerialized(fields.Json):
 
     Support for some custom types has been added to the json decoder/encoder
     (see JobEncoder and JobDecoder).
+
+    Values larger than the ``payload_compress_threshold`` are compressed
+    in the column, they are transparently decompressed by the decoder.
     """
 
     type = "job_serialized"
@@ -54,6 +111,8 @@ class JobSerialized(fields.Json):
 
     def convert_to_column(self, value, record, values=None, validate=True):
         value = self.convert_to_cache(value, record, validate=validate)
+        if isinstance(value, str) and len(value) > PAYLOAD_COMPRESS_THRESHOLD:
+            value = compress_payload(value)
         return PsycopgJson(value)
 
     def convert_to_cache(self, value, record, validate=True):
@@ -130,4 +189,9 @@ class JobDecoder(json.JSONDecoder):
             return dateutil.parser.parse(obj["value"]).date()
         elif type_ == "etree_element":
             return lxml.etree.fromstring(obj["value"])
+        elif type_ == "zlib_base64":
+            value = zlib.decompress(base64.b64decode(obj["value"]))
+            return json.loads(value, cls=JobDecoder, env=self.env)
+        # references to payloads stored out of row are resolved by
+        # load_payload
         return obj
@@ -8,6 +8,7 @@ import os
 import sys
 import uuid
 import weakref
+from collections import defaultdict
 from datetime import datetime, timedelta
 from random import randint
 
@@ -33,6 +34,12 @@ STATES = [
     (FAILED, "Failed"),
 ]
 
+# When this setting is "on" in a transaction, the queue_job_notify trigger
+# does not notify inserted jobs: Job.store_many sends one notification for
+# all the jobs of a graph instead, with this prefix followed by the graph uuid
+DEFER_NOTIFY_SETTING = "queue_job.defer_notify"
+GRAPH_NOTIFY_PREFIX = "graph:"
+
 DEFAULT_PRIORITY = 10  # used by the PriorityQueue to sort the jobs
 DEFAULT_MAX_RETRIES = 5
 RETRY_INTERVAL = 10 * 60  # seconds
@@ -280,11 +287,11 @@ class Job:
     def _load_from_db_record(cls, job_db_record):
         stored = job_db_record
 
-        args = stored.args
-        kwargs = stored.kwargs
+        args = stored._load_payload("args")
+        kwargs = stored._load_payload("kwargs")
         method_name = stored.method_name
 
-        recordset = stored.records
+        recordset = stored._load_payload("records")
         method = getattr(recordset, method_name)
 
         eta = None
@@ -569,6 +576,56 @@ class Job:
                 self._store_values(create=True)
             )
 
+    @classmethod
+    def store_many(cls, jobs):
+        """Store jobs in bulk
+
+        New jobs are created with a single ``create`` per environment, which
+        inserts them with multi-row INSERT statements, their dependencies
+        being part of the inserted values. When they are the jobs of a
+        graph, the notifications of the ``queue_job_notify`` trigger are
+        replaced by a single notification for the whole graph.
+
+        Jobs already stored are updated one by one.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        env = jobs[0].env
+        stored_uuids = set(
+            cls.db_records_from_uuids(env, [job.uuid for job in jobs]).mapped("uuid")
+        )
+        new_jobs_by_env = defaultdict(list)
+        for job in jobs:
+            if job.uuid in stored_uuids:
+                job.store()
+            else:
+                new_jobs_by_env[job.env].append(job)
+        new_jobs = [job for env_jobs in new_jobs_by_env.values() for job in env_jobs]
+        if not new_jobs:
+            return
+        graph_uuids = {job.graph_uuid for job in new_jobs}
+        graph_uuid = graph_uuids.pop() if len(graph_uuids) == 1 else None
+        defer_notify = len(new_jobs) > 1 and graph_uuid
+
+        if defer_notify:
+            # reverted with the transaction or savepoint if the create fails
+            env.cr.execute("SELECT set_config(%s, 'on', true)", (DEFER_NOTIFY_SETTING,))
+        for job_env, env_jobs in new_jobs_by_env.items():
+            job_model = job_env["queue.job"]
+            edit_sentinel = job_model.EDIT_SENTINEL
+            job_model.with_context(_job_edit_sentinel=edit_sentinel).sudo().create(
+                [job._store_values(create=True) for job in env_jobs]
+            )
+        if defer_notify:
+            env.cr.execute(
+                "SELECT set_config(%s, 'off', true)", (DEFER_NOTIFY_SETTING,)
+            )
+            env.cr.execute(
+                "SELECT pg_notify('queue_job', %s)",
+                (GRAPH_NOTIFY_PREFIX + graph_uuid,),
+            )
+
     def _store_values(self, create=False):
         vals = {
             "state": self.state,
@@ -700,13 +757,13 @@ class Job:
 
     @property
     def depends_on(self):
-        if not self._depends_on:
+        if not self._depends_on and self.__depends_on_uuids:
             self._depends_on = Job.load_many(self.env, self.__depends_on_uuids)
         return self._depends_on
 
     @property
     def reverse_depends_on(self):
-        if not self._reverse_depends_on:
+        if not self._reverse_depends_on and self.__reverse_depends_on_uuids:
             self._reverse_depends_on = Job.load_many(
                 self.env, self.__reverse_depends_on_uuids
             )
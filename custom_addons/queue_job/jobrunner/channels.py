@@ -2,9 +2,12 @@
 # Copyright 2015-2016 Camptocamp SA
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 import logging
+import time
 from collections import namedtuple
 from functools import total_ordering
-from heapq import heappop, heappush
+from heapq import heapify, heappop, heappush
+from itertools import count
+from operator import attrgetter
 from weakref import WeakValueDictionary
 
 from ..exception import ChannelNotFound
@@ -12,6 +15,10 @@ from ..job import CANCELLED, DONE, ENQUEUED, FAILED, PENDING, STARTED, WAIT_DEPE
 
 NOT_DONE = (WAIT_DEPENDENCIES, PENDING, ENQUEUED, STARTED, FAILED)
 JobSortingKey = namedtuple("SortingKey", "eta priority date_created seq")
+# flags the heap entries of objects removed from a PriorityQueue
+_REMOVED = object()
+# removed entries are not compacted below this size
+COMPACT_MIN_SIZE = 1024
 
 _logger = logging.getLogger(__name__)
 
@@ -19,6 +26,16 @@ _logger = logging.getLogger(__name__)
 class PriorityQueue:
     """A priority queue that supports removing arbitrary objects.
 
+    The queue keeps an index from objects to their heap entry: membership
+    tests and removals are O(1), adding an object and changing its
+    position after its sorting key changed are O(log n). Removed entries
+    are only flagged, and the heap is compacted when they outnumber the
+    live objects, so the memory used does not grow with the number of
+    removals.
+
+    ``key`` is a function returning the sorting key of an object, the
+    object itself is used if not provided.
+
     Adding an object already in the queue is a no op.
     Popping an empty queue returns None.
 
@@ -46,62 +63,87 @@ class PriorityQueue:
     >>> q.add(2)
     >>> q.pop()
     2
+
+    Objects whose sorting key changed are repositioned with ``update``.
+
+    >>> priorities = {"a": 1, "b": 2, "c": 3}
+    >>> q = PriorityQueue(key=priorities.get)
+    >>> for o in "abc":
+    ...     q.add(o)
+    >>> priorities["c"] = 0
+    >>> q.update("c")
+    >>> q.pop(), q.pop(), q.pop()
+    ('c', 'a', 'b')
     """
 
-    def __init__(self):
-        self._heap = []
-        self._known = set()  # all objects in the heap (including removed)
-        self._removed = set()  # all objects that have been removed
+    def __init__(self, key=None):
+        self._heap = []  # [sorting key, insertion counter, object]
+        self._entries = {}  # object -> its live entry in the heap
+        self._key = key
+        self._counter = count()
 
     def __len__(self):
-        return len(self._known) - len(self._removed)
+        return len(self._entries)
 
     def __getitem__(self, i):
         if i != 0:
             raise IndexError()
-        while True:
-            if not self._heap:
-                raise IndexError()
-            o = self._heap[0]
-            if o in self._removed:
-                o2 = heappop(self._heap)
-                assert o2 == o
-                self._removed.remove(o)
-                self._known.remove(o)
-            else:
-                return o
+        while self._heap and self._heap[0][-1] is _REMOVED:
+            heappop(self._heap)
+        if not self._heap:
+            raise IndexError()
+        return self._heap[0][-1]
 
     def __contains__(self, o):
-        return o in self._known and o not in self._removed
+        return o in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
 
     def add(self, o):
         if o is None:
             raise ValueError()
-        self._removed.discard(o)
-        if o in self._known:
+        if o in self._entries:
             return
-        self._known.add(o)
-        heappush(self._heap, o)
+        self._push(o)
 
     def remove(self, o):
         if o is None:
             raise ValueError()
-        if o not in self._known:
+        entry = self._entries.pop(o, None)
+        if entry is None:
             return
-        self._removed.add(o)
+        entry[-1] = _REMOVED
+        self._maybe_compact()
+
+    def update(self, o):
+        """Reposition ``o`` in the queue after its sorting key changed"""
+        entry = self._entries.pop(o, None)
+        if entry is None:
+            return
+        entry[-1] = _REMOVED
+        self._push(o)
+        self._maybe_compact()
 
     def pop(self):
-        while True:
-            try:
-                o = heappop(self._heap)
-            except IndexError:
-                # queue is empty
-                return None
-            self._known.remove(o)
-            if o in self._removed:
-                self._removed.remove(o)
-            else:
+        while self._heap:
+            o = heappop(self._heap)[-1]
+            if o is not _REMOVED:
+                del self._entries[o]
                 return o
+        # queue is empty
+        return None
+
+    def _push(self, o):
+        key = self._key(o) if self._key else o
+        entry = [key, next(self._counter), o]
+        self._entries[o] = entry
+        heappush(self._heap, entry)
+
+    def _maybe_compact(self):
+        if len(self._heap) > 2 * len(self._entries) + COMPACT_MIN_SIZE:
+            self._heap = [entry for entry in self._heap if entry[-1] is not _REMOVED]
+            heapify(self._heap)
 
 
 @total_ordering
@@ -190,15 +232,20 @@ class ChannelJob:
     def __repr__(self):
         return f"<ChannelJob {self.uuid}>"
 
-    def __eq__(self, other):
-        return id(self) == id(other)
-
-    def __hash__(self):
-        return id(self)
+    # __eq__ and __hash__ are inherited from object: jobs are compared by
+    # identity, which keeps hashing in C on the hot paths of the queues
 
     def set_no_eta(self):
         self._sorting_key = JobSortingKey(None, *self._sorting_key[1:])
 
+    def set_sorting_key(self, seq, priority, eta):
+        """Change the scheduling properties of the job.
+
+        The job must not be in a queue when this is called, use
+        :meth:`Channel.reschedule` instead.
+        """
+        self._sorting_key = JobSortingKey(eta, priority, self.date_created, seq)
+
     @property
     def seq(self):
         return self._sorting_key.seq
@@ -228,6 +275,9 @@ class ChannelJob:
         return self._sorting_key < other._sorting_key
 
 
+_job_sorting_key = attrgetter("_sorting_key")
+
+
 class ChannelQueue:
     """A channel queue is a priority queue for jobs.
 
@@ -312,8 +362,8 @@ class ChannelQueue:
     """
 
     def __init__(self, sequential=False):
-        self._queue = PriorityQueue()
-        self._eta_queue = PriorityQueue()
+        self._queue = PriorityQueue(key=_job_sorting_key)
+        self._eta_queue = PriorityQueue(key=_job_sorting_key)
         self.sequential = sequential
 
     def __len__(self):
@@ -332,6 +382,35 @@ class ChannelQueue:
         self._eta_queue.remove(job)
         self._queue.remove(job)
 
+    def reschedule(self, job, seq, priority, eta):
+        """Change the scheduling properties of a job in the queue.
+
+        >>> q = ChannelQueue()
+        >>> j1 = ChannelJob(None, None, 1,
+        ...                 seq=1, date_created=1, priority=10, eta=None)
+        >>> j2 = ChannelJob(None, None, 2,
+        ...                 seq=2, date_created=2, priority=10, eta=None)
+        >>> q.add(j1)
+        >>> q.add(j2)
+        >>> q.reschedule(j2, 2, 5, None)
+        >>> q.pop(now=1)
+        <ChannelJob 2>
+        >>> q.reschedule(j1, 1, 10, 5)
+        >>> q.pop(now=1)
+        >>> q.get_wakeup_time()
+        5
+        >>> q.pop(now=5)
+        <ChannelJob 1>
+        """
+        queue = self._eta_queue if job in self._eta_queue else self._queue
+        if bool(eta) == bool(job.eta):
+            job.set_sorting_key(seq, priority, eta)
+            queue.update(job)
+        else:
+            queue.remove(job)
+            job.set_sorting_key(seq, priority, eta)
+            self.add(job)
+
     def pop(self, now):
         while self._eta_queue and self._eta_queue[0].eta <= now:
             eta_job = self._eta_queue.pop()
@@ -463,6 +542,33 @@ class Channel:
             len(self._failed),
         )
 
+    def get_stats(self):
+        """Return the state of the channel and its sub-channels
+
+        >>> root = Channel("root", None, capacity=4)
+        >>> sub = Channel("sub", root, capacity=2, throttle=10)
+        >>> stats = sub.get_stats()[0]
+        >>> stats["name"], stats["capacity"], stats["throttle"], stats["queued"]
+        ('root.sub', 2, 10, 0)
+        >>> [stats['name'] for stats in root.get_stats()]
+        ['root', 'root.sub']
+        """
+        stats = [
+            {
+                "name": self.fullname,
+                "capacity": self.capacity,
+                "queued": len(self._queue),
+                "running": len(self._running),
+                "failed": len(self._failed),
+                "throttle": self.throttle,
+                "paused_until": self._pause_until,
+            }
+        ]
+        # copy the children, this can be called from another thread
+        for child in list(self.children.values()):
+            stats.extend(child.get_stats())
+        return stats
+
     def remove(self, job):
         """Remove a job from the channel."""
         self._queue.remove(job)
@@ -471,6 +577,20 @@ class Channel:
         if self.parent:
             self.parent.remove(job)
 
+    def reschedule(self, job, seq, priority, eta):
+        """Change the scheduling properties of a job of this channel.
+
+        The job keeps its place in the channel hierarchy, only the
+        queue holding it (if any) is reordered.
+        """
+        channel = self
+        while channel:
+            if job in channel._queue:
+                channel._queue.reschedule(job, seq, priority, eta)
+                return
+            channel = channel.parent
+        job.set_sorting_key(seq, priority, eta)
+
     def set_done(self, job):
         """Mark a job as done.
 
@@ -595,6 +715,246 @@ class Channel:
         return wakeup_time
 
 
+@total_ordering
+class _Descending:
+    """Invert the order of a sorting key, to get the last object of a
+    PriorityQueue first"""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+class ResidentJobs:
+    """Bound the number of pending jobs kept in memory per channel.
+
+    The runner can be configured to keep only the head ``max_jobs``
+    pending jobs of each channel of each database in the channels. Other
+    pending jobs stay in the database and are paged in when the resident
+    ones start running. Jobs in other states are always resident, as
+    they are needed to compute the channels capacity.
+
+    Pending jobs with an ETA in the future are bounded separately: up to
+    ``max_jobs`` of them, those whose ETA comes first, are resident in
+    each channel, and the next ones are paged in, by order of ETA, as the
+    resident ones become due and run.
+
+    Channels are identified by the channel name stored on the job, as
+    this is what is used to page jobs in.
+
+    ``admit`` returns whether the job must be notified to the channels and
+    the uuid of the resident job it evicted, if any.
+
+    >>> resident = ResidentJobs(max_jobs=2)
+    >>> resident.admit('db', 'root.A', 'A1', PENDING, seq=1, priority=10)
+    (True, None)
+    >>> resident.admit('db', 'root.A', 'A2', PENDING, seq=2, priority=10)
+    (True, None)
+
+    The channel is full, A3 stays in the database.
+
+    >>> resident.admit('db', 'root.A', 'A3', PENDING, seq=3, priority=10)
+    (False, None)
+    >>> resident.channels_to_page_in()
+    []
+
+    A4 has a higher priority than the last resident job, it replaces it.
+
+    >>> resident.admit('db', 'root.A', 'A4', PENDING, seq=4, priority=5)
+    (True, 'A2')
+
+    Jobs with an ETA in the future do not count in the limit of the jobs
+    that can run now, they have their own.
+
+    >>> resident.admit('db', 'root.A', 'A5', PENDING, seq=5, eta=2e9, now=1e9)
+    (True, None)
+    >>> resident.admit('db', 'root.A', 'A6', PENDING, seq=6, eta=3e9, now=1e9)
+    (True, None)
+    >>> resident.admit('db', 'root.A', 'A7', PENDING, seq=7, eta=4e9, now=1e9)
+    (False, None)
+
+    A1 and A4 start running, they do not count anymore: A2, A3 (and more
+    jobs) can be paged in.
+
+    >>> resident.admit('db', 'root.A', 'A1', ENQUEUED)
+    (True, None)
+    >>> resident.admit('db', 'root.A', 'A4', ENQUEUED)
+    (True, None)
+    >>> resident.channels_to_page_in()
+    [('db', 'root.A', False, ['A5', 'A6'], 2)]
+    >>> resident.admit('db', 'root.A', 'A2', PENDING, seq=2, priority=10)
+    (True, None)
+    >>> resident.set_exhausted('db', 'root.A')
+    >>> resident.channels_to_page_in()
+    []
+
+    A5 is due and starts running, the jobs with the next ETAs can be
+    paged in.
+
+    >>> resident.admit('db', 'root.A', 'A5', ENQUEUED)
+    (True, None)
+    >>> resident.channels_to_page_in()
+    [('db', 'root.A', True, ['A2', 'A6'], 1)]
+
+    Without limit, all the jobs are admitted.
+
+    >>> unbounded = ResidentJobs(max_jobs=0)
+    >>> all(unbounded.admit('db', 'root', str(i), PENDING)[0] for i in range(3))
+    True
+    """
+
+    def __init__(self, max_jobs=0):
+        self.max_jobs = max_jobs
+        # (db_name, channel) -> resident pending jobs that can run now,
+        # the last one according to PENDING_JOBS_ORDER first
+        self._pending = {}
+        # (db_name, channel) -> resident pending jobs with a future ETA,
+        # the one with the latest ETA first
+        self._deferred = {}
+        # uuid -> (priority, date_created, seq), prefixed by the ETA for the
+        # jobs with a future ETA
+        self._sort_keys = {}
+        self._key_by_uuid = {}  # uuid -> (db_name, channel)
+        # channels with pending jobs that can run now left in the db
+        self._truncated = set()
+        # channels with pending jobs with a future ETA left in the db
+        self._deferred_truncated = set()
+
+    def _queue(self, queues, key):
+        queue = queues.get(key)
+        if queue is None:
+            queue = queues[key] = PriorityQueue(
+                key=lambda uuid: _Descending(self._sort_keys[uuid])
+            )
+        return queue
+
+    def admit(
+        self,
+        db_name,
+        channel,
+        uuid,
+        state,
+        seq=0,
+        date_created=0,
+        priority=0,
+        eta=None,
+        now=None,
+    ):
+        """Record a job notification.
+
+        Return whether the job must be notified to the channels, and the
+        uuid of the job evicted to make room for it, which must be removed
+        from the channels.
+        """
+        if not self.max_jobs:
+            return True, None
+        if state != PENDING:
+            self.forget(uuid)
+            return True, None
+        key = (db_name, channel)
+        deferred = bool(eta) and eta > (time.time() if now is None else now)
+        if deferred:
+            queues, truncated = self._deferred, self._deferred_truncated
+            sort_key = (eta, priority, date_created, seq)
+        else:
+            queues, truncated = self._pending, self._truncated
+            sort_key = (priority, date_created, seq)
+        queue = self._queue(queues, key)
+        if uuid in queue:
+            if self._sort_keys[uuid] != sort_key:
+                self._sort_keys[uuid] = sort_key
+                queue.update(uuid)
+            return True, None
+        self.forget(uuid)
+        evicted = None
+        full = len(queue) >= self.max_jobs
+        # the jobs with a future ETA left in the database come after the
+        # resident ones, a later job must wait for them to be paged in, or
+        # it would take the room of jobs due before it
+        if full or (deferred and key in truncated):
+            worst = queue[0] if len(queue) else None
+            if worst is None or not sort_key < self._sort_keys[worst]:
+                # the job stays in the database until there is room for it
+                truncated.add(key)
+                return False, None
+        if full:
+            # the job comes before the last resident one, which goes back
+            # to the database
+            self.forget(worst)
+            truncated.add(key)
+            evicted = worst
+        self._sort_keys[uuid] = sort_key
+        self._key_by_uuid[uuid] = key
+        queue.add(uuid)
+        return True, evicted
+
+    def forget(self, uuid):
+        """Forget a resident pending job"""
+        key = self._key_by_uuid.pop(uuid, None)
+        if key is None:
+            return
+        for queues in (self._pending, self._deferred):
+            if key in queues:
+                queues[key].remove(uuid)
+        self._sort_keys.pop(uuid, None)
+
+    def set_truncated(self, db_name, channel, deferred=False):
+        truncated = self._deferred_truncated if deferred else self._truncated
+        truncated.add((db_name, channel))
+
+    def set_exhausted(self, db_name, channel, deferred=False):
+        """All the pending jobs of the channel are resident, the ones with a
+        future ETA if ``deferred``"""
+        truncated = self._deferred_truncated if deferred else self._truncated
+        truncated.discard((db_name, channel))
+
+    def channels_to_page_in(self):
+        """Return the truncated channels that have room for more jobs.
+
+        Jobs are paged in when less than half of the resident slots are
+        used, to page them in batches rather than one by one. The resident
+        jobs of the channel are excluded from the jobs to page in, there
+        are at most twice ``max_jobs`` of them.
+
+        :return: list of (db_name, channel, whether the jobs to page in are
+                 the ones with a future ETA, sorted resident pending uuids,
+                 free slots)
+        """
+        res = []
+        for deferred, queues, truncated in (
+            (False, self._pending, self._truncated),
+            (True, self._deferred, self._deferred_truncated),
+        ):
+            for key in sorted(truncated):
+                queue = queues.get(key, ())
+                if len(queue) <= self.max_jobs // 2:
+                    resident = sorted(
+                        {*self._pending.get(key, ()), *self._deferred.get(key, ())}
+                    )
+                    res.append(
+                        (*key, deferred, resident, self.max_jobs - len(queue))
+                    )
+        return res
+
+    def remove_db(self, db_name):
+        for queues in (self._pending, self._deferred):
+            for key in [key for key in queues if key[0] == db_name]:
+                for uuid in list(queues.pop(key)):
+                    self._key_by_uuid.pop(uuid, None)
+                    self._sort_keys.pop(uuid, None)
+        self._truncated = {key for key in self._truncated if key[0] != db_name}
+        self._deferred_truncated = {
+            key for key in self._deferred_truncated if key[0] != db_name
+        }
+
+
 def split_strip(s, sep, maxsplit=-1):
     """Split string and strip each component.
 
@@ -1033,18 +1393,17 @@ class ChannelManager:
             assert job.db_name == db_name
             # date_created is invariant
             assert job.date_created == date_created
-            # if one of the job properties that influence
-            # scheduling order has changed, we remove the job
-            # from the queues and create a new job object
-            if (
-                seq != job.seq
-                or priority != job.priority
-                or eta != job.eta
-                or channel != job.channel
-            ):
-                _logger.debug("job %s properties changed, rescheduling it", uuid)
+            # if the channel of the job has changed, we remove the job
+            # from the queues and create a new job object; if one of the
+            # job properties that influence scheduling order has changed,
+            # the job is repositioned in the queue holding it
+            if channel != job.channel:
+                _logger.debug("job %s channel changed, rescheduling it", uuid)
                 self.remove_job(uuid)
                 job = None
+            elif seq != job.seq or priority != job.priority or eta != job.eta:
+                _logger.debug("job %s properties changed, rescheduling it", uuid)
+                job.channel.reschedule(job, seq, priority, eta)
         if not job:
             job = ChannelJob(db_name, channel, uuid, seq, date_created, priority, eta)
             self._jobs_by_uuid[uuid] = job
@@ -1063,6 +1422,10 @@ class ChannelManager:
         else:
             _logger.error("unexpected state %s for job %s", state, job)
 
+    def get_job_by_uuid(self, uuid):
+        """Return the ChannelJob for ``uuid``, or None if it is not known"""
+        return self._jobs_by_uuid.get(uuid)
+
     def remove_job(self, uuid):
         job = self._jobs_by_uuid.get(uuid)
         if job:
@@ -1080,3 +1443,7 @@ class ChannelManager:
 
     def get_wakeup_time(self):
         return self._root_channel.get_wakeup_time()
+
+    def get_channels_stats(self):
+        """Return the state of all the channels, see Channel.get_stats"""
+        return self._root_channel.get_stats()
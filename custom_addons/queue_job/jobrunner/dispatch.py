@@ -0,0 +1,291 @@
+# Copyright 2026 Safee Analytics
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+"""
+Dispatchers asking Odoo to run jobs
+-----------------------------------
+
+The runner does not run jobs itself: it sends an HTTP GET to
+``/queue_job/runjob`` and does not wait for the response (the request
+runs the job in the Odoo worker, so it only returns when the job is done).
+
+Two dispatchers are available:
+
+* ``asyncio`` (default): a single event loop running in a daemon thread,
+  using a pooled keep-alive ``aiohttp`` client session and a bounded
+  number of in-flight requests. Requires the ``aiohttp`` library.
+* ``thread``: the historical behaviour, a new daemon thread and a new
+  ``requests.get`` per job. It is used as a fallback when ``aiohttp``
+  is not available.
+
+Both dispatchers expose the same interface (``start``, ``dispatch``,
+``stats`` and ``stop``).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# we are not interested in the result, so we set a short timeout
+# but not too short so we trap and log hard configuration errors
+DISPATCH_TIMEOUT = 1
+DEFAULT_MAX_INFLIGHT = 64
+STATS_LOG_INTERVAL = 60
+
+_logger = logging.getLogger(__name__)
+
+
+def _runjob_url(scheme, host, port, db_name, job_uuid):
+    return f"{scheme}://{host}:{port}/queue_job/runjob?db={db_name}&job_uuid={job_uuid}"
+
+
+class DispatchStats:
+    """Counters describing the activity of a dispatcher.
+
+    Latency is measured from the moment the runner asks for a job to be
+    dispatched until the HTTP request completes or times out.
+
+    >>> stats = DispatchStats()
+    >>> stats.record(0.5)
+    >>> stats.record(1.5)
+    >>> stats.as_dict()['dispatched'], stats.as_dict()['latency_avg']
+    (2, 1.0)
+    >>> stats.as_dict()['latency_max']
+    1.5
+    """
+
+    def __init__(self):
+        self.inflight = 0
+        self.max_inflight_seen = 0
+        self.dispatched = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.inflight += 1
+            self.max_inflight_seen = max(self.max_inflight_seen, self.inflight)
+
+    def end(self, error=False):
+        with self._lock:
+            self.inflight -= 1
+            if error:
+                self.errors += 1
+
+    def record(self, latency):
+        with self._lock:
+            self.dispatched += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "inflight": self.inflight,
+                "max_inflight_seen": self.max_inflight_seen,
+                "dispatched": self.dispatched,
+                "errors": self.errors,
+                "latency_avg": (
+                    self.latency_total / self.dispatched if self.dispatched else 0.0
+                ),
+                "latency_max": self.latency_max,
+                "latency_total": self.latency_total,
+            }
+
+
+class BaseDispatcher:
+    mode = None
+
+    def __init__(self, scheme, host, port, user=None, password=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.stats = DispatchStats()
+        self._last_stats_log = time.monotonic()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def dispatch(self, db_name, job_uuid):
+        raise NotImplementedError
+
+    def log_stats(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_stats_log < STATS_LOG_INTERVAL:
+            return
+        self._last_stats_log = now
+        stats = self.stats.as_dict()
+        _logger.info(
+            "%s dispatcher: %d in flight (max %d), %d dispatched, %d errors, "
+            "latency avg %.3fs max %.3fs",
+            self.mode,
+            stats["inflight"],
+            stats["max_inflight_seen"],
+            stats["dispatched"],
+            stats["errors"],
+            stats["latency_avg"],
+            stats["latency_max"],
+        )
+
+
+class ThreadDispatcher(BaseDispatcher):
+    """Start a daemon thread doing a blocking HTTP GET for every job."""
+
+    mode = "thread"
+
+    def dispatch(self, db_name, job_uuid):
+        url = _runjob_url(self.scheme, self.host, self.port, db_name, job_uuid)
+        auth = (self.user, self.password) if self.user else None
+        start = time.monotonic()
+
+        def urlopen():
+            # pylint: disable=except-pass
+            error = False
+            self.stats.begin()
+            try:
+                response = requests.get(url, timeout=DISPATCH_TIMEOUT, auth=auth)
+
+                # raise_for_status will result in either nothing, a Client Error
+                # for HTTP Response codes between 400 and 500 or a Server Error
+                # for codes between 500 and 600
+                response.raise_for_status()
+            except requests.Timeout:
+                # A timeout is a normal behaviour, it shouldn't be logged as an
+                # exception
+                pass
+            except Exception:
+                error = True
+                _logger.exception("exception in GET %s", url)
+            finally:
+                self.stats.end(error=error)
+                self.stats.record(time.monotonic() - start)
+
+        thread = threading.Thread(target=urlopen)
+        thread.daemon = True
+        thread.start()
+
+
+class AsyncioDispatcher(BaseDispatcher):
+    """Dispatch jobs from a single event loop with a pooled HTTP client.
+
+    The event loop runs in a daemon thread, ``dispatch`` is thread-safe
+    and returns immediately. At most ``max_inflight`` requests are sent
+    concurrently, the other ones wait for a free slot.
+    """
+
+    mode = "asyncio"
+
+    def __init__(self, *args, max_inflight=DEFAULT_MAX_INFLIGHT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_inflight = max_inflight
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+        self._ready = threading.Event()
+
+    def start(self):
+        if self._thread:
+            return
+        self._ready.clear()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="queue_job_dispatcher"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._open_session())
+        finally:
+            self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._close_session())
+        self._loop.close()
+
+    async def _open_session(self):
+        self._semaphore = asyncio.Semaphore(self.max_inflight)
+        connector = aiohttp.TCPConnector(
+            limit=self.max_inflight, keepalive_timeout=60
+        )
+        auth = aiohttp.BasicAuth(self.user, self.password or "") if self.user else None
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            auth=auth,
+            timeout=aiohttp.ClientTimeout(total=DISPATCH_TIMEOUT),
+        )
+
+    async def _close_session(self):
+        pending = [
+            task
+            for task in asyncio.all_tasks(self._loop)
+            if task is not asyncio.current_task()
+        ]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await self._session.close()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        self._loop = None
+
+    def dispatch(self, db_name, job_uuid):
+        if not self._thread:
+            self.start()
+        url = _runjob_url(self.scheme, self.host, self.port, db_name, job_uuid)
+        asyncio.run_coroutine_threadsafe(self._get(url, time.monotonic()), self._loop)
+
+    async def _get(self, url, start):
+        error = False
+        async with self._semaphore:
+            self.stats.begin()
+            try:
+                async with self._session.get(url) as response:
+                    response.raise_for_status()
+            except asyncio.TimeoutError:
+                # A timeout is a normal behaviour, the job keeps running
+                # in the Odoo worker
+                pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                error = True
+                _logger.exception("exception in GET %s", url)
+            finally:
+                self.stats.end(error=error)
+                self.stats.record(time.monotonic() - start)
+
+
+def make_dispatcher(mode, scheme, host, port, user=None, password=None, **kwargs):
+    """Return a dispatcher for ``mode``, falling back to threads if needed."""
+    if mode == AsyncioDispatcher.mode:
+        if aiohttp is not None:
+            return AsyncioDispatcher(scheme, host, port, user, password, **kwargs)
+        _logger.warning(
+            "aiohttp is not installed, falling back to the thread job dispatcher"
+        )
+    elif mode != ThreadDispatcher.mode:
+        _logger.warning("unknown job dispatch mode %s, using threads", mode)
+    return ThreadDispatcher(scheme, host, port, user, password)
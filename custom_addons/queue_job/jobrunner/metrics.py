@@ -0,0 +1,366 @@
+# Copyright 2026 Safee Analytics
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+"""
+Metrics of the job runner
+-------------------------
+
+The runner collects metrics about the channels, the dispatch of jobs and
+its own loop. When ``ODOO_QUEUE_JOB_METRICS_PORT`` (or ``metrics_port``
+in the ``[queue_job]`` section) is set, they are served in the Prometheus
+text format at ``/metrics`` on this port, on ``127.0.0.1`` unless
+``ODOO_QUEUE_JOB_METRICS_INTERFACE`` is set.
+
+The metrics are served by the runner process itself rather than by an
+Odoo controller, because the runner state is not shared with the Odoo
+workers.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .channels import DONE, ENQUEUED, FAILED, STARTED
+
+_logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# buckets of the runner loop durations, in seconds
+LOOP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# buckets of the jobs latencies, in seconds
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600, 14400)
+
+# state of the runner, taken by the runner loop for the metrics server
+RunnerState = namedtuple("RunnerState", "channels wakeup_time databases")
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus sense
+
+    >>> histogram = Histogram("loop_seconds", "Loop duration", (0.1, 1))
+    >>> histogram.observe(0.05)
+    >>> histogram.observe(0.5)
+    >>> histogram.observe(2)
+    >>> print("\\n".join(histogram.render()))
+    # HELP loop_seconds Loop duration
+    # TYPE loop_seconds histogram
+    loop_seconds_bucket{le="0.1"} 1
+    loop_seconds_bucket{le="1"} 2
+    loop_seconds_bucket{le="+Inf"} 3
+    loop_seconds_sum 2.55
+    loop_seconds_count 3
+    """
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+                    break
+            self._count += 1
+            self._sum += value
+
+    def render(self):
+        with self._lock:
+            counts, count, total = list(self._counts), self._count, self._sum
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts, strict=True):
+            cumulative += bucket_count
+            yield f'{self.name}_bucket{{le="{bound}"}} {cumulative}'
+        yield f'{self.name}_bucket{{le="+Inf"}} {count}'
+        yield f"{self.name}_sum {round(total, 6)}"
+        yield f"{self.name}_count {count}"
+
+
+class RunnerMetrics:
+    """Metrics of a QueueJobRunner
+
+    The runner reports the jobs it enqueues and the state changes it is
+    notified of, which give the latency between the enqueue and the start
+    of a job, and the duration of its execution. The times are the ones at
+    which the runner sees the changes.
+
+    >>> metrics = RunnerMetrics()
+    >>> metrics.job_enqueued("uuid", now=10)
+    >>> metrics.job_state("uuid", STARTED, now=12)
+    >>> metrics.job_state("uuid", DONE, now=15)
+    >>> metrics.start_latency._sum, metrics.run_duration._sum
+    (2.0, 3.0)
+    >>> metrics.job_state("uuid", DONE, now=16)
+    >>> metrics.run_duration._count
+    1
+
+    The sweeps of dead jobs are reported too.
+
+    >>> metrics.dead_jobs_sweep(0.2, 3)
+    >>> metrics.dead_jobs_requeued, metrics.dead_jobs_sweep_duration._count
+    (3, 1)
+
+    The channels are only read by the runner loop, which keeps a snapshot
+    of their state for the metrics server thread.
+
+    >>> from types import SimpleNamespace
+    >>> root = {"name": "root", "capacity": 2, "queued": 1, "running": 1}
+    >>> runner = SimpleNamespace(
+    ...     channel_manager=SimpleNamespace(
+    ...         get_channels_stats=lambda: [root], get_wakeup_time=lambda: 42
+    ...     ),
+    ...     db_by_name={"db": None},
+    ... )
+    >>> metrics.update_state(runner)
+    >>> metrics.state.wakeup_time, metrics.state.databases
+    (42, 1)
+    >>> [stats["queued"] for stats in metrics.state.channels]
+    [1]
+    """
+
+    def __init__(self):
+        self.enqueued = 0
+        self.loop_durations = {
+            step: Histogram(
+                f"queue_job_runner_{step}_duration_seconds",
+                f"Duration of the {step} step of the runner loop",
+                LOOP_BUCKETS,
+            )
+            for step in ("process_notifications", "run_jobs")
+        }
+        self.start_latency = Histogram(
+            "queue_job_start_latency_seconds",
+            "Time between the enqueue and the start of jobs",
+            JOB_BUCKETS,
+        )
+        self.run_duration = Histogram(
+            "queue_job_run_duration_seconds",
+            "Time between the start and the end (done or failed) of jobs",
+            JOB_BUCKETS,
+        )
+        self.dead_jobs_requeued = 0
+        self.dead_jobs_sweep_duration = Histogram(
+            "queue_job_dead_jobs_sweep_duration_seconds",
+            "Duration of the sweeps of dead jobs",
+            LOOP_BUCKETS,
+        )
+        # uuid -> time at which the job was enqueued or started
+        self._enqueued_at = {}
+        self._started_at = {}
+        self.state = RunnerState((), 0, 0)
+
+    @contextmanager
+    def timed(self, step):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.loop_durations[step].observe(time.monotonic() - start)
+
+    def job_enqueued(self, uuid, now=None):
+        self.enqueued += 1
+        self._enqueued_at[uuid] = time.monotonic() if now is None else now
+
+    def job_state(self, uuid, state, now=None):
+        if state == ENQUEUED:
+            return
+        now = time.monotonic() if now is None else now
+        enqueued_at = self._enqueued_at.pop(uuid, None)
+        if state == STARTED:
+            if enqueued_at is not None:
+                self.start_latency.observe(now - enqueued_at)
+            self._started_at[uuid] = now
+            return
+        started_at = self._started_at.pop(uuid, None)
+        if state in (DONE, FAILED) and started_at is not None:
+            self.run_duration.observe(now - started_at)
+
+    def dead_jobs_sweep(self, duration, requeued):
+        self.dead_jobs_sweep_duration.observe(duration)
+        self.dead_jobs_requeued += requeued
+
+    def forget(self, uuid):
+        self._enqueued_at.pop(uuid, None)
+        self._started_at.pop(uuid, None)
+
+    def update_state(self, runner):
+        """Take a snapshot of the channels, called by the runner loop
+
+        The channels must not be read from the metrics server thread:
+        computing the wakeup time pops the jobs removed from their queues.
+        The snapshot is replaced as a whole, never modified.
+        """
+        channel_manager = runner.channel_manager
+        self.state = RunnerState(
+            channels=tuple(channel_manager.get_channels_stats()),
+            wakeup_time=channel_manager.get_wakeup_time() or 0,
+            databases=len(runner.db_by_name),
+        )
+
+    def render(self, runner):
+        """Return the metrics of the runner in the Prometheus text format
+
+        The channels come from the last snapshot of the runner loop, see
+        update_state.
+        """
+        lines = []
+
+        def metric(name, documentation, samples, metric_type="gauge"):
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_format(value)}")
+
+        state = self.state
+        for key, documentation in (
+            ("capacity", "Capacity of the channel, 0 when unlimited"),
+            ("queued", "Jobs queued in the channel"),
+            ("running", "Jobs running in the channel"),
+            ("failed", "Failed jobs of the channel"),
+            ("throttle", "Throttle of the channel, in seconds"),
+            ("paused_until", "Time until which the channel is paused, 0 if not"),
+        ):
+            metric(
+                f"queue_job_channel_{key}",
+                documentation,
+                [
+                    ({"channel": stats["name"]}, stats[key] or 0)
+                    for stats in state.channels
+                ],
+            )
+        metric(
+            "queue_job_wakeup_time",
+            "Time at which the runner must wake up for scheduled jobs, 0 if none",
+            [({}, state.wakeup_time)],
+        )
+        metric(
+            "queue_job_databases",
+            "Databases handled by the runner",
+            [({}, state.databases)],
+        )
+        metric(
+            "queue_job_enqueued_total",
+            "Jobs enqueued by the runner",
+            [({}, self.enqueued)],
+            "counter",
+        )
+        metric(
+            "queue_job_dead_jobs_requeued_total",
+            "Dead jobs requeued by the runner",
+            [({}, self.dead_jobs_requeued)],
+            "counter",
+        )
+        dispatch = runner.dispatcher.stats.as_dict()
+        metric(
+            "queue_job_dispatch_total",
+            "Jobs dispatched to Odoo",
+            [({}, dispatch["dispatched"])],
+            "counter",
+        )
+        metric(
+            "queue_job_dispatch_errors_total",
+            "Dispatch requests which failed",
+            [({}, dispatch["errors"])],
+            "counter",
+        )
+        metric(
+            "queue_job_dispatch_inflight",
+            "Dispatch requests in flight",
+            [({}, dispatch["inflight"])],
+        )
+        metric(
+            "queue_job_dispatch_latency_seconds",
+            "Duration of the dispatch requests",
+            [],
+            "summary",
+        )
+        lines.append(
+            f"queue_job_dispatch_latency_seconds_sum {dispatch['latency_total']!r}"
+        )
+        lines.append(
+            f"queue_job_dispatch_latency_seconds_count {dispatch['dispatched']}"
+        )
+        for histogram in (
+            *self.loop_durations.values(),
+            self.start_latency,
+            self.run_duration,
+            self.dead_jobs_sweep_duration,
+        ):
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serve the metrics of a runner over HTTP, in a daemon thread"""
+
+    def __init__(self, runner, interface, port):
+        self.runner = runner
+        self.interface = interface
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        runner = self.runner
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = runner.metrics.render(runner).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                _logger.debug("metrics: " + format, *args)
+
+        self._server = ThreadingHTTPServer((self.interface, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="queue_job_metrics"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        _logger.info(
+            "serving runner metrics on http://%s:%s/metrics",
+            self.interface,
+            self._server.server_port,
+        )
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
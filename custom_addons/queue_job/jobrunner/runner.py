@@ -39,6 +39,33 @@ How to use it?
     or ``False`` if unset.
   - ``ODOO_QUEUE_JOB_JOBRUNNER_DB_PASSWORD=passdb``, default ``db_password``
     or ``False`` if unset.
+  - ``ODOO_QUEUE_JOB_DISPATCH_MODE=thread``, default ``asyncio``: how the
+    runner sends the ``/queue_job/runjob`` requests. ``asyncio`` uses a
+    single event loop with a pooled keep-alive HTTP client (requires
+    ``aiohttp``, falls back to ``thread`` if missing), ``thread`` starts a
+    thread per job.
+  - ``ODOO_QUEUE_JOB_DISPATCH_MAX_INFLIGHT=128``, default ``64``: maximum
+    number of concurrent ``runjob`` requests in ``asyncio`` mode.
+  - ``ODOO_QUEUE_JOB_MAX_RESIDENT_JOBS=10000``, default ``0`` (unlimited):
+    maximum number of pending jobs kept in memory per channel and per
+    database, and of pending jobs with an ETA in the future; the next
+    ones are loaded from the database when the resident jobs start
+    running, so the runner memory stays bounded whatever the size of the
+    backlog.
+  - ``ODOO_QUEUE_JOB_DB_DISCOVERY_INTERVAL=300``, default ``60``: interval
+    in seconds between two lookups for new or dropped databases, ``0``
+    disables the lookup.
+  - ``ODOO_QUEUE_JOB_DB_INIT_WORKERS=16``, default ``8``: number of
+    databases opened in parallel at startup and on discovery.
+  - ``ODOO_QUEUE_JOB_DEAD_JOBS_SWEEP_MAX_INTERVAL=120``, default ``60``:
+    maximum interval in seconds between two sweeps looking for dead jobs;
+    sweeps are more frequent after dead jobs have been found.
+  - ``ODOO_QUEUE_JOB_METRICS_PORT=9469``, default ``0`` (disabled): port
+    on which the runner serves its metrics (channels, dispatch, job
+    latencies, loop durations) in the Prometheus text format, at
+    ``/metrics``.
+  - ``ODOO_QUEUE_JOB_METRICS_INTERFACE=0.0.0.0``, default ``127.0.0.1``:
+    interface of the metrics server.
 
 * Alternatively, configure the channels through the Odoo configuration
   file, like:
@@ -56,6 +83,13 @@ How to use it?
   jobrunner_db_port = 5432
   jobrunner_db_user = userdb
   jobrunner_db_password = passdb
+  dispatch_mode = asyncio
+  dispatch_max_inflight = 64
+  max_resident_jobs = 10000
+  db_discovery_interval = 60
+  db_init_workers = 8
+  dead_jobs_sweep_max_interval = 60
+  metrics_port = 9469
 
 * Or, if using ``anybox.recipe.odoo``, add this to your buildout configuration:
 
@@ -111,8 +145,12 @@ How to use it?
 Caveat
 ------
 
-* After creating a new database or installing queue_job on an
-  existing database, Odoo must be restarted for the runner to detect it.
+* New databases, and databases on which queue_job has been installed after
+  the runner started, are detected every ``db_discovery_interval`` seconds.
+  If it is set to ``0``, Odoo must be restarted for the runner to detect
+  them.
+* PostgreSQL notifications are scoped to a database, so the runner keeps
+  one listening connection per database having queue_job installed.
 
 .. rubric:: Footnotes
 
@@ -126,23 +164,49 @@ Caveat
 import logging
 import os
 import selectors
-import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing, contextmanager
 
 import psycopg2
-import requests
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
 import odoo
-from odoo.tools import config
+from odoo.tools import config, split_every
 
+from ..job import GRAPH_NOTIFY_PREFIX
 from . import queue_job_config
-from .channels import ENQUEUED, NOT_DONE, ChannelManager
+from .channels import (
+    ENQUEUED,
+    FAILED,
+    NOT_DONE,
+    PENDING,
+    STARTED,
+    ChannelManager,
+    ResidentJobs,
+)
+from .dispatch import DEFAULT_MAX_INFLIGHT, make_dispatcher
+from .metrics import MetricsServer, RunnerMetrics
 
 SELECT_TIMEOUT = 60
 ERROR_RECOVERY_DELAY = 5
 PG_ADVISORY_LOCK_ID = 2293787760715711918
+ENQUEUE_BATCH_SIZE = 1000
+DB_DISCOVERY_INTERVAL = 60
+DEAD_JOBS_BATCH_SIZE = 500
+DEAD_JOBS_MAX_BATCHES = 10
+DEAD_JOBS_SWEEP_MIN_INTERVAL = 5
+DEAD_JOBS_SWEEP_MAX_INTERVAL = 60
+DB_INIT_WORKERS = 8
+METRICS_INTERFACE = "127.0.0.1"
+# databases without queue_job are checked again at most this often (seconds)
+DB_RECHECK_INTERVAL = 600
+# order in which pending jobs are kept resident when their number is
+# bounded: jobs that can run now first, then by the channels sorting order
+PENDING_JOBS_ORDER = (
+    "(eta IS NOT NULL AND eta > now() AT TIME ZONE 'utc'), "
+    "priority, date_created, id"
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -169,6 +233,103 @@ def _channels():
     )
 
 
+def _dispatch_mode():
+    return (
+        os.environ.get("ODOO_QUEUE_JOB_DISPATCH_MODE")
+        or queue_job_config.get("dispatch_mode")
+        or "asyncio"
+    )
+
+
+def _dispatch_max_inflight():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_DISPATCH_MAX_INFLIGHT")
+        or queue_job_config.get("dispatch_max_inflight")
+        or DEFAULT_MAX_INFLIGHT
+    )
+
+
+def _db_discovery_interval():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_DB_DISCOVERY_INTERVAL")
+        or queue_job_config.get("db_discovery_interval")
+        or DB_DISCOVERY_INTERVAL
+    )
+
+
+def _db_init_workers():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_DB_INIT_WORKERS")
+        or queue_job_config.get("db_init_workers")
+        or DB_INIT_WORKERS
+    )
+
+
+def _dead_jobs_sweep_max_interval():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_DEAD_JOBS_SWEEP_MAX_INTERVAL")
+        or queue_job_config.get("dead_jobs_sweep_max_interval")
+        or DEAD_JOBS_SWEEP_MAX_INTERVAL
+    )
+
+
+def _next_dead_jobs_sweep_interval(
+    interval, requeued, batch_full, max_interval=DEAD_JOBS_SWEEP_MAX_INTERVAL
+):
+    """Return the interval in seconds until the next dead jobs sweep.
+
+    When the last sweep stopped on a full batch, there are more dead jobs
+    to requeue right away.
+
+    >>> _next_dead_jobs_sweep_interval(30, 500, True)
+    0
+
+    When it found dead jobs, others are likely to follow (a worker was
+    killed), sweep again soon.
+
+    >>> _next_dead_jobs_sweep_interval(30, 3, False)
+    5
+
+    Otherwise, back off up to the maximum interval.
+
+    >>> _next_dead_jobs_sweep_interval(5, 0, False)
+    10
+    >>> _next_dead_jobs_sweep_interval(0, 0, False)
+    5
+    >>> _next_dead_jobs_sweep_interval(40, 0, False)
+    60
+    """
+    if batch_full:
+        return 0
+    if requeued:
+        return DEAD_JOBS_SWEEP_MIN_INTERVAL
+    return min(max(interval * 2, DEAD_JOBS_SWEEP_MIN_INTERVAL), max_interval)
+
+
+def _max_resident_jobs():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_MAX_RESIDENT_JOBS")
+        or queue_job_config.get("max_resident_jobs")
+        or 0
+    )
+
+
+def _metrics_port():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_METRICS_PORT")
+        or queue_job_config.get("metrics_port")
+        or 0
+    )
+
+
+def _metrics_interface():
+    return (
+        os.environ.get("ODOO_QUEUE_JOB_METRICS_INTERFACE")
+        or queue_job_config.get("metrics_interface")
+        or METRICS_INTERFACE
+    )
+
+
 def _odoo_now():
     # important: this must return the same as postgresql
     # EXTRACT(EPOCH FROM TIMESTAMP dt)
@@ -189,47 +350,28 @@ def _connection_info_for(db_name):
     return connection_info
 
 
-def _async_http_get(scheme, host, port, user, password, db_name, job_uuid):
-    # TODO: better way to HTTP GET asynchronously (grequest, ...)?
-    #       if this was python3 I would be doing this with
-    #       asyncio, aiohttp and aiopg
-    def urlopen():
-        url = f"{scheme}://{host}:{port}/queue_job/runjob?db={db_name}&job_uuid={job_uuid}"
-        # pylint: disable=except-pass
-        try:
-            auth = None
-            if user:
-                auth = (user, password)
-            # we are not interested in the result, so we set a short timeout
-            # but not too short so we trap and log hard configuration errors
-            response = requests.get(url, timeout=1, auth=auth)
-
-            # raise_for_status will result in either nothing, a Client Error
-            # for HTTP Response codes between 400 and 500 or a Server Error
-            # for codes between 500 and 600
-            response.raise_for_status()
-        except requests.Timeout:
-            # A timeout is a normal behaviour, it shouldn't be logged as an exception
-            pass
-        except Exception:
-            _logger.exception("exception in GET %s", url)
-
-    thread = threading.Thread(target=urlopen)
-    thread.daemon = True
-    thread.start()
-
-
 class Database:
-    def __init__(self, db_name):
+    def __init__(self, db_name, setup=True):
         self.db_name = db_name
+        self.dead_jobs_sweep_max_interval = _dead_jobs_sweep_max_interval()
+        self.dead_jobs_sweep_interval = DEAD_JOBS_SWEEP_MIN_INTERVAL
+        self.next_dead_jobs_sweep = 0
         connection_info = _connection_info_for(db_name)
         self.conn = psycopg2.connect(**connection_info)
         try:
             self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
             self.has_queue_job = self._has_queue_job()
-            if self.has_queue_job:
-                self._acquire_master_lock()
-                self._initialize()
+            if self.has_queue_job and setup:
+                self.setup()
+        except BaseException:
+            self.close()
+            raise
+
+    def setup(self):
+        """Acquire the master lock and listen to the job notifications"""
+        try:
+            self._acquire_master_lock()
+            self._initialize()
         except BaseException:
             self.close()
             raise
@@ -301,20 +443,91 @@ class Database:
             cr.execute(query, args)
             yield cr
 
+    def select_pending_jobs_head(self, limit):
+        """Select the first ``limit`` pending jobs of every channel, and the
+        first ``limit`` pending jobs with an ETA in the future, by ETA
+
+        The last columns are whether the job has an ETA in the future and
+        the number of such pending jobs, or of the other ones, in the
+        channel.
+        """
+        query = f"""
+            SELECT
+                channel, uuid, seq, date_created, priority, eta, state,
+                deferred, total
+            FROM (
+                SELECT
+                    channel, uuid, id AS seq, date_created, priority,
+                    EXTRACT(EPOCH FROM eta) AS eta, state, deferred,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY channel, deferred
+                        ORDER BY CASE WHEN deferred THEN eta END,
+                                 {PENDING_JOBS_ORDER}
+                    ) AS rank,
+                    COUNT(*) OVER (PARTITION BY channel, deferred) AS total
+                FROM (
+                    SELECT
+                        *,
+                        coalesce(eta > now() AT TIME ZONE 'utc', false)
+                            AS deferred
+                    FROM queue_job
+                    WHERE state = %s
+                ) AS queue_job
+            ) AS pending_jobs
+            WHERE rank <= %s
+        """
+        with closing(self.conn.cursor()) as cr:
+            cr.execute(query, (PENDING, limit))
+            return cr.fetchall()
+
+    def select_pending_jobs(self, channel, exclude_uuids, limit, deferred=False):
+        """Select the next ``limit`` pending jobs of a channel
+
+        When ``deferred``, select the jobs with an ETA by order of ETA,
+        including the ones whose ETA has been reached since they were left
+        in the database, otherwise select the jobs that can run now.
+        """
+        if deferred:
+            where = "eta IS NOT NULL"
+            order = "eta, priority, date_created, id"
+        else:
+            where = "(eta IS NULL OR eta <= now() AT TIME ZONE 'utc')"
+            order = PENDING_JOBS_ORDER
+        with self.select_jobs(
+            f"state = %s AND channel IS NOT DISTINCT FROM %s AND {where} "
+            "AND NOT (uuid = ANY(%s)) "
+            f"ORDER BY {order} LIMIT %s",
+            (PENDING, channel, list(exclude_uuids), limit),
+        ) as cr:
+            return cr.fetchall()
+
     def keep_alive(self):
         query = "SELECT 1"
         with closing(self.conn.cursor()) as cr:
             cr.execute(query)
 
     def set_job_enqueued(self, uuid):
+        self.set_jobs_enqueued([uuid])
+
+    def set_jobs_enqueued(self, uuids):
+        """Set jobs to enqueued, one round trip per ``ENQUEUE_BATCH_SIZE`` jobs
+
+        Return the set of uuids that were actually updated (a job may have
+        been deleted since it was loaded in the channels).
+        """
+        enqueued = set()
         with closing(self.conn.cursor()) as cr:
-            cr.execute(
-                "UPDATE queue_job SET state=%s, "
-                "date_enqueued=date_trunc('seconds', "
-                "                         now() at time zone 'utc') "
-                "WHERE uuid=%s",
-                (ENQUEUED, uuid),
-            )
+            for batch in split_every(ENQUEUE_BATCH_SIZE, uuids, list):
+                cr.execute(
+                    "UPDATE queue_job SET state=%s, "
+                    "date_enqueued=date_trunc('seconds', "
+                    "                         now() at time zone 'utc') "
+                    "WHERE uuid = ANY(%s) "
+                    "RETURNING uuid",
+                    (ENQUEUED, batch),
+                )
+                enqueued.update(uuid for (uuid,) in cr.fetchall())
+        return enqueued
 
     def _query_requeue_dead_jobs(self):
         return """
@@ -373,6 +586,7 @@ class Database:
                                 AND date_enqueued <
                                 (now() AT TIME ZONE 'utc' - INTERVAL '10 sec')
                         )
+                    LIMIT %(limit)s
                     FOR UPDATE SKIP LOCKED
                 )
             RETURNING uuid
@@ -396,15 +610,46 @@ class Database:
         However, when the Odoo server crashes or is otherwise force-stopped,
         running jobs are interrupted while the runner has no chance to know
         they have been aborted.
-        """
 
+        Dead jobs are requeued in batches of ``DEAD_JOBS_BATCH_SIZE``, at most
+        ``DEAD_JOBS_MAX_BATCHES`` batches per sweep. The interval until the
+        next sweep is adapted to the number of dead jobs found, see
+        :func:`_next_dead_jobs_sweep_interval`.
+
+        Return the number of requeued jobs.
+        """
+        start = time.monotonic()
+        requeued = 0
+        batch_full = False
         with closing(self.conn.cursor()) as cr:
             query = self._query_requeue_dead_jobs()
 
-            cr.execute(query)
+            for _i in range(DEAD_JOBS_MAX_BATCHES):
+                cr.execute(query, {"limit": DEAD_JOBS_BATCH_SIZE})
+                uuids = cr.fetchall()
+                for (uuid,) in uuids:
+                    _logger.warning("Re-queued dead job with uuid: %s", uuid)
+                requeued += len(uuids)
+                batch_full = len(uuids) >= DEAD_JOBS_BATCH_SIZE
+                if not batch_full:
+                    break
 
-            for (uuid,) in cr.fetchall():
-                _logger.warning("Re-queued dead job with uuid: %s", uuid)
+        duration = time.monotonic() - start
+        self.dead_jobs_sweep_interval = _next_dead_jobs_sweep_interval(
+            self.dead_jobs_sweep_interval,
+            requeued,
+            batch_full,
+            self.dead_jobs_sweep_max_interval,
+        )
+        self.next_dead_jobs_sweep = _odoo_now() + self.dead_jobs_sweep_interval
+        _logger.debug(
+            "dead jobs sweep on db %s: %d requeued in %.3fs, next sweep in %ds",
+            self.db_name,
+            requeued,
+            duration,
+            self.dead_jobs_sweep_interval,
+        )
+        return requeued
 
 
 class QueueJobRunner:
@@ -416,6 +661,9 @@ class QueueJobRunner:
         user=None,
         password=None,
         channel_config_string=None,
+        dispatch_mode=None,
+        dispatch_max_inflight=None,
+        max_resident_jobs=None,
     ):
         self.scheme = scheme
         self.host = host
@@ -426,6 +674,30 @@ class QueueJobRunner:
         if channel_config_string is None:
             channel_config_string = _channels()
         self.channel_manager.simple_configure(channel_config_string)
+        if dispatch_mode is None:
+            dispatch_mode = _dispatch_mode()
+        dispatcher_kwargs = {}
+        if dispatch_mode == "asyncio":
+            dispatcher_kwargs["max_inflight"] = (
+                dispatch_max_inflight or _dispatch_max_inflight()
+            )
+        self.dispatcher = make_dispatcher(
+            dispatch_mode, scheme, host, port, user, password, **dispatcher_kwargs
+        )
+        if max_resident_jobs is None:
+            max_resident_jobs = _max_resident_jobs()
+        self.resident_jobs = ResidentJobs(max_resident_jobs)
+        self.db_discovery_interval = _db_discovery_interval()
+        self.db_init_workers = _db_init_workers()
+        self._next_db_discovery = 0
+        self._db_checked_without_queue_job = {}  # db_name -> time of the check
+        self.metrics = RunnerMetrics()
+        self.metrics_server = None
+        metrics_port = _metrics_port()
+        if metrics_port:
+            self.metrics_server = MetricsServer(
+                self, _metrics_interface(), metrics_port
+            )
         self.db_by_name = {}
         self._stop = False
         self._stop_pipe = os.pipe()
@@ -483,45 +755,199 @@ class QueueJobRunner:
             try:
                 if remove_jobs:
                     self.channel_manager.remove_db(db_name)
+                    self.resident_jobs.remove_db(db_name)
                 db.close()
             except Exception:
                 _logger.warning("error closing database %s", db_name, exc_info=True)
         self.db_by_name = {}
 
     def initialize_databases(self):
-        for db_name in sorted(self.get_db_names()):
-            # sorting is important to avoid deadlocks in acquiring the master lock
-            db = Database(db_name)
-            if db.has_queue_job:
-                self.db_by_name[db_name] = db
-                with db.select_jobs("state in %s", (NOT_DONE,)) as cr:
-                    for job_data in cr:
-                        self.channel_manager.notify(db_name, *job_data)
-                _logger.info("queue job runner ready for db %s", db_name)
-            else:
+        self._open_databases(self.get_db_names())
+        self._next_db_discovery = _odoo_now() + self.db_discovery_interval
+
+    def discover_databases(self):
+        """Open new databases and close dropped ones, without a restart
+
+        It runs every ``db_discovery_interval`` seconds. Databases on which
+        queue_job was not installed are checked again, so installing it
+        does not require a restart either (they are checked at most every
+        ``DB_RECHECK_INTERVAL`` seconds).
+        A new database whose master lock is held by another runner is
+        skipped until the next discovery.
+        """
+        now = _odoo_now()
+        if not self.db_discovery_interval or now < self._next_db_discovery:
+            return
+        db_names = set(self.get_db_names())
+        recently_checked = {
+            db_name
+            for db_name, checked_at in self._db_checked_without_queue_job.items()
+            if now - checked_at < DB_RECHECK_INTERVAL
+        }
+        for db_name in set(self.db_by_name) - db_names:
+            _logger.info("database %s dropped, closing it", db_name)
+            self.channel_manager.remove_db(db_name)
+            self.resident_jobs.remove_db(db_name)
+            self.db_by_name.pop(db_name).close()
+        self._open_databases(
+            db_names - set(self.db_by_name) - recently_checked, raise_on_error=False
+        )
+        self._next_db_discovery = _odoo_now() + self.db_discovery_interval
+
+    def _connect_database(self, db_name):
+        try:
+            return Database(db_name, setup=False)
+        except Exception as e:
+            return e
+
+    def _open_databases(self, db_names, raise_on_error=True):
+        # connecting and looking for queue_job is done in parallel, as it
+        # dominates the startup time with many databases
+        with ThreadPoolExecutor(max_workers=self.db_init_workers) as executor:
+            dbs = list(executor.map(self._connect_database, sorted(db_names)))
+        error = next((db for db in dbs if isinstance(db, Exception)), None)
+        if error and raise_on_error:
+            for db in dbs:
+                if not isinstance(db, Exception):
+                    db.close()
+            raise error
+        # sorting is important to avoid deadlocks in acquiring the master lock
+        for i, db in enumerate(dbs):
+            if isinstance(db, Exception):
+                _logger.warning("could not open database: %s", db)
+                continue
+            if not db.has_queue_job:
+                self._db_checked_without_queue_job[db.db_name] = _odoo_now()
+            if not db.has_queue_job or self._stop:
                 db.close()
+                continue
+            self._db_checked_without_queue_job.pop(db.db_name, None)
+            try:
+                try:
+                    db.setup()
+                except MasterElectionLost as e:
+                    if raise_on_error:
+                        raise
+                    # another runner handles this database, the databases
+                    # already open are kept and it is tried again on the
+                    # next discovery
+                    _logger.debug("master election lost on %s: %s", db.db_name, e)
+                    continue
+                self.db_by_name[db.db_name] = db
+                if self.resident_jobs.max_jobs:
+                    self._load_resident_jobs(db)
+                else:
+                    with db.select_jobs("state in %s", (NOT_DONE,)) as cr:
+                        for job_data in cr:
+                            self.channel_manager.notify(db.db_name, *job_data)
+            except BaseException:
+                for other_db in dbs[i + 1 :]:
+                    if not isinstance(other_db, Exception):
+                        other_db.close()
+                raise
+            _logger.info("queue job runner ready for db %s", db.db_name)
+
+    def _load_resident_jobs(self, db):
+        # running and failed jobs are needed to compute the channels capacity,
+        # jobs waiting for dependencies are not kept by the channels
+        with db.select_jobs("state in %s", ((ENQUEUED, STARTED, FAILED),)) as cr:
+            for job_data in cr:
+                self.channel_manager.notify(db.db_name, *job_data)
+        for *job_data, deferred, total in db.select_pending_jobs_head(
+            self.resident_jobs.max_jobs
+        ):
+            self._notify_job(db.db_name, job_data)
+            if total > self.resident_jobs.max_jobs:
+                self.resident_jobs.set_truncated(
+                    db.db_name, job_data[0], deferred=deferred
+                )
+
+    def _notify_job(self, db_name, job_data):
+        channel, uuid, seq, date_created, priority, eta, state = job_data
+        self.metrics.job_state(uuid, state)
+        admitted, evicted = self.resident_jobs.admit(
+            db_name,
+            channel,
+            uuid,
+            state,
+            seq=seq,
+            date_created=date_created,
+            priority=priority,
+            eta=eta,
+            now=_odoo_now(),
+        )
+        if evicted:
+            # paged in again when there is room for it
+            self.channel_manager.remove_job(evicted)
+        if admitted:
+            self.channel_manager.notify(db_name, *job_data)
+        else:
+            # the job stays in the database until there is room for it
+            self.channel_manager.remove_job(uuid)
+
+    def page_in_jobs(self):
+        """Load pending jobs of channels having room for more resident jobs"""
+        for (
+            db_name,
+            channel,
+            deferred,
+            uuids,
+            limit,
+        ) in self.resident_jobs.channels_to_page_in():
+            job_datas = self.db_by_name[db_name].select_pending_jobs(
+                channel, uuids, limit, deferred=deferred
+            )
+            _logger.debug(
+                "paged in %d %sjobs of channel %s on db %s",
+                len(job_datas),
+                "deferred " if deferred else "",
+                channel,
+                db_name,
+            )
+            for job_data in job_datas:
+                self._notify_job(db_name, job_data)
+            if len(job_datas) < limit:
+                self.resident_jobs.set_exhausted(db_name, channel, deferred=deferred)
 
     def requeue_dead_jobs(self):
+        now = _odoo_now()
         for db in self.db_by_name.values():
-            if db.has_queue_job:
-                db.requeue_dead_jobs()
+            if db.has_queue_job and now >= db.next_dead_jobs_sweep:
+                start = time.monotonic()
+                requeued = db.requeue_dead_jobs()
+                self.metrics.dead_jobs_sweep(time.monotonic() - start, requeued)
 
     def run_jobs(self):
         now = _odoo_now()
+        # collect all the jobs released in this tick, so their state can be
+        # changed to enqueued with one query per database instead of one
+        # query per job
+        jobs = []
         for job in self.channel_manager.get_jobs_to_run(now):
             if self._stop:
                 break
+            jobs.append(job)
+        if not jobs:
+            return
+        uuids_by_db = {}
+        for job in jobs:
+            uuids_by_db.setdefault(job.db_name, []).append(job.uuid)
+        enqueued_by_db = {
+            db_name: self.db_by_name[db_name].set_jobs_enqueued(uuids)
+            for db_name, uuids in uuids_by_db.items()
+        }
+        for job in jobs:
+            if job.uuid not in enqueued_by_db[job.db_name]:
+                _logger.debug(
+                    "job %s on db %s vanished before being enqueued",
+                    job.uuid,
+                    job.db_name,
+                )
+                continue
             _logger.info("asking Odoo to run job %s on db %s", job.uuid, job.db_name)
-            self.db_by_name[job.db_name].set_job_enqueued(job.uuid)
-            _async_http_get(
-                self.scheme,
-                self.host,
-                self.port,
-                self.user,
-                self.password,
-                job.db_name,
-                job.uuid,
-            )
+            self.metrics.job_enqueued(job.uuid)
+            self.dispatcher.dispatch(job.db_name, job.uuid)
+        self.dispatcher.log_stats()
 
     def process_notifications(self):
         for db in self.db_by_name.values():
@@ -536,12 +962,23 @@ class QueueJobRunner:
                     break
                 notification = db.conn.notifies.pop()
                 uuid = notification.payload
+                if uuid.startswith(GRAPH_NOTIFY_PREFIX):
+                    # jobs of a graph stored in bulk
+                    graph_uuid = uuid[len(GRAPH_NOTIFY_PREFIX) :]
+                    with db.select_jobs(
+                        "graph_uuid = %s AND state in %s", (graph_uuid, NOT_DONE)
+                    ) as cr:
+                        for job_data in cr:
+                            self._notify_job(db.db_name, job_data)
+                    continue
                 with db.select_jobs("uuid = %s", (uuid,)) as cr:
                     job_datas = cr.fetchone()
                     if job_datas:
-                        self.channel_manager.notify(db.db_name, *job_datas)
+                        self._notify_job(db.db_name, job_datas)
                     else:
                         self.channel_manager.remove_job(uuid)
+                        self.resident_jobs.forget(uuid)
+                        self.metrics.forget(uuid)
 
     def wait_notification(self):
         for db in self.db_by_name.values():
@@ -561,6 +998,13 @@ class QueueJobRunner:
             timeout = SELECT_TIMEOUT
         else:
             timeout = wakeup_time - _odoo_now()
+        if self.db_discovery_interval:
+            # wake up in time to look for new databases
+            timeout = min(timeout, self._next_db_discovery - _odoo_now())
+        if self.db_by_name:
+            # wake up in time to look for dead jobs
+            next_sweep = min(db.next_dead_jobs_sweep for db in self.db_by_name.values())
+            timeout = min(timeout, next_sweep - _odoo_now())
         # wait for a notification or a timeout;
         # if timeout is negative (ie wakeup time in the past),
         # do not wait; this should rarely happen
@@ -588,19 +1032,26 @@ class QueueJobRunner:
 
     def run(self):
         _logger.info("starting")
+        self.dispatcher.start()
+        if self.metrics_server:
+            self.metrics_server.start()
         while not self._stop:
             # outer loop does exception recovery
             try:
                 _logger.debug("initializing database connections")
-                # TODO: how to detect new databases or databases
-                #       on which queue_job is installed after server start?
                 self.initialize_databases()
                 _logger.info("database connections ready")
                 # inner loop does the normal processing
                 while not self._stop:
+                    self.discover_databases()
                     self.requeue_dead_jobs()
-                    self.process_notifications()
-                    self.run_jobs()
+                    with self.metrics.timed("process_notifications"):
+                        self.process_notifications()
+                    self.page_in_jobs()
+                    with self.metrics.timed("run_jobs"):
+                        self.run_jobs()
+                    if self.metrics_server:
+                        self.metrics.update_state(self)
                     self.wait_notification()
             except KeyboardInterrupt:
                 self.stop()
@@ -622,4 +1073,8 @@ class QueueJobRunner:
                 self.close_databases()
                 time.sleep(ERROR_RECOVERY_DELAY)
         self.close_databases(remove_jobs=False)
+        self.dispatcher.stop()
+        self.dispatcher.log_stats(force=True)
+        if self.metrics_server:
+            self.metrics_server.stop()
         _logger.info("stopped")
@@ -0,0 +1,11 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+from openupgradelib import openupgrade
+
+from odoo.addons.queue_job.post_init_hook import post_init_hook
+
+
+@openupgrade.migrate()
+def migrate(env, version):
+    # recreate the queue_job_notify trigger, which can now defer the
+    # notifications of jobs stored in bulk
+    post_init_hook(env)
@@ -1,8 +1,11 @@
 # Copyright 2013-2020 Camptocamp SA
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 
+import json
 import logging
 import random
+import zlib
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 from odoo import _, api, exceptions, fields, models
@@ -12,7 +15,13 @@ from odoo.addons.base_sparse_field.models.fields import Serialized
 
 from ..delay import Graph
 from ..exception import JobError
-from ..fields import JobSerialized
+from ..fields import (
+    PAYLOAD_COMPRESS_LEVEL,
+    JobSerialized,
+    is_payload_reference,
+    load_payload,
+    payload_offload_threshold,
+)
 from ..job import (
     CANCELLED,
     DONE,
@@ -58,6 +67,9 @@ class QueueJob(models.Model):
         "args",
         "kwargs",
     )
+    # fields which can be stored out of row, in an attachment, when they
+    # are larger than the payload_offload_threshold
+    _payload_fields = ("records", "args", "kwargs")
 
     uuid = fields.Char(string="UUID", readonly=True, index=True, required=True)
     graph_uuid = fields.Char(
@@ -129,6 +141,7 @@ class QueueJob(models.Model):
     def init(self):
         index_1 = "queue_job_identity_key_state_partial_index"
         index_2 = "queue_job_channel_date_done_date_created_index"
+        index_3 = "queue_job_active_date_enqueued_partial_index"
         if not index_exists(self._cr, index_1):
             # Used by Job.job_record_with_same_identity_key
             self._cr.execute(
@@ -142,6 +155,14 @@ class QueueJob(models.Model):
                 "CREATE INDEX queue_job_channel_date_done_date_created_index "
                 "ON queue_job (channel, date_done, date_created);"
             )
+        if not index_exists(self._cr, index_3):
+            # Used by the jobrunner to find dead jobs, it stays small
+            # whatever the number of done jobs
+            self._cr.execute(
+                "CREATE INDEX queue_job_active_date_enqueued_partial_index "
+                "ON queue_job (date_enqueued) WHERE state in ('enqueued', "
+                "'started');"
+            )
 
     @api.depends("dependencies")
     def _compute_dependency_graph(self):
@@ -236,10 +257,78 @@ class QueueJob(models.Model):
     @api.model_create_multi
     @api.private
     def create(self, vals_list):
-        return super(
+        vals_list, attachments = self._offload_payloads(vals_list)
+        records = super(
             QueueJob,
             self.with_context(mail_create_nolog=True, mail_create_nosubscribe=True),
         ).create(vals_list)
+        for index, index_attachments in attachments.items():
+            index_attachments.write({"res_id": records[index].id})
+        return records
+
+    def _offload_payloads(self, vals_list):
+        """Move the large payloads of new jobs to attachments
+
+        The payload in the column is replaced by a reference to the
+        attachment, which is only read when the job is loaded for
+        execution. As attachments, the payloads are stored wherever the
+        attachments of the database are stored (database, filestore or
+        external storage).
+
+        Return the updated values and the created attachments by index
+        of the values.
+        """
+        attachments = defaultdict(lambda: self.env["ir.attachment"].sudo())
+        threshold = payload_offload_threshold()
+        if not threshold:
+            return vals_list, attachments
+        new_vals_list = []
+        for index, vals in enumerate(vals_list):
+            vals = dict(vals)
+            for fname in self._payload_fields:
+                if not vals.get(fname):
+                    continue
+                payload = self._fields[fname].convert_to_cache(vals[fname], self)
+                if not isinstance(payload, str) or len(payload) <= threshold:
+                    continue
+                attachment = attachments[index].create(
+                    {
+                        "name": f"{vals.get('uuid') or self.uuid}-{fname}",
+                        "res_model": self._name,
+                        "res_field": fname,
+                        "raw": zlib.compress(payload.encode(), PAYLOAD_COMPRESS_LEVEL),
+                        "mimetype": "application/octet-stream",
+                    }
+                )
+                attachments[index] |= attachment
+                vals[fname] = json.dumps(
+                    {"_type": "job_payload", "attachment_id": attachment.id}
+                )
+            new_vals_list.append(vals)
+        return new_vals_list, attachments
+
+    def _load_payload(self, fname):
+        """Return the value of a payload field, read from its attachment
+        when it is stored out of row"""
+        self.ensure_one()
+        return load_payload(self.env, self[fname])
+
+    def _write_payloads(self, vals):
+        """Write payload fields, stored out of row like on create
+
+        The attachments of the replaced payloads are deleted.
+        """
+        self.ensure_one()
+        old_attachment_ids = [
+            self[fname]["attachment_id"]
+            for fname in vals
+            if is_payload_reference(self[fname])
+        ]
+        (vals,), attachments = self._offload_payloads([vals])
+        super().write(vals)
+        for index_attachments in attachments.values():
+            index_attachments.write({"res_id": self.id})
+        self.env["ir.attachment"].sudo().browse(old_attachment_ids).unlink()
 
     def write(self, vals):
         if self.env.context.get("_job_edit_sentinel") is not self.EDIT_SENTINEL:
@@ -268,8 +357,12 @@ class QueueJob(models.Model):
             # the user is stored in the env of the record, but we still want to
             # have a stored user_id field to be able to search/groupby, so
             # synchronize the env of records with user_id
-            super(QueueJob, record).write(
-                {"records": record.records.with_user(vals["user_id"])}
+            record._write_payloads(
+                {
+                    "records": record._load_payload("records").with_user(
+                        vals["user_id"]
+                    )
+                }
             )
         return result
 
@@ -386,8 +479,13 @@ class QueueJob(models.Model):
         """Delete all jobs done based on the removal interval defined on the
            channel
 
+        When the archive is enabled, the jobs are moved to the archive
+        instead, and the expired archive partitions are dropped.
+
         Called from a cron.
         """
+        archive = self.env["queue.job.archive"]
+        retention_days = archive._retention_days()
         for channel in self.env["queue.job.channel"].search([]):
             deadline = datetime.now() - timedelta(days=int(channel.removal_interval))
             while True:
@@ -402,11 +500,16 @@ class QueueJob(models.Model):
                     limit=1000,
                 )
                 if jobs:
-                    jobs.unlink()
+                    if retention_days:
+                        archive._archive_jobs(jobs)
+                    else:
+                        jobs.unlink()
                     if not config["test_enable"]:
                         self.env.cr.commit()  # pylint: disable=E8102
                 else:
                     break
+        if retention_days:
+            archive._drop_expired_partitions(retention_days)
         return True
 
     def related_action_open_record(self):
@@ -421,7 +524,7 @@ class QueueJob(models.Model):
 
         """
         self.ensure_one()
-        records = self.records.exists()
+        records = self._load_payload("records").exists()
         if not records:
             return None
         action = {
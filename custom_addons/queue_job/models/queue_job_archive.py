@@ -0,0 +1,219 @@
+# Copyright 2026 Safee Analytics
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from ..job import STATES
+from ..jobrunner import queue_job_config
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = "queue_job_archive"
+PARTITION_NAME_FORMAT = ARCHIVE_TABLE + "_%Y%m"
+
+
+class QueueJobArchive(models.Model):
+    """Done and cancelled jobs moved out of the queue_job table
+
+    The archive is enabled by setting ``archive_retention_days``: the
+    autovacuum then moves the jobs to the archive instead of deleting them.
+    The archive table is partitioned by month of ``date_archived``, which
+    is the date the job was done or cancelled
+    (``coalesce(date_done, date_cancelled)``), not the date it was moved to
+    the archive. Its retention is enforced by dropping the partitions of
+    the months which ended before the retention period.
+
+    The payloads of the jobs (records, arguments, result of the function)
+    are not archived, ``func_string`` keeps a readable version of the call.
+    """
+
+    _name = "queue.job.archive"
+    _description = "Archived Queue Job"
+    _auto = False
+    _table = ARCHIVE_TABLE
+    _log_access = False
+    _order = "date_archived DESC, id DESC"
+
+    uuid = fields.Char(string="UUID", readonly=True)
+    graph_uuid = fields.Char(string="Graph UUID", readonly=True)
+    user_id = fields.Many2one(comodel_name="res.users", readonly=True)
+    company_id = fields.Many2one(comodel_name="res.company", readonly=True)
+    name = fields.Char(string="Description", readonly=True)
+    model_name = fields.Char(string="Model", readonly=True)
+    method_name = fields.Char(readonly=True)
+    func_string = fields.Char(string="Task", readonly=True)
+    channel = fields.Char(readonly=True)
+    job_function_id = fields.Many2one(
+        comodel_name="queue.job.function", string="Job Function", readonly=True
+    )
+    state = fields.Selection(STATES, readonly=True)
+    priority = fields.Integer(readonly=True)
+    exc_name = fields.Char(string="Exception", readonly=True)
+    exc_message = fields.Char(string="Exception Message", readonly=True)
+    exc_info = fields.Text(string="Exception Info", readonly=True)
+    result = fields.Text(readonly=True)
+    date_created = fields.Datetime(string="Created Date", readonly=True)
+    date_started = fields.Datetime(string="Start Date", readonly=True)
+    date_enqueued = fields.Datetime(string="Enqueue Time", readonly=True)
+    date_done = fields.Datetime(readonly=True)
+    date_cancelled = fields.Datetime(readonly=True)
+    exec_time = fields.Float(string="Execution Time (avg)", readonly=True)
+    retry = fields.Integer(string="Current try", readonly=True)
+    max_retries = fields.Integer(readonly=True)
+    date_archived = fields.Datetime(
+        readonly=True, help="Date the job was done or cancelled."
+    )
+
+    def init(self):
+        self.env.cr.execute(
+            SQL(
+                "CREATE TABLE IF NOT EXISTS %s (id integer NOT NULL, "
+                "date_archived timestamp NOT NULL) PARTITION BY RANGE (date_archived)",
+                SQL.identifier(ARCHIVE_TABLE),
+            )
+        )
+        # the columns are added by name so that a field added to the model
+        # is added to an existing archive table
+        for name in self._archived_columns():
+            self.env.cr.execute(
+                SQL(
+                    "ALTER TABLE %s ADD COLUMN IF NOT EXISTS %s %s",
+                    SQL.identifier(ARCHIVE_TABLE),
+                    SQL.identifier(name),
+                    SQL(self._fields[name].column_type[1]),
+                )
+            )
+        for column in ("id", "uuid", "date_archived"):
+            self.env.cr.execute(
+                SQL(
+                    "CREATE INDEX IF NOT EXISTS %s ON %s (%s)",
+                    SQL.identifier(f"{ARCHIVE_TABLE}_{column}_index"),
+                    SQL.identifier(ARCHIVE_TABLE),
+                    SQL.identifier(column),
+                )
+            )
+
+    def _archived_columns(self):
+        """Columns copied from queue_job to the archive"""
+        job_fields = self.env["queue.job"]._fields
+        return [
+            name
+            for name, field in self._fields.items()
+            if field.store
+            and field.column_type
+            and name not in ("id", "date_archived")
+            and name in job_fields
+        ]
+
+    @api.model
+    def _retention_days(self):
+        """Number of days archived jobs are kept, 0 when archive is disabled"""
+        return int(
+            os.environ.get("ODOO_QUEUE_JOB_ARCHIVE_RETENTION_DAYS")
+            or queue_job_config.get("archive_retention_days")
+            or 0
+        )
+
+    @api.model
+    def _create_partition(self, month):
+        """Create the partition for the month starting at ``month``"""
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        self.env.cr.execute(
+            SQL(
+                "CREATE TABLE IF NOT EXISTS %s PARTITION OF %s "
+                "FOR VALUES FROM (%s) TO (%s)",
+                SQL.identifier(month.strftime(PARTITION_NAME_FORMAT)),
+                SQL.identifier(ARCHIVE_TABLE),
+                month,
+                next_month,
+            )
+        )
+
+    @api.model
+    def _archive_jobs(self, jobs):
+        """Move done or cancelled jobs to the archive
+
+        The jobs are deleted from queue_job with a single DELETE statement
+        which inserts them in the archive, instead of an ORM unlink. The
+        data attached to the jobs (messages, followers, activities and
+        attachments) is deleted beforehand.
+        """
+        if not jobs:
+            return
+        jobs.flush_recordset()
+        ids = tuple(jobs.ids)
+        archive_date = SQL("coalesce(date_done, date_cancelled)")
+        self.env.cr.execute(
+            SQL(
+                "SELECT DISTINCT date_trunc('month', %s) FROM queue_job "
+                "WHERE id IN %s",
+                archive_date,
+                ids,
+            )
+        )
+        for (month,) in self.env.cr.fetchall():
+            self._create_partition(month)
+
+        for model, field_name in (
+            ("mail.message", "model"),
+            ("mail.followers", "res_model"),
+            ("mail.activity", "res_model"),
+        ):
+            self.env[model].sudo().search(
+                [(field_name, "=", jobs._name), ("res_id", "in", ids)]
+            ).unlink()
+        # include the attachments of fields, such as job payloads stored
+        # out of row, which are hidden from the attachment searches
+        self.env.cr.execute(
+            "SELECT id FROM ir_attachment WHERE res_model = %s AND res_id IN %s",
+            (jobs._name, ids),
+        )
+        attachment_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.env["ir.attachment"].sudo().browse(attachment_ids).unlink()
+
+        columns = SQL(", ").join(
+            SQL.identifier(name) for name in ["id", *self._archived_columns()]
+        )
+        self.env.cr.execute(
+            SQL(
+                "WITH moved AS (DELETE FROM queue_job WHERE id IN %s RETURNING *) "
+                "INSERT INTO %s (%s, date_archived) SELECT %s, %s FROM moved",
+                ids,
+                SQL.identifier(ARCHIVE_TABLE),
+                columns,
+                columns,
+                archive_date,
+            )
+        )
+        jobs.invalidate_recordset()
+        _logger.debug("%d jobs archived", len(ids))
+
+    @api.model
+    def _drop_expired_partitions(self, retention_days):
+        """Drop the partitions only containing jobs older than the retention"""
+        deadline = datetime.now() - timedelta(days=retention_days)
+        self.env.cr.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            (ARCHIVE_TABLE,),
+        )
+        for (partition,) in self.env.cr.fetchall():
+            try:
+                month = datetime.strptime(partition, PARTITION_NAME_FORMAT)
+            except ValueError:
+                # not a partition created by the autovacuum, leave it alone
+                continue
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            if next_month <= deadline:
+                self.env.cr.execute(SQL("DROP TABLE %s", SQL.identifier(partition)))
+                _logger.info("dropped expired archived jobs partition %s", partition)
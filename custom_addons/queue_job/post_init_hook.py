@@ -15,6 +15,12 @@ def post_init_hook(env):
             CREATE OR REPLACE
                 FUNCTION queue_job_notify() RETURNS trigger AS $$
             BEGIN
+                IF TG_OP = 'INSERT'
+                    AND current_setting('queue_job.defer_notify', true) = 'on'
+                THEN
+                    -- Job.store_many notifies the whole graph at once
+                    RETURN NULL;
+                END IF;
                 IF TG_OP = 'DELETE' THEN
                     IF OLD.state != 'done' THEN
                         PERFORM pg_notify('queue_job', OLD.uuid);
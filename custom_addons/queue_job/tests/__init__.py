@@ -1,8 +1,12 @@
 from . import test_run_rob_controller
 from . import test_runner_channels
+from . import test_runner_dispatch
+from . import test_runner_metrics
 from . import test_runner_runner
 from . import test_delayable
 from . import test_delayable_split
+from . import test_bulk_enqueue
+from . import test_job_archive
 from . import test_json_field
 from . import test_model_job_channel
 from . import test_model_job_function
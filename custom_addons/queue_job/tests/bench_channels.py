@@ -0,0 +1,101 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+"""Microbenchmark of the job runner ChannelManager.
+
+It replays a synthetic trace of ``notify`` calls on a ChannelManager:
+all the jobs are first notified as pending, a share of them has their
+priority changed, then the jobs are run and notified as done until the
+queue is empty, like the runner would do while draining a backlog.
+
+This is not part of the test suite, run it with::
+
+    python -m odoo.addons.queue_job.tests.bench_channels --jobs 1000000
+"""
+
+import argparse
+import random
+import resource
+import time
+
+# pylint: disable=odoo-addons-relative-import
+from odoo.addons.queue_job.jobrunner.channels import ChannelManager
+
+DB_NAME = "bench"
+
+
+def _rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _report(step, ops, elapsed):
+    print(
+        f"{step:<12} {ops:>10} ops {elapsed:>8.2f}s "
+        f"{ops / elapsed if elapsed else 0:>12.0f} ops/s  RSS {_rss_mb():.0f} MB"
+    )
+
+
+def run(jobs, channels, capacity, reprioritize, seed):
+    rng = random.Random(seed)
+    channel_names = [f"root.c{i}" for i in range(channels)]
+    cm = ChannelManager()
+    cm.simple_configure(
+        f"root:{capacity * channels},"
+        + ",".join(f"{name}:{capacity}" for name in channel_names)
+    )
+    trace = [
+        (f"job-{seq}", seq, rng.choice(channel_names), rng.randint(0, 20))
+        for seq in range(jobs)
+    ]
+
+    start = time.perf_counter()
+    for uuid, seq, channel, priority in trace:
+        cm.notify(DB_NAME, channel, uuid, seq, seq, priority, None, "pending")
+    _report("notify", jobs, time.perf_counter() - start)
+
+    updated = rng.sample(trace, int(jobs * reprioritize))
+    start = time.perf_counter()
+    for uuid, seq, channel, priority in updated:
+        cm.notify(DB_NAME, channel, uuid, seq, seq, priority // 2, None, "pending")
+    _report("reprioritize", len(updated), time.perf_counter() - start)
+
+    priorities = {uuid: priority for uuid, _seq, _channel, priority in trace}
+    priorities.update(
+        {uuid: priority // 2 for uuid, _seq, _channel, priority in updated}
+    )
+    start = time.perf_counter()
+    done = 0
+    now = 0
+    while done < jobs:
+        now += 1
+        running = list(cm.get_jobs_to_run(now))
+        if not running:
+            break
+        for job in running:
+            cm.notify(
+                DB_NAME,
+                job.channel.fullname,
+                job.uuid,
+                job.seq,
+                job.date_created,
+                priorities[job.uuid],
+                None,
+                "done",
+            )
+        done += len(running)
+    _report("run/set_done", done, time.perf_counter() - start)
+    assert done == jobs, f"only {done} jobs out of {jobs} were run"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1000000)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--reprioritize", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.jobs, args.channels, args.capacity, args.reprioritize, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Copyright 2026 Safee Analytics
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+import logging
+import time
+
+from odoo.tests import common
+
+from odoo.addons.queue_job.delay import chain, group
+from odoo.addons.queue_job.job import Job
+
+_logger = logging.getLogger(__name__)
+
+GRAPH_SIZE = 500
+
+
+class TestBulkEnqueue(common.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env.ref("base.main_partner")
+
+    def _delayables(self, count):
+        return [
+            self.partner.delayable(description=f"bulk {idx}").read(["name"])
+            for idx in range(count)
+        ]
+
+    def test_store_many_group(self):
+        start = time.perf_counter()
+        group(*self._delayables(GRAPH_SIZE)).delay()
+        elapsed = time.perf_counter() - start
+        jobs = self.env["queue.job"].search([("name", "=like", "bulk %")])
+        self.assertEqual(len(jobs), GRAPH_SIZE)
+        self.assertEqual(len(set(jobs.mapped("graph_uuid"))), 1)
+        self.assertEqual(set(jobs.mapped("state")), {"pending"})
+        _logger.info(
+            "stored %d jobs of a group in %.3fs (%.0f jobs/s)",
+            GRAPH_SIZE,
+            elapsed,
+            GRAPH_SIZE / elapsed,
+        )
+
+    def test_store_many_chain(self):
+        chain(*self._delayables(3)).delay()
+        jobs = self.env["queue.job"].search([("name", "=like", "bulk %")], order="name")
+        self.assertEqual(
+            jobs.mapped("state"), ["pending", "wait_dependencies", "wait_dependencies"]
+        )
+        first, second, third = (Job.load(self.env, job.uuid) for job in jobs)
+        self.assertEqual(second.depends_on, {first})
+        self.assertEqual(third.depends_on, {second})
+        self.assertEqual(first.reverse_depends_on, {second})
+
+    def test_store_many_existing(self):
+        job = self.partner.with_delay(description="bulk existing").read(["name"])
+        job.set_pending(result="updated")
+        Job.store_many([job])
+        self.assertEqual(job.db_record().result, "updated")
+
+    def test_store_many_throughput(self):
+        jobs = [delayable._build_job() for delayable in self._delayables(GRAPH_SIZE)]
+        start = time.perf_counter()
+        for job in jobs[: GRAPH_SIZE // 2]:
+            job.store()
+        one_by_one = time.perf_counter() - start
+        start = time.perf_counter()
+        Job.store_many(jobs[GRAPH_SIZE // 2 :])
+        bulk = time.perf_counter() - start
+        self.assertEqual(
+            self.env["queue.job"].search_count([("name", "=like", "bulk %")]),
+            GRAPH_SIZE,
+        )
+        _logger.info(
+            "stored %d jobs: %.0f jobs/s one by one, %.0f jobs/s in bulk",
+            GRAPH_SIZE,
+            GRAPH_SIZE / 2 / one_by_one,
+            GRAPH_SIZE / 2 / bulk,
+        )
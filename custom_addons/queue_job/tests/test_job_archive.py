@@ -0,0 +1,70 @@
+# Copyright 2026 Safee Analytics
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+import os
+from datetime import datetime, timedelta
+from unittest import mock
+
+from odoo.tests import common
+
+from odoo.addons.queue_job.job import Job
+
+
+class TestJobArchive(common.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env.ref("base.main_partner")
+        cls.archive = cls.env["queue.job.archive"]
+
+    def _done_job(self, days_ago):
+        job = self.partner.with_delay(description="archived job").read(["name"])
+        job.set_done(result="ok")
+        job.date_done = datetime.now() - timedelta(days=days_ago)
+        job.store()
+        return job
+
+    def _partitions(self):
+        self.env.cr.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'queue_job_archive'
+            """
+        )
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def test_autovacuum_archive(self):
+        job = self._done_job(60)
+        recent_job = self._done_job(0)
+        with mock.patch.dict(
+            os.environ, {"ODOO_QUEUE_JOB_ARCHIVE_RETENTION_DAYS": "365"}
+        ):
+            self.env["queue.job"].autovacuum()
+        self.assertFalse(job.db_record())
+        self.assertTrue(recent_job.db_record())
+        archived = self.archive.search([("uuid", "=", job.uuid)])
+        self.assertEqual(archived.state, "done")
+        self.assertEqual(archived.result, "ok")
+        self.assertEqual(archived.date_archived, archived.date_done)
+        self.assertIn(
+            archived.date_done.strftime("queue_job_archive_%Y%m"), self._partitions()
+        )
+
+    def test_autovacuum_delete(self):
+        job = self._done_job(60)
+        self.env["queue.job"].autovacuum()
+        self.assertFalse(job.db_record())
+        self.assertFalse(self.archive.search([("uuid", "=", job.uuid)]))
+
+    def test_drop_expired_partitions(self):
+        job = self._done_job(400)
+        self.archive._archive_jobs(job.db_record())
+        partition = job.date_done.strftime("queue_job_archive_%Y%m")
+        self.assertIn(partition, self._partitions())
+        self.archive._drop_expired_partitions(365)
+        self.assertNotIn(partition, self._partitions())
+        self.assertFalse(self.archive.search([("uuid", "=", job.uuid)]))
+        self.assertFalse(Job.db_records_from_uuids(self.env, [job.uuid]))
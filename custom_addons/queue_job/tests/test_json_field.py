@@ -2,7 +2,9 @@
 # license lgpl-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 
 import json
+import os
 from datetime import date, datetime
+from unittest import mock
 
 from lxml import etree
 
@@ -10,7 +12,8 @@ from odoo.tests import common
 
 # pylint: disable=odoo-addons-relative-import
 # we are testing, we want to test as we were an external consumer of the API
-from odoo.addons.queue_job.fields import JobDecoder, JobEncoder
+from odoo.addons.queue_job.fields import JobDecoder, JobEncoder, compress_payload
+from odoo.addons.queue_job.job import Job
 
 
 class TestJson(common.TransactionCase):
@@ -161,3 +164,70 @@ class TestJson(common.TransactionCase):
         value = json.loads(value_json, cls=JobDecoder, env=self.env)
         value[2] = etree.tostring(value[2])
         self.assertEqual(value, expected)
+
+    def test_decoder_compressed(self):
+        value = ["a", 1, {"_type": "date_isoformat", "value": "2017-04-19"}]
+        value_json = compress_payload(json.dumps(value))
+        self.assertEqual(json.loads(value_json)["_type"], "zlib_base64")
+        value = json.loads(value_json, cls=JobDecoder, env=self.env)
+        self.assertEqual(value, ["a", 1, date(2017, 4, 19)])
+
+    def _column_value(self, job, fname):
+        self.env.flush_all()
+        self.env.cr.execute(
+            f"SELECT {fname} FROM queue_job WHERE uuid = %s", (job.uuid,)
+        )
+        value = self.env.cr.fetchone()[0]
+        # the jsonb column contains the serialized json as a string
+        return json.loads(value) if isinstance(value, str) else value
+
+    def test_job_payload_compressed(self):
+        partner = self.env.ref("base.main_partner")
+        names = [f"name {idx}" for idx in range(1000)]
+        job = partner.with_delay().read(names)
+        self.assertEqual(self._column_value(job, "args")["_type"], "zlib_base64")
+        self.assertEqual(self._column_value(job, "kwargs"), {})
+        self.env.invalidate_all()
+        self.assertEqual(job.db_record().args, [names])
+
+    def test_job_payload_offloaded(self):
+        partner = self.env.ref("base.main_partner")
+        names = [f"name {idx}" for idx in range(1000)]
+        with mock.patch.dict(
+            os.environ, {"ODOO_QUEUE_JOB_PAYLOAD_OFFLOAD_THRESHOLD": "1024"}
+        ):
+            job = partner.with_delay().read(names)
+        reference = self._column_value(job, "args")
+        self.assertEqual(reference["_type"], "job_payload")
+        attachment = self.env["ir.attachment"].browse(reference["attachment_id"])
+        self.assertEqual(attachment.res_id, job.db_record().id)
+        self.env.invalidate_all()
+        # the attachment is not read by the ORM reads of the job
+        self.assertEqual(job.db_record().args, reference)
+        self.assertEqual(Job.load(self.env, job.uuid).args, (names,))
+        job.db_record().unlink()
+        self.assertFalse(attachment.exists())
+
+    def test_job_payload_offloaded_user_change(self):
+        partner = self.env.ref("base.main_partner")
+        demo_user = self.env.ref("base.user_demo")
+        with mock.patch.dict(
+            os.environ, {"ODOO_QUEUE_JOB_PAYLOAD_OFFLOAD_THRESHOLD": "10"}
+        ):
+            job = partner.with_delay().read(["name"])
+            reference = self._column_value(job, "records")
+            self.assertEqual(reference["_type"], "job_payload")
+            job.db_record().user_id = demo_user
+        new_reference = self._column_value(job, "records")
+        self.assertEqual(new_reference["_type"], "job_payload")
+        # the attachment of the previous payload is not orphaned
+        attachments = self.env["ir.attachment"].search(
+            [
+                ("res_model", "=", "queue.job"),
+                ("res_field", "=", "records"),
+                ("res_id", "=", job.db_record().id),
+            ]
+        )
+        self.assertEqual(attachments.ids, [new_reference["attachment_id"]])
+        self.env.invalidate_all()
+        self.assertEqual(Job.load(self.env, job.uuid).recordset.env.uid, demo_user.id)
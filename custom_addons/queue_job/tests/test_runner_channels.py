@@ -3,8 +3,132 @@
 
 # pylint: disable=odoo-addons-relative-import
 # we are testing, we want to test as we were an external consumer of the API
+from odoo.tests import BaseCase
+
 from odoo.addons.queue_job.jobrunner import channels
 
 from .common import load_doctests
 
 load_tests = load_doctests(channels)
+
+
+class TestResidentJobs(BaseCase):
+    def test_admit_before_last_resident(self):
+        resident = channels.ResidentJobs(max_jobs=3)
+        for seq in range(3):
+            admitted, evicted = resident.admit(
+                "db", "root", f"low{seq}", channels.PENDING, seq=seq, priority=20
+            )
+            self.assertTrue(admitted)
+        # a job with the same priority created later stays in the database
+        self.assertEqual(
+            resident.admit("db", "root", "low3", channels.PENDING, seq=3, priority=20),
+            (False, None),
+        )
+        # a job with a higher priority evicts the last resident job
+        self.assertEqual(
+            resident.admit("db", "root", "high", channels.PENDING, seq=4, priority=5),
+            (True, "low2"),
+        )
+        self.assertEqual(resident.channels_to_page_in(), [])
+        # the channel is truncated, low2 and low3 are paged in later
+        for uuid in ("high", "low0"):
+            resident.admit("db", "root", uuid, channels.ENQUEUED)
+        self.assertEqual(
+            resident.channels_to_page_in(), [("db", "root", False, ["low1"], 2)]
+        )
+
+    def test_future_eta_not_counted(self):
+        resident = channels.ResidentJobs(max_jobs=2)
+        now = 1000
+        for seq in range(2):
+            admitted, evicted = resident.admit(
+                "db",
+                "root",
+                f"later{seq}",
+                channels.PENDING,
+                seq=seq,
+                eta=now + 60,
+                now=now,
+            )
+            self.assertEqual((admitted, evicted), (True, None))
+        # runnable jobs are admitted while jobs with an ETA wait
+        for seq in range(5, 7):
+            self.assertEqual(
+                resident.admit("db", "root", f"now{seq}", channels.PENDING, seq=seq),
+                (True, None),
+            )
+        self.assertFalse(
+            resident.admit("db", "root", "now7", channels.PENDING, seq=7)[0]
+        )
+        # a job whose ETA is reached counts again
+        self.assertEqual(
+            resident.admit(
+                "db", "root", "later0", channels.PENDING, seq=0, eta=now, now=now
+            ),
+            (True, "now6"),
+        )
+
+    def test_future_eta_bounded(self):
+        """Only the jobs with the nearest ETAs are resident"""
+        resident = channels.ResidentJobs(max_jobs=10)
+        now = 1000
+        admitted = set()
+        # notified in the reverse order of their ETA, each job evicts the
+        # one with the latest ETA
+        for seq in range(1000, 0, -1):
+            uuid = f"later{seq}"
+            is_admitted, evicted = resident.admit(
+                "db", "root", uuid, channels.PENDING, seq=seq, eta=now + seq, now=now
+            )
+            self.assertTrue(is_admitted)
+            admitted.add(uuid)
+            admitted.discard(evicted)
+        self.assertEqual(admitted, {f"later{seq}" for seq in range(1, 11)})
+        # later jobs stay in the database
+        self.assertEqual(
+            resident.admit(
+                "db", "root", "later2000", channels.PENDING, eta=now + 2000, now=now
+            ),
+            (False, None),
+        )
+        self.assertEqual(resident.channels_to_page_in(), [])
+        # the next jobs are paged in once half of the resident ones ran
+        for seq in range(1, 6):
+            resident.admit("db", "root", f"later{seq}", channels.ENQUEUED)
+        self.assertEqual(
+            resident.channels_to_page_in(),
+            [("db", "root", True, sorted(f"later{seq}" for seq in range(6, 11)), 5)],
+        )
+        resident.set_exhausted("db", "root", deferred=True)
+        self.assertEqual(resident.channels_to_page_in(), [])
+
+    def test_future_eta_truncated(self):
+        """Later jobs do not take the room of the jobs left in the database"""
+        resident = channels.ResidentJobs(max_jobs=4)
+        now = 1000
+        for seq in range(1, 6):
+            resident.admit(
+                "db",
+                "root",
+                f"later{seq}",
+                channels.PENDING,
+                seq=seq,
+                eta=now + seq,
+                now=now,
+            )
+        # later5 went back to the database, a job ran and freed a slot
+        resident.admit("db", "root", "later1", channels.ENQUEUED)
+        self.assertEqual(
+            resident.admit(
+                "db", "root", "later100", channels.PENDING, eta=now + 100, now=now
+            ),
+            (False, None),
+        )
+        # a job due before the resident ones still gets in
+        self.assertEqual(
+            resident.admit(
+                "db", "root", "sooner", channels.PENDING, seq=0, eta=now + 1, now=now
+            ),
+            (True, None),
+        )
@@ -0,0 +1,177 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+# we are testing, we want to test as we were an external consumer of the API
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from odoo.tests import BaseCase
+
+from odoo.addons.queue_job.jobrunner import dispatch
+
+from .common import load_doctests
+
+load_tests = load_doctests(dispatch)
+
+
+class StubOdooServer:
+    """HTTP server standing for the /queue_job/runjob controller
+
+    The requests wait ``delay`` seconds before being answered, the jobs
+    whose uuid starts with "fail" get an error 500.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.job_uuids = []
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                job_uuid = query["job_uuid"][0]
+                with stub._lock:
+                    stub.job_uuids.append(job_uuid)
+                    stub.inflight += 1
+                    stub.max_inflight = max(stub.max_inflight, stub.inflight)
+                try:
+                    time.sleep(stub.delay)
+                    self.send_response(500 if job_uuid.startswith("fail") else 200)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                finally:
+                    with stub._lock:
+                        stub.inflight -= 1
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+class DispatcherCase:
+    """Tests shared by the dispatchers, against a stub server"""
+
+    def _make_dispatcher(self, **kwargs):
+        raise NotImplementedError
+
+    def _start_server(self, delay=0.0):
+        server = StubOdooServer(delay=delay)
+        self.addCleanup(server.stop)
+        return server
+
+    def _dispatcher(self, server, **kwargs):
+        dispatcher = self._make_dispatcher(server.port, **kwargs)
+        dispatcher.start()
+        self.addCleanup(dispatcher.stop)
+        return dispatcher
+
+    def _wait_dispatched(self, dispatcher, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stats = dispatcher.stats.as_dict()
+            if stats["dispatched"] >= count and not stats["inflight"]:
+                return stats
+            time.sleep(0.01)
+        self.fail(f"{count} jobs not dispatched in {timeout}s")
+
+    def test_dispatch(self):
+        server = self._start_server()
+        dispatcher = self._dispatcher(server)
+        for index in range(3):
+            dispatcher.dispatch("db", f"uuid{index}")
+        stats = self._wait_dispatched(dispatcher, 3)
+        self.assertEqual(sorted(server.job_uuids), ["uuid0", "uuid1", "uuid2"])
+        self.assertEqual(stats["errors"], 0)
+        self.assertGreater(stats["latency_total"], 0)
+
+    def test_dispatch_error(self):
+        """Errors are counted, the dispatch goes on"""
+        server = self._start_server()
+        dispatcher = self._dispatcher(server)
+        with self.assertLogs(dispatch._logger, level="ERROR"):
+            dispatcher.dispatch("db", "fail1")
+            dispatcher.dispatch("db", "uuid1")
+            stats = self._wait_dispatched(dispatcher, 2)
+        self.assertEqual(stats["dispatched"], 2)
+        self.assertEqual(stats["errors"], 1)
+
+    def test_dispatch_timeout(self):
+        """The jobs run longer than the dispatch timeout, it is no error"""
+        server = self._start_server(delay=0.5)
+        with mock.patch.object(dispatch, "DISPATCH_TIMEOUT", 0.1):
+            dispatcher = self._dispatcher(server)
+            dispatcher.dispatch("db", "uuid1")
+            stats = self._wait_dispatched(dispatcher, 1)
+        self.assertEqual(stats["errors"], 0)
+        self.assertLess(stats["latency_max"], 0.5)
+
+
+class TestThreadDispatcher(DispatcherCase, BaseCase):
+    def _make_dispatcher(self, port, **kwargs):
+        return dispatch.ThreadDispatcher("http", "127.0.0.1", port, **kwargs)
+
+
+@unittest.skipIf(dispatch.aiohttp is None, "aiohttp is not installed")
+class TestAsyncioDispatcher(DispatcherCase, BaseCase):
+    def _make_dispatcher(self, port, **kwargs):
+        return dispatch.AsyncioDispatcher("http", "127.0.0.1", port, **kwargs)
+
+    def test_max_inflight(self):
+        """The requests beyond max_inflight wait for a free slot"""
+        server = self._start_server(delay=0.2)
+        dispatcher = self._dispatcher(server, max_inflight=2)
+        for index in range(6):
+            dispatcher.dispatch("db", f"uuid{index}")
+        stats = self._wait_dispatched(dispatcher, 6)
+        self.assertEqual(len(server.job_uuids), 6)
+        self.assertEqual(server.max_inflight, 2)
+        self.assertEqual(stats["max_inflight_seen"], 2)
+        self.assertEqual(stats["errors"], 0)
+
+    def test_restart(self):
+        server = self._start_server()
+        dispatcher = self._dispatcher(server)
+        dispatcher.stop()
+        # dispatching starts the stopped dispatcher again
+        dispatcher.dispatch("db", "uuid1")
+        self._wait_dispatched(dispatcher, 1)
+        self.assertEqual(server.job_uuids, ["uuid1"])
+
+
+class TestMakeDispatcher(BaseCase):
+    def test_asyncio(self):
+        with mock.patch.object(dispatch, "aiohttp", mock.Mock()):
+            dispatcher = dispatch.make_dispatcher("asyncio", "http", "localhost", 8069)
+        self.assertIsInstance(dispatcher, dispatch.AsyncioDispatcher)
+
+    def test_asyncio_without_aiohttp(self):
+        with (
+            mock.patch.object(dispatch, "aiohttp", None),
+            self.assertLogs(dispatch._logger, level="WARNING") as logs,
+        ):
+            dispatcher = dispatch.make_dispatcher("asyncio", "http", "localhost", 8069)
+        self.assertIsInstance(dispatcher, dispatch.ThreadDispatcher)
+        self.assertIn("aiohttp is not installed", logs.output[0])
+
+    def test_unknown_mode(self):
+        with self.assertLogs(dispatch._logger, level="WARNING"):
+            dispatcher = dispatch.make_dispatcher("fork", "http", "localhost", 8069)
+        self.assertIsInstance(dispatcher, dispatch.ThreadDispatcher)
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Safee Webhooks Integration',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Integration',
     'summary': 'Webhook integration between Odoo and Safee Analytics',
     'description': """
@@ -16,6 +16,8 @@
         Features:
         - HMAC-SHA256 signature verification
         - Automatic sync on create/write/unlink
+        - Transactional outbox delivered in batches, with retries and
+          dead-lettering of the failed webhooks
         - Configurable webhook endpoints
         - Support for all major Odoo modules
     """,
@@ -24,14 +26,18 @@
     'license': 'LGPL-3',
     'depends': [
         'base',
+        'base_setup',
         'hr',
         'crm',
         'account',
         'hr_holidays',
     ],
     'data': [
+        'security/ir.model.access.csv',
         'data/default_config.xml',
+        'data/ir_cron.xml',
         'views/res_config_settings_views.xml',
+        'views/webhook_event_views.xml',
     ],
     'installable': True,
     'application': False,
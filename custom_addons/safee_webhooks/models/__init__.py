@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from . import res_config_settings
 from . import webhook_mixin
+from . import webhook_event
 from . import hr_employee
 from . import hr_department
 from . import hr_leave
@@ -5,6 +5,10 @@ from odoo import models
 class AccountMove(models.Model):
     _name = 'account.move'
     _inherit = ['account.move', 'safee.webhook.mixin']
+    _safee_webhook_fields = [
+        'name', 'state', 'move_type', 'partner_id', 'invoice_date', 'invoice_date_due',
+        'amount_total', 'amount_residual', 'payment_state', 'currency_id',
+    ]
 
     def _get_webhook_endpoint(self):
         """Return webhook endpoint for invoices/journal entries"""
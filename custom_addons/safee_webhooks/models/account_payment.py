@@ -5,6 +5,9 @@ from odoo import models
 class AccountPayment(models.Model):
     _name = 'account.payment'
     _inherit = ['account.payment', 'safee.webhook.mixin']
+    _safee_webhook_fields = [
+        'name', 'state', 'amount', 'payment_type', 'partner_id', 'date', 'currency_id',
+    ]
 
     def _get_webhook_endpoint(self):
         """Return webhook endpoint for payments"""
@@ -5,6 +5,10 @@ from odoo import models
 class CrmLead(models.Model):
     _name = 'crm.lead'
     _inherit = ['crm.lead', 'safee.webhook.mixin']
+    _safee_webhook_fields = [
+        'name', 'type', 'stage_id', 'partner_id', 'user_id', 'team_id',
+        'expected_revenue', 'probability', 'email_from', 'phone', 'active',
+    ]
 
     def _get_webhook_endpoint(self):
         """Return webhook endpoint for leads/opportunities"""
@@ -5,6 +5,9 @@ from odoo import models
 class HrDepartment(models.Model):
     _name = 'hr.department'
     _inherit = ['hr.department', 'safee.webhook.mixin']
+    _safee_webhook_fields = [
+        'name', 'parent_id', 'manager_id', 'company_id', 'active',
+    ]
 
     def _get_webhook_endpoint(self):
         """Return webhook endpoint for departments"""
@@ -5,6 +5,10 @@ from odoo import models
 class HrEmployee(models.Model):
     _name = 'hr.employee'
     _inherit = ['hr.employee', 'safee.webhook.mixin']
+    _safee_webhook_fields = [
+        'name', 'work_email', 'work_phone', 'mobile_phone', 'job_title', 'job_id',
+        'department_id', 'parent_id', 'company_id', 'active', 'user_id',
+    ]
 
     def _get_webhook_endpoint(self):
         """Return webhook endpoint for employees"""
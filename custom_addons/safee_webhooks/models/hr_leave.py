@@ -5,6 +5,10 @@ from odoo import models
 class HrLeave(models.Model):
     _name = 'hr.leave'
     _inherit = ['hr.leave', 'safee.webhook.mixin']
+    _safee_webhook_fields = [
+        'employee_id', 'holiday_status_id', 'state', 'request_date_from',
+        'request_date_to', 'number_of_days',
+    ]
 
     def _get_webhook_endpoint(self):
         """Return webhook endpoint for leave requests"""
@@ -24,3 +24,9 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='safee.organization_id',
         help='Your Safee organization ID',
     )
+    safee_webhook_batch_size = fields.Integer(
+        string='Webhook Batch Size',
+        config_parameter='safee.webhook_batch_size',
+        help='When greater than 1, the events of a transaction are sent in '
+             'signed batch payloads listing up to this number of records per endpoint',
+    )
@@ -5,6 +5,10 @@ from odoo import models
 class ResPartner(models.Model):
     _name = 'res.partner'
     _inherit = ['res.partner', 'safee.webhook.mixin']
+    _safee_webhook_fields = [
+        'name', 'email', 'phone', 'mobile', 'is_company', 'parent_id', 'vat',
+        'street', 'city', 'zip', 'country_id', 'active',
+    ]
 
     def _get_webhook_endpoint(self):
         """Return webhook endpoint for contacts"""
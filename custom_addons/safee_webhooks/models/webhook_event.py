@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from odoo import api, fields, models
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Number of events locked and delivered per transaction by the cron
+DELIVERY_BATCH_SIZE = 100
+# Maximum number of batches delivered by one run of the cron
+DELIVERY_MAX_BATCHES = 50
+DELIVERY_TIMEOUT = 10
+# Retry delays grow exponentially: 30s, 1min, 2min, ... capped at 6 hours
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 6 * 60 * 60
+# Events failing this many times are dead-lettered
+MAX_ATTEMPTS = 10
+# Key of the events waiting for the commit in the precommit data of the cursor
+PENDING_EVENTS_KEY = 'safee_webhooks.pending_events'
+
+_session = None
+
+
+def _get_session():
+    """Return the HTTP session shared by the deliveries of this process
+
+    The session keeps the connections to the gateway alive between
+    deliveries, instead of opening a new connection per webhook.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _session = session
+    return _session
+
+
+def _coalesce_event(previous, event):
+    """
+    Return the event to send for a record changed by ``previous`` then ``event``
+
+    A record created then deleted in the transaction sends nothing (None), a
+    deletion otherwise always wins, and a record created in the transaction
+    stays a creation whatever the writes that follow. Otherwise the last
+    event wins.
+    """
+    if previous == 'create':
+        if event == 'unlink':
+            return None
+        if event == 'write':
+            return 'create'
+    return event
+
+
+def _retry_delay(attempts):
+    """Delay in seconds before the next delivery after ``attempts`` failures"""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+class SafeeWebhookEvent(models.Model):
+    """
+    Outbox of the webhooks sent to Safee Analytics
+
+    Events are created in the transaction of the change they notify, so
+    they are only visible (and sent) if this transaction commits. A cron
+    delivers them in batches and deletes them once the gateway accepted
+    them. Failed deliveries are retried with an exponential backoff and
+    dead-lettered after MAX_ATTEMPTS attempts.
+    """
+    _name = 'safee.webhook.event'
+    _description = 'Safee Webhook Event'
+    _order = 'id'
+
+    model = fields.Char(required=True, readonly=True)
+    record_id = fields.Integer(readonly=True, help='Not set for batch events')
+    record_count = fields.Integer(default=1, readonly=True)
+    event = fields.Selection(
+        [('create', 'Create'), ('write', 'Write'), ('unlink', 'Unlink'), ('batch', 'Batch')],
+        required=True,
+        readonly=True,
+    )
+    endpoint_path = fields.Char(required=True, readonly=True)
+    payload = fields.Text(required=True, readonly=True)
+    state = fields.Selection(
+        [('pending', 'Pending'), ('dead', 'Dead')],
+        required=True,
+        default='pending',
+        readonly=True,
+    )
+    attempts = fields.Integer(readonly=True)
+    next_attempt = fields.Datetime(
+        required=True,
+        default=fields.Datetime.now,
+        readonly=True,
+    )
+    last_error = fields.Text(readonly=True)
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS safee_webhook_event_pending_index
+            ON safee_webhook_event (next_attempt, id) WHERE state = 'pending'
+            """
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        events = super(SafeeWebhookEvent, self).create(vals_list)
+        # deliver as soon as the transaction is committed, triggering the
+        # cron once per transaction whatever the number of events
+        precommit_data = self.env.cr.precommit.data
+        if not precommit_data.get('safee_webhooks.trigger_delivery'):
+            precommit_data['safee_webhooks.trigger_delivery'] = True
+            self.env.cr.precommit.add(self._trigger_delivery)
+        return events
+
+    @api.model
+    def _trigger_delivery(self):
+        self.env.ref('safee_webhooks.ir_cron_safee_webhook_delivery').sudo()._trigger()
+
+    def action_retry(self):
+        """Send dead events again"""
+        self.write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt': fields.Datetime.now(),
+        })
+        self._trigger_delivery()
+        return True
+
+    @api.model
+    def _cron_deliver(self, batch_size=DELIVERY_BATCH_SIZE, max_batches=DELIVERY_MAX_BATCHES):
+        """
+        Deliver the pending events whose next attempt is due
+
+        Each batch is locked with SKIP LOCKED, so concurrent runs deliver
+        different events, and committed on its own.
+        """
+        mixin = self.env['safee.webhook.mixin']
+        safee_config = mixin._get_safee_config()
+        if not safee_config['enabled']:
+            return
+        if not safee_config['webhook_url'] or not safee_config['webhook_secret'] \
+                or not safee_config['organization_id']:
+            _logger.warning('Safee webhook configuration incomplete, not delivering webhooks')
+            return
+        for __ in range(max_batches):
+            self.env.cr.execute(
+                """
+                SELECT id FROM safee_webhook_event
+                WHERE state = 'pending' AND next_attempt <= now() AT TIME ZONE 'utc'
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (batch_size,),
+            )
+            events = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not events:
+                break
+            reachable = events._deliver(safee_config['webhook_url'], safee_config['org_secret'])
+            if not config['test_enable']:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+            if not reachable or len(events) < batch_size:
+                break
+
+    def _deliver(self, webhook_url, org_secret):
+        """
+        Send the events, delete the delivered ones and reschedule the others
+
+        Returns False when the gateway could not be reached: the events left
+        in the batch are then rescheduled without trying to send them.
+        """
+        mixin = self.env['safee.webhook.mixin']
+        session = _get_session()
+        base_url = webhook_url.rstrip('/')
+        delivered = self.browse()
+        reachable = True
+        for index, event in enumerate(self):
+            signature = mixin._compute_signature(event.payload, org_secret)
+            try:
+                response = session.post(
+                    base_url + event.endpoint_path,
+                    data=event.payload,
+                    headers={
+                        'Content-Type': 'application/json',
+                        'X-Odoo-Signature': signature,
+                    },
+                    timeout=DELIVERY_TIMEOUT,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # do not wait for the timeout of every event of the batch
+                for pending_event in self[index:]:
+                    pending_event._delivery_failed(str(e))
+                reachable = False
+                break
+            except requests.RequestException as e:
+                event._delivery_failed(str(e))
+                continue
+            if response.status_code == 200:
+                delivered |= event
+            else:
+                event._delivery_failed(
+                    'Status: %s, Response: %s' % (response.status_code, response.text[:1000])
+                )
+        if delivered:
+            _logger.info('%d Safee webhooks sent successfully', len(delivered))
+            delivered.unlink()
+        return reachable
+
+    def _delivery_failed(self, error):
+        self.ensure_one()
+        attempts = self.attempts + 1
+        vals = {'attempts': attempts, 'last_error': error}
+        if attempts >= MAX_ATTEMPTS:
+            vals['state'] = 'dead'
+            _logger.error(
+                'Safee webhook dead-lettered after %d attempts: %s %s (record_id=%s) - Error: %s',
+                attempts, self.event, self.model, self.record_id, error
+            )
+        else:
+            vals['next_attempt'] = fields.Datetime.now() + timedelta(seconds=_retry_delay(attempts))
+            _logger.warning(
+                'Safee webhook failed, retrying in %ss: %s %s (record_id=%s) - Error: %s',
+                _retry_delay(attempts), self.event, self.model, self.record_id, error
+            )
+        self.write(vals)
+
+    @api.model
+    def _add_pending_events(self, model, record_ids, event, endpoint_path, user_id, timestamp,
+                            changes=None):
+        """
+        Register events to store in the outbox when the transaction commits
+
+        Events are coalesced by (model, record_id), see _coalesce_event. The
+        field changes of successive writes are merged, keeping the first old
+        value and the last new value, and a write event whose changes all
+        cancelled each other is dropped.
+
+        The events are stored by a precommit hook, and ``cr.savepoint()``
+        runs the precommit hooks when it flushes: each savepoint stores the
+        events registered so far, and the events of a record are only
+        coalesced within the changes made between two savepoints. Imports
+        using a savepoint per record thus send an event per record and per
+        savepoint.
+        """
+        precommit = self.env.cr.precommit
+        if PENDING_EVENTS_KEY not in precommit.data:
+            precommit.data[PENDING_EVENTS_KEY] = {}
+            precommit.add(self.sudo()._flush_pending_events)
+        pending = precommit.data[PENDING_EVENTS_KEY]
+        for record_id in record_ids:
+            previous = pending.get((model, record_id))
+            record_changes = None
+            if changes is not None:
+                record_changes = dict(previous and previous['changes'] or {})
+                for name, (old, new) in changes.get(record_id, {}).items():
+                    if name in record_changes:
+                        old = record_changes[name][0]
+                    if old == new:
+                        record_changes.pop(name, None)
+                    else:
+                        record_changes[name] = [old, new]
+                if not record_changes and event == 'write' \
+                        and (not previous or previous['event'] == 'write'):
+                    pending.pop((model, record_id), None)
+                    continue
+            coalesced_event = _coalesce_event(previous and previous['event'], event)
+            if coalesced_event is None:
+                pending.pop((model, record_id), None)
+                continue
+            pending[(model, record_id)] = {
+                'event': coalesced_event,
+                'endpoint_path': endpoint_path,
+                'user_id': user_id,
+                'timestamp': timestamp,
+                'changes': record_changes,
+            }
+
+    @api.model
+    def _flush_pending_events(self):
+        """Store the events coalesced during the transaction in the outbox"""
+        pending = self.env.cr.precommit.data.pop(PENDING_EVENTS_KEY, None)
+        if not pending:
+            return
+        config = self.env['safee.webhook.mixin']._get_safee_config()
+        events_by_model = {}
+        for (model, record_id), values in pending.items():
+            events_by_model.setdefault(model, {})[record_id] = values
+        vals_list = []
+        for model, events in events_by_model.items():
+            # records created or written in a savepoint rolled back since
+            existing_ids = set(
+                self.env[model].browse(
+                    [record_id for record_id, values in events.items() if values['event'] != 'unlink']
+                ).exists().ids
+            )
+            events = [
+                (record_id, values) for record_id, values in events.items()
+                if values['event'] == 'unlink' or record_id in existing_ids
+            ]
+            if config['batch_size'] > 1:
+                vals_list += self._prepare_batch_events_vals(model, events, config)
+            else:
+                vals_list += [
+                    self._prepare_event_vals(model, record_id, values, config)
+                    for record_id, values in events
+                ]
+        self.create(vals_list)
+
+    @api.model
+    def _prepare_event_vals(self, model, record_id, values, config):
+        return {
+            'model': model,
+            'record_id': record_id,
+            'event': values['event'],
+            'endpoint_path': values['endpoint_path'],
+            'payload': self._prepare_payload(
+                values['event'], model, record_id, config['organization_id'],
+                values['user_id'], values['timestamp'], changes=values.get('changes'),
+            ),
+        }
+
+    @api.model
+    def _prepare_batch_events_vals(self, model, events, config):
+        """
+        Return the values of batch events, each one listing at most
+        ``batch_size`` events of the model, per endpoint
+        """
+        events_by_endpoint = {}
+        for record_id, values in events:
+            events_by_endpoint.setdefault(values['endpoint_path'], []).append((record_id, values))
+        vals_list = []
+        batch_size = config['batch_size']
+        for endpoint_path, endpoint_events in events_by_endpoint.items():
+            for index in range(0, len(endpoint_events), batch_size):
+                batch = endpoint_events[index:index + batch_size]
+                vals_list.append({
+                    'model': model,
+                    'record_count': len(batch),
+                    'event': 'batch',
+                    'endpoint_path': endpoint_path,
+                    'payload': self._prepare_batch_payload(model, batch, config['organization_id']),
+                })
+        return vals_list
+
+    @api.model
+    def _prepare_payload(self, event, model, record_id, organization_id, user_id, timestamp,
+                         changes=None):
+        """
+        Return the JSON payload of an event
+
+        ``changes`` ({field: [old, new]}) is only part of the write events
+        of models declaring their _safee_webhook_fields.
+        """
+        payload = {
+            'event': event,
+            'model': model,
+            'record_id': record_id,
+            'organization_id': organization_id,
+            'user_id': str(user_id),
+            'timestamp': timestamp,
+        }
+        if changes and event == 'write':
+            payload['changes'] = changes
+        return json.dumps(payload, sort_keys=True, default=str)
+
+    @api.model
+    def _prepare_batch_payload(self, model, events, organization_id):
+        """
+        Return the JSON payload of a batch of events
+
+        The envelope is signed as a whole, like a single event payload. Its
+        ``events`` list the events of the records, in the single event
+        format without the organization.
+        """
+        batch_events = []
+        for record_id, values in events:
+            batch_event = {
+                'event': values['event'],
+                'model': model,
+                'record_id': record_id,
+                'user_id': str(values['user_id']),
+                'timestamp': values['timestamp'],
+            }
+            if values.get('changes') and values['event'] == 'write':
+                batch_event['changes'] = values['changes']
+            batch_events.append(batch_event)
+        return json.dumps({
+            'batch': True,
+            'model': model,
+            'organization_id': organization_id,
+            'record_ids': [record_id for record_id, values in events],
+            'events': batch_events,
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+        }, sort_keys=True, default=str)
@@ -1,11 +1,9 @@
 # -*- coding: utf-8 -*-
 import hmac
 import hashlib
-import json
 import logging
-import requests
 from datetime import datetime
-from odoo import models, api
+from odoo import models, api, tools
 
 _logger = logging.getLogger(__name__)
 
@@ -18,16 +16,44 @@ class SafeeWebhookMixin(models.AbstractModel):
     _name = 'safee.webhook.mixin'
     _description = 'Safee Webhook Mixin'
 
+    # Names of the fields whose changes are sent to Safee. When set, writes
+    # which do not change any of them (technical fields, counters, ...) do
+    # not send any event. None sends an event on every write.
+    _safee_webhook_fields = None
+
+    @api.model
+    @tools.ormcache()
     def _get_safee_config(self):
-        """Get Safee configuration from system parameters"""
+        """
+        Get Safee configuration from system parameters
+
+        The configuration, including the derived organization secret, is
+        cached in the registry. The cache is cleared whenever a system
+        parameter is created, changed or deleted (which the settings do),
+        so the hot paths neither read the parameters nor derive the secret
+        for every event. The returned dict is shared, it must not be
+        modified.
+        """
+        return self._read_safee_config()
+
+    @api.model
+    def _read_safee_config(self):
+        """Read the Safee configuration, see _get_safee_config"""
         IrConfigParameter = self.env['ir.config_parameter'].sudo()
 
-        return {
+        config = {
             'webhook_url': IrConfigParameter.get_param('safee.webhook_url', ''),
             'webhook_secret': IrConfigParameter.get_param('safee.webhook_secret', ''),
             'organization_id': IrConfigParameter.get_param('safee.organization_id', ''),
             'enabled': IrConfigParameter.get_param('safee.webhooks_enabled', 'False') == 'True',
+            'batch_size': int(IrConfigParameter.get_param('safee.webhook_batch_size', '0') or 0),
         }
+        config['org_secret'] = ''
+        if config['webhook_secret'] and config['organization_id']:
+            config['org_secret'] = self._derive_org_secret(
+                config['webhook_secret'], config['organization_id']
+            )
+        return config
 
     def _derive_org_secret(self, master_secret, organization_id):
         """
@@ -50,108 +76,135 @@ class SafeeWebhookMixin(models.AbstractModel):
         ).hexdigest()
         return signature
 
-    def _send_safee_webhook(self, event, endpoint_path):
-        """
-        Send webhook to Safee Analytics
-
-        Args:
-            event: 'create', 'write', or 'unlink'
-            endpoint_path: API endpoint path (e.g., '/webhooks/odoo/employees')
-        """
+    def _safee_webhooks_active(self):
+        """Return whether webhooks are enabled and fully configured"""
         config = self._get_safee_config()
 
         # Skip if webhooks disabled
         if not config['enabled']:
             _logger.debug('Safee webhooks disabled, skipping')
-            return
+            return False
 
         # Validate configuration
         if not config['webhook_url'] or not config['webhook_secret'] or not config['organization_id']:
             _logger.warning('Safee webhook configuration incomplete, skipping webhook')
-            return
-
-        # Get current user
-        user_id = self.env.user.id
-
-        # Build payload
-        payload = {
-            'event': event,
-            'model': self._name,
-            'record_id': self.id,
-            'organization_id': config['organization_id'],
-            'user_id': str(user_id),
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-        }
+            return False
+        return True
 
-        payload_json = json.dumps(payload, sort_keys=True)
-
-        # Derive per-org secret from master secret (matches gateway logic)
-        org_secret = self._derive_org_secret(config['webhook_secret'], config['organization_id'])
-        signature = self._compute_signature(payload_json, org_secret)
+    def _send_safee_webhook(self, event, changes=None):
+        """
+        Queue webhooks to Safee Analytics for the records
 
-        # Build full URL
-        webhook_url = config['webhook_url'].rstrip('/') + endpoint_path
+        The events are coalesced per transaction: a record changed several
+        times only produces one event, stored in the safee.webhook.event
+        outbox just before the commit and delivered by a cron once it is
+        committed.
 
-        # Send webhook
-        try:
-            headers = {
-                'Content-Type': 'application/json',
-                'X-Odoo-Signature': signature,
-            }
+        Args:
+            event: 'create', 'write', or 'unlink'
+            changes: for 'write' events of models declaring their
+                _safee_webhook_fields, {record_id: {field: [old, new]}}
+        """
+        if not self or not self._safee_webhooks_active():
+            return
+        self.env['safee.webhook.event']._add_pending_events(
+            self._name,
+            self.ids,
+            event,
+            self._get_webhook_endpoint(),
+            self.env.user.id,
+            datetime.utcnow().isoformat() + 'Z',
+            changes=changes,
+        )
+
+    def _get_safee_webhook_fields(self):
+        """
+        Return the names of the fields whose changes are sent, or None when
+        the model sends an event on every write
+        """
+        if self._safee_webhook_fields is None:
+            return None
+        return [name for name in self._safee_webhook_fields if name in self._fields]
 
-            response = requests.post(
-                webhook_url,
-                data=payload_json,
-                headers=headers,
-                timeout=10
+    def _get_safee_webhook_written_fields(self, field_names, vals):
+        """
+        Return the fields of ``field_names`` that writing ``vals`` may change:
+        the written fields and the computed fields depending on them
+        """
+        written_fields = [self._fields[name] for name in vals if name in self._fields]
+        names = {field.name for field in written_fields}
+        for field in written_fields:
+            names.update(
+                dependent.name for dependent in self.pool.get_dependent_fields(field)
+                if dependent.model_name == self._name
             )
+        return [name for name in field_names if name in names]
 
-            if response.status_code == 200:
-                _logger.info(
-                    'Safee webhook sent successfully: %s %s (record_id=%s)',
-                    event, self._name, self.id
-                )
-            else:
-                _logger.warning(
-                    'Safee webhook failed: %s %s (record_id=%s) - Status: %s, Response: %s',
-                    event, self._name, self.id, response.status_code, response.text
-                )
-
-        except Exception as e:
-            _logger.error(
-                'Failed to send Safee webhook: %s %s (record_id=%s) - Error: %s',
-                event, self._name, self.id, str(e)
-            )
+    def _get_safee_webhook_values(self, field_names):
+        """Return {record_id: {field: value}}, with JSON compatible values"""
+        values = {}
+        for record in self:
+            record_values = values[record.id] = {}
+            for name in field_names:
+                field = self._fields[name]
+                value = record[name]
+                if field.relational:
+                    value = value.id if field.type == 'many2one' else sorted(value.ids)
+                elif field.type in ('date', 'datetime'):
+                    value = value and value.isoformat()
+                record_values[name] = value
+        return values
 
     @api.model_create_multi
     def create(self, vals_list):
         """Override create to send webhook"""
         records = super(SafeeWebhookMixin, self).create(vals_list)
-        for record in records:
-            record._send_webhook_after_commit('create')
+        records._send_safee_webhook('create')
         return records
 
     def write(self, vals):
-        """Override write to send webhook"""
+        """
+        Override write to send webhook
+
+        For models declaring their _safee_webhook_fields, only the records on
+        which one of these fields changed produce an event, listing the
+        changed fields with their old and new values. Only the declared
+        fields that are written, or computed from the written fields, are
+        compared.
+        """
+        field_names = self._get_safee_webhook_fields()
+        if field_names is None:
+            result = super(SafeeWebhookMixin, self).write(vals)
+            self._send_safee_webhook('write')
+            return result
+        if not self or not self._safee_webhooks_active():
+            return super(SafeeWebhookMixin, self).write(vals)
+        # reading the computed fields which the write does not modify would
+        # recompute them needlessly, e.g. the amounts of the invoices
+        field_names = self._get_safee_webhook_written_fields(field_names, vals)
+        if not field_names:
+            return super(SafeeWebhookMixin, self).write(vals)
+        old_values = self._get_safee_webhook_values(field_names)
         result = super(SafeeWebhookMixin, self).write(vals)
-        for record in self:
-            record._send_webhook_after_commit('write')
+        new_values = self._get_safee_webhook_values(field_names)
+        changes = {}
+        for record_id, record_values in new_values.items():
+            record_changes = {
+                name: [old_values[record_id][name], value]
+                for name, value in record_values.items()
+                if value != old_values[record_id][name]
+            }
+            if record_changes:
+                changes[record_id] = record_changes
+        if changes:
+            self.browse(list(changes))._send_safee_webhook('write', changes=changes)
         return result
 
     def unlink(self):
         """Override unlink to send webhook"""
-        for record in self:
-            record._send_webhook_after_commit('unlink')
+        self._send_safee_webhook('unlink')
         return super(SafeeWebhookMixin, self).unlink()
 
-    def _send_webhook_after_commit(self, event):
-        """Queue webhook to be sent after transaction commit"""
-        endpoint_path = self._get_webhook_endpoint()
-
-        @self.env.cr.postcommit.add
-        def send_webhook():
-            self._send_safee_webhook(event, endpoint_path)
-
     def _get_webhook_endpoint(self):
         """
         Override this method in each model to specify the webhook endpoint
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+from . import test_webhook_delivery
+from . import test_webhook_events
+from . import test_webhook_mixin
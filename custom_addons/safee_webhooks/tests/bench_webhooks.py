@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the overhead of the Safee webhook mixin
+
+It creates partners one by one with webhooks disabled then enabled, and
+reports the time per created partner, as well as the time to get the
+Safee configuration with and without the registry cache. Nothing is
+committed.
+
+This is not part of the test suite, run it from an Odoo shell::
+
+    $ odoo-bin shell -d <database>
+    >>> from odoo.addons.safee_webhooks.tests.bench_webhooks import run
+    >>> run(env, count=1000)
+"""
+import time
+
+WEBHOOK_PARAMS = {
+    'safee.webhook_url': 'https://gateway.invalid',
+    'safee.webhook_secret': 'benchmark-secret',
+    'safee.organization_id': 'benchmark-organization',
+}
+
+
+def _report(label, count, elapsed):
+    print('%-28s %8d ops %8.3fs %10.1f us/op' % (label, count, elapsed, elapsed / count * 1e6))
+
+
+def _create_partners(env, count, enabled):
+    IrConfigParameter = env['ir.config_parameter'].sudo()
+    IrConfigParameter.set_param('safee.webhooks_enabled', str(enabled))
+    Partner = env['res.partner']
+    Partner.create({'name': 'warmup'})
+    start = time.perf_counter()
+    for index in range(count):
+        Partner.create({'name': 'Webhook benchmark %s' % index})
+    # the outbox is filled just before the commit
+    env['safee.webhook.event'].sudo()._flush_pending_events()
+    env.flush_all()
+    return time.perf_counter() - start
+
+
+def run(env, count=1000):
+    IrConfigParameter = env['ir.config_parameter'].sudo()
+    Mixin = env['safee.webhook.mixin']
+    with env.cr.savepoint(flush=False) as savepoint:
+        for key, value in WEBHOOK_PARAMS.items():
+            IrConfigParameter.set_param(key, value)
+        _report('partner create, disabled', count, _create_partners(env, count, False))
+        _report('partner create, enabled', count, _create_partners(env, count, True))
+
+        start = time.perf_counter()
+        for __ in range(count):
+            Mixin._read_safee_config()
+        _report('config, uncached', count, time.perf_counter() - start)
+        start = time.perf_counter()
+        for __ in range(count):
+            Mixin._get_safee_config()
+        _report('config, cached', count, time.perf_counter() - start)
+        savepoint.rollback()
+    # the cache holds the configuration of the benchmark
+    env.registry.clear_cache()
+    env.invalidate_all()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+WEBHOOK_PARAMS = {
+    'safee.webhooks_enabled': 'True',
+    'safee.webhook_url': 'https://gateway.invalid/',
+    'safee.webhook_secret': 'test-secret',
+    'safee.organization_id': 'test-organization',
+    'safee.webhook_batch_size': '0',
+}
+
+
+class SafeeWebhookCase(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        IrConfigParameter = cls.env['ir.config_parameter'].sudo()
+        for key, value in WEBHOOK_PARAMS.items():
+            IrConfigParameter.set_param(key, value)
+        cls.Event = cls.env['safee.webhook.event'].sudo()
+
+    def _flush_events(self, model='res.partner'):
+        """Store the pending events and return the new ones of the model
+
+        The precommit hooks do not run in tests, the pending events are
+        stored by calling _flush_pending_events.
+        """
+        self.Event.search([]).unlink()
+        self.Event._flush_pending_events()
+        return self.Event.search([('model', '=', model)])
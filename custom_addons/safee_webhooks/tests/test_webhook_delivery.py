@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+from unittest import mock
+
+import requests
+
+from odoo import SUPERUSER_ID, api, fields
+from odoo.sql_db import db_connect
+
+from ..models.webhook_event import MAX_ATTEMPTS
+from .common import SafeeWebhookCase
+
+# the cron only delivers the events due at the start of its transaction, which
+# is the start of the whole test transaction
+DUE_DATE = datetime(2000, 1, 1)
+
+
+class TestWebhookDelivery(SafeeWebhookCase):
+
+    def _create_event(self, record_id=1, **vals):
+        return self.Event.create(dict({
+            'model': 'res.partner',
+            'record_id': record_id,
+            'event': 'write',
+            'endpoint_path': '/webhooks/odoo/contacts',
+            'payload': '{"record_id": %d}' % record_id,
+            'next_attempt': DUE_DATE,
+        }, **vals))
+
+    def _mock_post(self, status_code=200, side_effect=None):
+        response = mock.Mock(status_code=status_code, text='error')
+        return mock.patch.object(
+            requests.Session, 'post', return_value=response, side_effect=side_effect
+        )
+
+    def test_deliver(self):
+        event = self._create_event()
+        mixin = self.env['safee.webhook.mixin']
+        signature = mixin._compute_signature(
+            event.payload, mixin._get_safee_config()['org_secret']
+        )
+        payload = event.payload
+        with self._mock_post() as post:
+            self.Event._cron_deliver()
+        post.assert_called_once()
+        url = post.call_args.args[0]
+        self.assertEqual(url, 'https://gateway.invalid/webhooks/odoo/contacts')
+        self.assertEqual(post.call_args.kwargs['data'], payload)
+        self.assertEqual(post.call_args.kwargs['headers']['X-Odoo-Signature'], signature)
+        self.assertFalse(event.exists())
+
+    def test_deliver_disabled(self):
+        event = self._create_event()
+        self.env['ir.config_parameter'].sudo().set_param('safee.webhooks_enabled', 'False')
+        with self._mock_post() as post:
+            self.Event._cron_deliver()
+        post.assert_not_called()
+        self.assertTrue(event.exists())
+
+    def test_deliver_not_due(self):
+        event = self._create_event(next_attempt=fields.Datetime.now() + timedelta(hours=1))
+        with self._mock_post() as post:
+            self.Event._cron_deliver()
+        post.assert_not_called()
+        self.assertTrue(event.exists())
+
+    def test_retry_backoff(self):
+        event = self._create_event()
+        for attempts, delay in ((1, 30), (2, 60), (3, 120)):
+            event.next_attempt = DUE_DATE
+            start = fields.Datetime.now()
+            with self._mock_post(status_code=500):
+                self.Event._cron_deliver()
+            self.assertEqual(event.state, 'pending')
+            self.assertEqual(event.attempts, attempts)
+            self.assertIn('Status: 500', event.last_error)
+            self.assertGreaterEqual(event.next_attempt, start + timedelta(seconds=delay))
+            self.assertLessEqual(
+                event.next_attempt, fields.Datetime.now() + timedelta(seconds=delay)
+            )
+
+    def test_unreachable(self):
+        """The batch is rescheduled without waiting for every event to time out"""
+        events = self._create_event(1) | self._create_event(2)
+        with self._mock_post(side_effect=requests.ConnectionError('unreachable')) as post:
+            self.Event._cron_deliver()
+        post.assert_called_once()
+        self.assertEqual(events.mapped('attempts'), [1, 1])
+        self.assertEqual(events.mapped('last_error'), ['unreachable', 'unreachable'])
+
+    def test_dead_letter(self):
+        event = self._create_event(attempts=MAX_ATTEMPTS - 1)
+        with self._mock_post(status_code=500):
+            self.Event._cron_deliver()
+        self.assertEqual(event.state, 'dead')
+        self.assertEqual(event.attempts, MAX_ATTEMPTS)
+        # dead events are not sent again, until they are retried manually
+        with self._mock_post() as post:
+            self.Event._cron_deliver()
+        post.assert_not_called()
+        event.action_retry()
+        self.assertEqual(event.state, 'pending')
+        self.assertEqual(event.attempts, 0)
+
+    def test_deliver_batches(self):
+        events = self.Event.browse()
+        for record_id in range(5):
+            events |= self._create_event(record_id)
+        with self._mock_post() as post:
+            self.Event._cron_deliver(batch_size=2, max_batches=2)
+        self.assertEqual(post.call_count, 4)
+        self.assertEqual(events.exists(), events[4:])
+
+    def test_skip_locked(self):
+        """Events locked by a concurrent delivery are left to it"""
+        # the events must be committed to be seen by concurrent transactions
+        dbname = self.env.cr.dbname
+        with db_connect(dbname).cursor() as cr:
+            cr.execute(
+                """
+                INSERT INTO safee_webhook_event
+                    (model, record_id, record_count, event, endpoint_path, payload,
+                     state, attempts, next_attempt)
+                SELECT 'res.partner', record_id, 1, 'write', '/webhooks/odoo/contacts',
+                       '{}', 'pending', 0, %s
+                FROM generate_series(1, 2) record_id
+                RETURNING id
+                """,
+                (DUE_DATE,),
+            )
+            event_ids = sorted(row[0] for row in cr.fetchall())
+        self.addCleanup(self._delete_committed_events, dbname, event_ids)
+        mixin_class = type(self.env['safee.webhook.mixin'])
+        safee_config = self.env['safee.webhook.mixin']._read_safee_config()
+        with db_connect(dbname).cursor() as lock_cr, db_connect(dbname).cursor() as cr:
+            lock_cr.execute(
+                'SELECT id FROM safee_webhook_event WHERE id = %s FOR UPDATE', (event_ids[0],)
+            )
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            with self._mock_post() as post, mock.patch.object(
+                mixin_class, '_get_safee_config', return_value=safee_config
+            ):
+                env['safee.webhook.event']._cron_deliver()
+            post.assert_called_once()
+            cr.execute('SELECT id FROM safee_webhook_event WHERE id IN %s', (tuple(event_ids),))
+            self.assertEqual([row[0] for row in cr.fetchall()], event_ids[:1])
+            cr.rollback()
+            lock_cr.rollback()
+
+    @staticmethod
+    def _delete_committed_events(dbname, event_ids):
+        with db_connect(dbname).cursor() as cr:
+            cr.execute('DELETE FROM safee_webhook_event WHERE id IN %s', (tuple(event_ids),))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import json
+
+from .common import SafeeWebhookCase
+
+
+class TestWebhookEvents(SafeeWebhookCase):
+    """The events are coalesced until the commit"""
+
+    def _create_partner(self, name='Partner'):
+        partner = self.env['res.partner'].create({'name': name})
+        self._flush_events()
+        return partner
+
+    def test_create(self):
+        partner = self.env['res.partner'].create({'name': 'Partner'})
+        event = self._flush_events()
+        self.assertRecordValues(event, [{
+            'record_id': partner.id,
+            'event': 'create',
+            'endpoint_path': '/webhooks/odoo/contacts',
+            'state': 'pending',
+        }])
+        payload = json.loads(event.payload)
+        self.assertEqual(payload['organization_id'], 'test-organization')
+        self.assertNotIn('changes', payload)
+        # nothing is left to store
+        self.assertFalse(self._flush_events())
+
+    def test_merge_writes(self):
+        partner = self._create_partner()
+        partner.write({'name': 'Renamed'})
+        partner.write({'name': 'Renamed again', 'email': 'partner@example.com'})
+        partner.write({'email': 'partner@example.com'})
+        event = self._flush_events()
+        self.assertEqual(event.event, 'write')
+        self.assertEqual(json.loads(event.payload)['changes'], {
+            'name': ['Partner', 'Renamed again'],
+            'email': [False, 'partner@example.com'],
+        })
+
+    def test_write_cancelled(self):
+        """Changes reverted in the same transaction send nothing"""
+        partner = self._create_partner()
+        partner.write({'name': 'Renamed'})
+        partner.write({'name': 'Partner'})
+        self.assertFalse(self._flush_events())
+
+    def test_create_write(self):
+        partner = self.env['res.partner'].create({'name': 'Partner'})
+        partner.write({'name': 'Renamed'})
+        event = self._flush_events()
+        self.assertEqual(event.event, 'create')
+        self.assertNotIn('changes', json.loads(event.payload))
+
+    def test_create_unlink(self):
+        """A record created then deleted in the transaction sends nothing"""
+        partner = self.env['res.partner'].create({'name': 'Partner'})
+        partner.write({'name': 'Renamed'})
+        partner.unlink()
+        self.assertFalse(self._flush_events())
+
+    def test_write_unlink(self):
+        partner = self._create_partner()
+        partner.write({'name': 'Renamed'})
+        partner_id = partner.id
+        partner.unlink()
+        event = self._flush_events()
+        self.assertRecordValues(event, [{'record_id': partner_id, 'event': 'unlink'}])
+
+    def test_savepoint_rollback(self):
+        """Records created in a rolled back savepoint send nothing"""
+        with self.env.cr.savepoint(flush=False) as savepoint:
+            self.env['res.partner'].create({'name': 'Partner'})
+            self.env.flush_all()
+            savepoint.rollback()
+        self.assertFalse(self._flush_events())
+
+    def test_batch(self):
+        self.env['ir.config_parameter'].sudo().set_param('safee.webhook_batch_size', '2')
+        partners = self.env['res.partner'].create(
+            [{'name': 'Partner %d' % index} for index in range(3)]
+        )
+        partners[0].write({'name': 'Renamed'})
+        events = self._flush_events()
+        self.assertRecordValues(events, [
+            {'record_id': 0, 'event': 'batch', 'record_count': 2},
+            {'record_id': 0, 'event': 'batch', 'record_count': 1},
+        ])
+        payloads = [json.loads(event.payload) for event in events]
+        self.assertEqual(
+            [payload['record_ids'] for payload in payloads],
+            [partners[:2].ids, partners[2:].ids],
+        )
+        payload = payloads[0]
+        self.assertTrue(payload['batch'])
+        self.assertEqual(payload['model'], 'res.partner')
+        self.assertEqual(payload['organization_id'], 'test-organization')
+        self.assertEqual(
+            [(event['record_id'], event['event']) for event in payload['events']],
+            [(partners[0].id, 'create'), (partners[1].id, 'create')],
+        )
+        self.assertNotIn('organization_id', payload['events'][0])
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import json
+from unittest import mock
+
+from .common import SafeeWebhookCase
+
+
+class TestWebhookMixin(SafeeWebhookCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['res.partner'].create({'name': 'Partner'})
+
+    def test_written_fields(self):
+        Partner = self.env['res.partner']
+        field_names = Partner._get_safee_webhook_fields()
+        self.assertEqual(
+            Partner._get_safee_webhook_written_fields(field_names, {'ref': 'REF'}), []
+        )
+        self.assertEqual(
+            Partner._get_safee_webhook_written_fields(
+                field_names, {'ref': 'REF', 'email': 'partner@example.com', 'name': 'Name'}
+            ),
+            ['name', 'email'],
+        )
+
+    def test_written_computed_fields(self):
+        """The computed fields depending on the written ones are compared"""
+        Move = self.env['account.move']
+        field_names = Move._get_safee_webhook_fields()
+        self.assertEqual(Move._get_safee_webhook_written_fields(field_names, {'ref': 'REF'}), [])
+        written_fields = Move._get_safee_webhook_written_fields(field_names, {'line_ids': []})
+        for name in ('amount_total', 'amount_residual', 'payment_state'):
+            self.assertIn(name, written_fields)
+        self.assertNotIn('name', written_fields)
+
+    def test_write_other_fields(self):
+        """Writing fields which are not sent reads nothing and sends nothing"""
+        self._flush_events()
+        with mock.patch.object(
+            type(self.partner), '_get_safee_webhook_values'
+        ) as get_values:
+            self.partner.write({'ref': 'REF', 'comment': 'Comment'})
+        get_values.assert_not_called()
+        self.assertFalse(self._flush_events())
+
+    def test_write_unchanged(self):
+        self._flush_events()
+        self.partner.write({'name': 'Partner', 'ref': 'REF'})
+        self.assertFalse(self._flush_events())
+
+    def test_write_changes(self):
+        self._flush_events()
+        self.partner.write({'name': 'Renamed', 'email': False, 'ref': 'REF'})
+        event = self._flush_events()
+        self.assertEqual(event.event, 'write')
+        self.assertEqual(json.loads(event.payload)['changes'], {'name': ['Partner', 'Renamed']})
@@ -5,6 +5,12 @@
 import json
 import logging
 import os
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 import psycopg2
 
@@ -15,139 +21,372 @@ from odoo.tools.func import lazy_property
 
 _logger = logging.getLogger(__name__)
 
-lock = None
-if odoo.evented:
-    import gevent.lock
+# In evented mode, odoo monkey patches threading and queue with gevent, so
+# the pool and cache locks below are gevent aware.
 
-    lock = gevent.lock.RLock()
-elif odoo.tools.config["workers"] == 0:
-    import threading
+DEFAULT_POOL_SIZE = 4
+# maximum number of sessions kept in memory for the read cache and for
+# the detection of unchanged sessions
+DEFAULT_CACHE_SIZE = 2048
+# unchanged sessions are written anyway when their last write is older,
+# so that the sessions in use are not vacuumed
+TOUCH_INTERVAL = timedelta(hours=1)
+# number of expired sessions deleted per statement by vacuum
+VACUUM_BATCH_SIZE = 10000
+# zlib level of the session payloads, fast rather than small: most sessions
+# are a few hundred bytes of JSON
+PAYLOAD_COMPRESS_LEVEL = 1
+# seconds between checks for a connection released to the pool or
+# discarded from it, when all the connections are in use
+POOL_WAIT_INTERVAL = 1
+# advisory lock taken by the process building the index of the sessions
+INDEX_LOCK_ID = 7275816
 
-    lock = threading.RLock()
 
+def with_cursor(func):
+    """Run the method with a cursor of the pool, given as first argument
 
-def with_lock(func):
-    def wrapper(*args, **kwargs):
-        try:
-            if lock is not None:
-                lock.acquire()
-            return func(*args, **kwargs)
-        finally:
-            if lock is not None:
-                lock.release()
-
-    return wrapper
-
+    The operation is retried with a new connection when the connection
+    fails.
+    """
 
-def with_cursor(func):
     def wrapper(self, *args, **kwargs):
         tries = 0
         while True:
             tries += 1
+            cr = self._borrow_cursor()
             try:
-                self._ensure_connection()
-                return func(self, *args, **kwargs)
+                result = func(self, cr, *args, **kwargs)
             except (psycopg2.InterfaceError, psycopg2.OperationalError):
-                self._close_connection()
+                self._discard_cursor(cr)
                 if tries > 4:
                     _logger.warning(
                         "session_db operation try %s/5 failed, aborting", tries
                     )
                     raise
                 _logger.info("session_db operation try %s/5 failed, retrying", tries)
+            except Exception:
+                self._release_cursor(cr)
+                raise
+            else:
+                self._release_cursor(cr)
+                return result
 
     return wrapper
 
 
 class PGSessionStore(sessions.SessionStore):
-    def __init__(self, uri, session_class=None):
+    """Session store in a PostgreSQL table
+
+    The store keeps a pool of up to ``pool_size`` connections, so the
+    requests handled by the threads of a server do not wait for each
+    other. It remembers the last payload it read or wrote for the
+    ``cache_size`` most recently used sessions, to skip the saves of
+    sessions which did not change. When ``cache_ttl`` is set, these
+    payloads are also returned by ``get`` during ``cache_ttl`` seconds
+    without reading the table.
+
+    The payloads are stored as zlib compressed JSON. The sessions of
+    deployments which accept to lose them when PostgreSQL crashes can be
+    stored in an UNLOGGED table (``unlogged``), which does not generate
+    WAL.
+    """
+
+    def __init__(
+        self,
+        uri,
+        session_class=None,
+        pool_size=None,
+        cache_ttl=None,
+        cache_size=DEFAULT_CACHE_SIZE,
+        unlogged=None,
+    ):
         super().__init__(session_class)
         self._uri = uri
-        self._cr = None
-        self._open_connection()
+        if pool_size is None:
+            pool_size = int(os.environ.get("SESSION_DB_POOL_SIZE") or DEFAULT_POOL_SIZE)
+        if cache_ttl is None:
+            cache_ttl = float(os.environ.get("SESSION_DB_CACHE_TTL") or 0)
+        if unlogged is None:
+            unlogged = os.environ.get("SESSION_DB_UNLOGGED", "").lower() in (
+                "1",
+                "true",
+                "yes",
+            )
+        self._unlogged = unlogged
+        self._pool_size = max(pool_size, 1)
+        self._cache_ttl = cache_ttl
+        self._cache_size = cache_size
+        self._cursors = queue.LifoQueue()
+        self._opened = 0
+        self._pool_lock = threading.Lock()
+        # sid -> (payload, write_date, time at which it was read or written)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
         self._setup_db()
 
     def __del__(self):
-        self._close_connection()
-
-    @with_lock
-    def _ensure_connection(self):
-        if self._cr is None:
-            self._open_connection()
+        self._close_connections()
 
-    @with_lock
-    def _open_connection(self):
-        self._close_connection()
+    def _open_cursor(self):
         cnx = odoo.sql_db.db_connect(self._uri, allow_uri=True)
-        self._cr = cnx.cursor()
-        self._cr._cnx.autocommit = True
+        cr = cnx.cursor()
+        cr._cnx.autocommit = True
+        return cr
 
-    @with_lock
-    def _close_connection(self):
-        """Return cursor to the pool."""
-        if self._cr is not None:
+    def _borrow_cursor(self):
+        """Take a cursor from the pool, opening it if the pool is not full"""
+        while True:
             try:
-                self._cr.close()
-            except Exception:  # pylint: disable=except-pass
+                return self._cursors.get_nowait()
+            except queue.Empty:
                 pass
-            self._cr = None
+            with self._pool_lock:
+                can_open = self._opened < self._pool_size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    return self._open_cursor()
+                except BaseException:
+                    with self._pool_lock:
+                        self._opened -= 1
+                    raise
+            # wait for a cursor, checking again regularly in case a broken
+            # one was discarded instead of being released
+            try:
+                return self._cursors.get(timeout=POOL_WAIT_INTERVAL)
+            except queue.Empty:
+                continue
+
+    def _release_cursor(self, cr):
+        self._cursors.put(cr)
+
+    def _discard_cursor(self, cr):
+        """Close a cursor whose connection failed, instead of releasing it"""
+        with self._pool_lock:
+            self._opened -= 1
+        try:
+            cr.close()
+        except Exception:  # pylint: disable=except-pass
+            pass
+
+    def _close_connections(self):
+        """Return the cursors of the pool to the odoo connection pool."""
+        while True:
+            try:
+                cr = self._cursors.get_nowait()
+            except (queue.Empty, AttributeError):
+                return
+            self._discard_cursor(cr)
+
+    def _cache_get(self, sid):
+        """Return the (payload, write_date, cached_at) remembered for sid"""
+        with self._cache_lock:
+            entry = self._cache.get(sid)
+            if entry is not None:
+                self._cache.move_to_end(sid)
+            return entry
+
+    def _cache_set(self, sid, payload, write_date):
+        with self._cache_lock:
+            self._cache[sid] = (payload, write_date, time.monotonic())
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_pop(self, sid):
+        with self._cache_lock:
+            self._cache.pop(sid, None)
 
-    @with_lock
     @with_cursor
-    def _setup_db(self):
-        self._cr.execute(
-            """
-                CREATE TABLE IF NOT EXISTS http_sessions (
+    def _setup_db(self, cr):
+        persistence = "UNLOGGED" if self._unlogged else "LOGGED"
+        cr.execute(
+            f"""
+                CREATE {"UNLOGGED" if self._unlogged else ""}
+                TABLE IF NOT EXISTS http_sessions (
                     sid varchar PRIMARY KEY,
                     write_date timestamp without time zone NOT NULL,
-                    payload text NOT NULL
+                    payload text,
+                    data bytea
                 )
             """
         )
+        # the schema is altered only when needed, as ALTER TABLE locks the
+        # table, and every process sets up the store when it starts
+        cr.execute(
+            """
+                SELECT relpersistence,
+                       (SELECT array_agg(column_name::text)
+                        FROM information_schema.columns
+                        WHERE table_name = 'http_sessions'
+                          AND table_schema = current_schema()
+                          AND is_nullable = 'YES')
+                FROM pg_class
+                WHERE oid = 'http_sessions'::regclass
+            """
+        )
+        relpersistence, nullable_columns = cr.fetchone()
+        nullable_columns = nullable_columns or []
+        # tables created before the compressed payloads: their sessions
+        # are still read from payload until they are saved again
+        if "data" not in nullable_columns:
+            cr.execute("ALTER TABLE http_sessions ADD COLUMN IF NOT EXISTS data bytea")
+        if "payload" not in nullable_columns:
+            cr.execute("ALTER TABLE http_sessions ALTER COLUMN payload DROP NOT NULL")
+        if relpersistence != ("u" if self._unlogged else "p"):
+            _logger.info("session_db: altering http_sessions to %s", persistence)
+            # rewrites the table
+            cr.execute(f"ALTER TABLE http_sessions SET {persistence}")
+        self._setup_write_date_index(cr)
+
+    def _setup_write_date_index(self, cr):
+        """Create the index vacuum deletes ranges of, if it is missing or
+        invalid
+
+        It is created concurrently as existing tables may be large (the
+        cursor is in autocommit), by a single process: a build interrupted
+        leaves an invalid index, which is rebuilt by the next process
+        starting.
+        """
+        query = """
+            SELECT i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'http_sessions_write_date_index'
+              AND c.relnamespace = current_schema()::regnamespace
+        """
+        cr.execute(query)
+        row = cr.fetchone()
+        if row and row[0]:
+            return
+        cr.execute("SELECT pg_try_advisory_lock(%s)", (INDEX_LOCK_ID,))
+        if not cr.fetchone()[0]:
+            # another process is building it
+            return
+        try:
+            cr.execute(query)
+            row = cr.fetchone()
+            if row and row[0]:
+                return
+            if row:
+                _logger.info("session_db: rebuilding the invalid write_date index")
+                cr.execute(
+                    "DROP INDEX CONCURRENTLY IF EXISTS http_sessions_write_date_index"
+                )
+            cr.execute(
+                "CREATE INDEX CONCURRENTLY http_sessions_write_date_index "
+                "ON http_sessions (write_date)"
+            )
+        finally:
+            cr.execute("SELECT pg_advisory_unlock(%s)", (INDEX_LOCK_ID,))
 
-    @with_lock
-    @with_cursor
     def save(self, session):
         payload = json.dumps(dict(session))
-        self._cr.execute(
+        entry = self._cache_get(session.sid)
+        if (
+            entry is not None
+            and entry[0] == payload
+            and datetime.utcnow() - entry[1] < TOUCH_INTERVAL
+        ):
+            return
+        data = zlib.compress(payload.encode(), PAYLOAD_COMPRESS_LEVEL)
+        write_date = self._upsert(session.sid, data)
+        self._cache_set(session.sid, payload, write_date)
+
+    @with_cursor
+    def _upsert(self, cr, sid, data):
+        cr.execute(
             """
-                INSERT INTO http_sessions(sid, write_date, payload)
-                    VALUES (%(sid)s, now() at time zone 'UTC', %(payload)s)
+                INSERT INTO http_sessions(sid, write_date, data)
+                    VALUES (%(sid)s, now() at time zone 'UTC', %(data)s)
                 ON CONFLICT (sid)
-                DO UPDATE SET payload = %(payload)s,
+                DO UPDATE SET data = %(data)s,
+                              payload = NULL,
                               write_date = now() at time zone 'UTC'
+                RETURNING write_date
             """,
-            dict(sid=session.sid, payload=payload),
+            dict(sid=sid, data=psycopg2.Binary(data)),
         )
+        return cr.fetchone()[0]
 
-    @with_lock
-    @with_cursor
     def delete(self, session):
-        self._cr.execute("DELETE FROM http_sessions WHERE sid=%s", (session.sid,))
+        self._cache_pop(session.sid)
+        self._delete(session.sid)
 
-    @with_lock
     @with_cursor
+    def _delete(self, cr, sid):
+        cr.execute("DELETE FROM http_sessions WHERE sid=%s", (sid,))
+
     def get(self, sid):
-        self._cr.execute("SELECT payload FROM http_sessions WHERE sid=%s", (sid,))
+        entry = self._cache_get(sid)
+        if entry is not None and time.monotonic() - entry[2] < self._cache_ttl:
+            payload = entry[0]
+        else:
+            row = self._select(sid)
+            if row is None:
+                self._cache_pop(sid)
+                return self.new()
+            compressed, payload, write_date = row
+            try:
+                if compressed is not None:
+                    payload = zlib.decompress(compressed).decode()
+            except Exception:
+                return self.new()
+            self._cache_set(sid, payload, write_date)
         try:
-            data = json.loads(self._cr.fetchone()[0])
+            data = json.loads(payload)
         except Exception:
             return self.new()
 
         return self.session_class(data, sid, False)
 
+    @with_cursor
+    def _select(self, cr, sid):
+        cr.execute(
+            "SELECT data, payload, write_date FROM http_sessions WHERE sid=%s",
+            (sid,),
+        )
+        return cr.fetchone()
+
     # This method is not part of the Session interface but is called nevertheless,
     # so let's get it from FilesystemSessionStore.
     rotate = http.FilesystemSessionStore.rotate
 
-    @with_lock
+    def vacuum(
+        self, max_lifetime=http.SESSION_LIFETIME, batch_size=VACUUM_BATCH_SIZE
+    ):
+        """Delete the expired sessions, return their number
+
+        The sessions are deleted by batches of ``batch_size``, each one
+        committed on its own, so that a large vacuum (run by the
+        ``ir.autovacuum`` cron) neither holds locks on many rows nor
+        generates a large transaction.
+        """
+        deleted = 0
+        while True:
+            count = self._vacuum_batch(max_lifetime, batch_size)
+            deleted += count
+            if count < batch_size:
+                break
+        if deleted:
+            _logger.info("session_db vacuum deleted %s sessions", deleted)
+        return deleted
+
     @with_cursor
-    def vacuum(self, max_lifetime=http.SESSION_LIFETIME):
-        self._cr.execute(
-            "DELETE FROM http_sessions "
-            "WHERE now() at time zone 'UTC' - write_date > %s",
-            (f"{max_lifetime} seconds",),
+    def _vacuum_batch(self, cr, max_lifetime, batch_size):
+        cr.execute(
+            # ARRAY() so that both the selection of the expired sessions
+            # and their deletion are index scans
+            "DELETE FROM http_sessions WHERE sid = ANY(ARRAY("
+            "  SELECT sid FROM http_sessions"
+            "  WHERE write_date < now() at time zone 'UTC' - %s::interval"
+            "  LIMIT %s FOR UPDATE SKIP LOCKED"
+            "))",
+            (f"{max_lifetime} seconds", batch_size),
         )
+        return cr.rowcount
 
 
 _original_session_store = http.root.__class__.session_store
@@ -0,0 +1,107 @@
+"""Benchmark of the session stores under concurrent requests
+
+Not part of the test suite. Each simulated request reads a session and
+saves it, changing it for ``--write-ratio`` of the requests, like the
+odoo http layer does. Run it with odoo in the python path, e.g.::
+
+    python -m odoo.addons.session_db.tests.bench_session_store \\
+        --uri postgres://odoo@localhost/sessions --threads 16
+
+It prints the throughput of the filesystem store and of the database
+store, with and without read cache.
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from odoo import http
+
+from odoo.addons.session_db.pg_session_store import PGSessionStore
+
+
+def run(store, sids, threads, requests, write_ratio):
+    """Return the number of requests per second handled by the store"""
+
+    def work(seed):
+        rnd = random.Random(seed)
+        for __ in range(requests):
+            session = store.get(rnd.choice(sids))
+            if rnd.random() < write_ratio:
+                session["counter"] = session.get("counter", 0) + 1
+            store.save(session)
+
+    workers = [
+        threading.Thread(target=work, args=(index,)) for index in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * requests / (time.perf_counter() - start)
+
+
+def populate(store, count):
+    sids = []
+    for index in range(count):
+        session = store.new()
+        session.update({"login": f"user{index}", "context": {"lang": "en_US"}})
+        store.save(session)
+        sids.append(session.sid)
+    return sids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uri", required=True, help="session database URI")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="per thread")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--pool-size", type=int, default=None)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix="bench_sessions_")
+    try:
+        stores = [
+            (
+                "filesystem",
+                http.FilesystemSessionStore(path, session_class=http.Session),
+            ),
+            (
+                "db",
+                PGSessionStore(
+                    args.uri,
+                    session_class=http.Session,
+                    pool_size=args.pool_size,
+                    cache_ttl=0,
+                ),
+            ),
+            (
+                "db, 5s read cache",
+                PGSessionStore(
+                    args.uri,
+                    session_class=http.Session,
+                    pool_size=args.pool_size,
+                    cache_ttl=5,
+                ),
+            ),
+        ]
+        for name, store in stores:
+            sids = populate(store, args.sessions)
+            throughput = run(
+                store, sids, args.threads, args.requests, args.write_ratio
+            )
+            print(f"{name:<20} {throughput:10.0f} requests/s")
+            for sid in sids:
+                store.delete(store.session_class({}, sid, False))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
+import json
 import logging
+import threading
+import zlib
 from unittest import mock
 
 import psycopg2
@@ -8,7 +11,7 @@ from odoo.sql_db import connection_info_for
 from odoo.tests.common import TransactionCase
 from odoo.tools import config
 
-from odoo.addons.session_db.pg_session_store import PGSessionStore
+from odoo.addons.session_db.pg_session_store import INDEX_LOCK_ID, PGSessionStore
 
 
 def _make_postgres_uri(
@@ -89,6 +92,162 @@ class TestPGSessionStore(TransactionCase):
         # when the error is resolved, it works again
         self.session_store.get("abc")
 
+    def test_save_unchanged(self):
+        """Unchanged sessions are not written again"""
+        session = self.session_store.new()
+        session["test"] = "test"
+        self.session_store.save(session)
+        with mock.patch.object(
+            self.session_store, "_upsert", wraps=self.session_store._upsert
+        ) as mock_upsert:
+            self.session_store.save(session)
+            session = self.session_store.get(session.sid)
+            self.session_store.save(session)
+            mock_upsert.assert_not_called()
+            session["test"] = "changed"
+            self.session_store.save(session)
+            mock_upsert.assert_called_once()
+        assert self.session_store.get(session.sid)["test"] == "changed"
+
+    def test_read_cache(self):
+        session = self.session_store.new()
+        session["test"] = "test"
+        self.session_store.save(session)
+        cached_store = PGSessionStore(
+            self.session_store._uri, session_class=http.Session, cache_ttl=60
+        )
+        assert cached_store.get(session.sid)["test"] == "test"
+        # delete the session behind the back of the cached store
+        self.session_store.delete(session)
+        with mock.patch.object(cached_store, "_select") as mock_select:
+            assert cached_store.get(session.sid)["test"] == "test"
+            mock_select.assert_not_called()
+        # its own changes are visible at once
+        cached_store.delete(session)
+        assert cached_store.get(session.sid).get("test") is None
+        # without cache, the session is read every time
+        assert self.session_store.get(session.sid).get("test") is None
+
+    def test_concurrent_access(self):
+        """Threads share the connections of the pool"""
+        store = PGSessionStore(
+            self.session_store._uri, session_class=http.Session, pool_size=2
+        )
+        errors = []
+
+        def work(index):
+            try:
+                for count in range(10):
+                    session = store.new()
+                    session["test"] = f"{index}-{count}"
+                    store.save(session)
+                    assert store.get(session.sid)["test"] == f"{index}-{count}"
+                    store.delete(session)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert store._opened <= 2
+
+    def test_vacuum_batches(self):
+        sessions = [self.session_store.new() for __ in range(5)]
+        for session in sessions:
+            session["test"] = "test"
+            self.session_store.save(session)
+        with mock.patch.object(
+            self.session_store,
+            "_vacuum_batch",
+            wraps=self.session_store._vacuum_batch,
+        ) as mock_vacuum_batch:
+            deleted = self.session_store.vacuum(max_lifetime=-1, batch_size=2)
+        assert deleted >= 5
+        assert mock_vacuum_batch.call_count >= 3
+        for session in sessions:
+            assert self.session_store.get(session.sid).get("test") is None
+
+    def _execute(self, query, params=None):
+        cr = self.session_store._borrow_cursor()
+        try:
+            cr.execute(query, params)
+            return cr.fetchall() if cr.description else None
+        finally:
+            self.session_store._release_cursor(cr)
+
+    def test_compressed_payload(self):
+        session = self.session_store.new()
+        session["test"] = "test"
+        self.session_store.save(session)
+        [(data, payload)] = self._execute(
+            "SELECT data, payload FROM http_sessions WHERE sid=%s", (session.sid,)
+        )
+        assert payload is None
+        assert json.loads(zlib.decompress(data)) == {"test": "test"}
+
+    def test_legacy_payload(self):
+        """Sessions saved before the compressed payloads are still read"""
+        sid = self.session_store.new().sid
+        self._execute(
+            "INSERT INTO http_sessions (sid, write_date, payload) "
+            "VALUES (%s, now() at time zone 'UTC', %s)",
+            (sid, json.dumps({"test": "legacy"})),
+        )
+        session = self.session_store.get(sid)
+        assert session["test"] == "legacy"
+        session["test"] = "test"
+        self.session_store.save(session)
+        [(data, payload)] = self._execute(
+            "SELECT data, payload FROM http_sessions WHERE sid=%s", (sid,)
+        )
+        assert payload is None and data is not None
+        self.session_store.delete(session)
+
+    def test_unlogged(self):
+        query = "SELECT relpersistence FROM pg_class WHERE relname='http_sessions'"
+        [(persistence,)] = self._execute(query)
+        try:
+            PGSessionStore(
+                self.session_store._uri, session_class=http.Session, unlogged=True
+            )
+            assert self._execute(query) == [("u",)]
+            PGSessionStore(
+                self.session_store._uri, session_class=http.Session, unlogged=False
+            )
+            assert self._execute(query) == [("p",)]
+        finally:
+            PGSessionStore(
+                self.session_store._uri,
+                session_class=http.Session,
+                unlogged=persistence == "u",
+            )
+
+    def test_write_date_index(self):
+        """The index is built by a single process, when it is missing"""
+        query = (
+            "SELECT indisvalid FROM pg_index "
+            "WHERE indexrelid = 'http_sessions_write_date_index'::regclass"
+        )
+        assert self._execute(query) == [(True,)]
+        self._execute("DROP INDEX http_sessions_write_date_index")
+        cr = self.session_store._borrow_cursor()
+        try:
+            # another process is building it
+            cr.execute("SELECT pg_advisory_lock(%s)", (INDEX_LOCK_ID,))
+            PGSessionStore(self.session_store._uri, session_class=http.Session)
+            assert not self._execute(
+                "SELECT 1 FROM pg_class "
+                "WHERE relname = 'http_sessions_write_date_index'"
+            )
+        finally:
+            cr.execute("SELECT pg_advisory_unlock(%s)", (INDEX_LOCK_ID,))
+            self.session_store._release_cursor(cr)
+        PGSessionStore(self.session_store._uri, session_class=http.Session)
+        assert self._execute(query) == [(True,)]
+
     def test_make_postgres_uri(self):
         connection_info = {
             "host": "localhost",